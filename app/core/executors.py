@@ -0,0 +1,65 @@
+# app/core/executors.py
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, TypeVar
+
+from fastapi import HTTPException
+
+T = TypeVar("T")
+
+# 磁盘 I/O（复制、解压、删除目录、计算摘要、等待子进程）线程数与排队上限
+IO_POOL_WORKERS = int(os.environ.get("IO_POOL_WORKERS", 8))
+IO_POOL_MAX_PENDING = int(os.environ.get("IO_POOL_MAX_PENDING", 256))
+# 数据库线程数不超过连接池大小（pool_size=5），避免异步路由占满连接导致同步路由等待超时
+DB_POOL_WORKERS = int(os.environ.get("DB_POOL_WORKERS", 5))
+DB_POOL_MAX_PENDING = int(os.environ.get("DB_POOL_MAX_PENDING", 512))
+
+
+class BlockingPool:
+    """有界线程池：async 路由通过 await pool.run(func, ...) 执行阻塞调用，不占用事件循环。
+
+    同时执行的调用数受线程数限制；排队（含执行中）的调用超过 max_pending 时直接返回 503，
+    而不是让请求无限堆积。
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(self.max_workers, max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{name}-pool")
+        self._pending = 0
+        self._lock = Lock()
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HTTPException(status_code=503, detail=f"服务繁忙（{self.name} 线程池已满），请稍后重试")
+            self._pending += 1
+        # 复制上下文，使 contextvars 在工作线程中仍然可见
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+        try:
+            future = self._executor.submit(call)
+        except RuntimeError:
+            self._release()
+            raise
+        # 以线程实际结束为准释放名额（await 被取消时工作线程仍在运行）
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = self._pending
+        return {"name": self.name, "workers": self.max_workers, "max_pending": self.max_pending, "pending": pending}
+
+
+# 创建全局实例
+io_pool = BlockingPool("io", IO_POOL_WORKERS, IO_POOL_MAX_PENDING)
+db_pool = BlockingPool("db", DB_POOL_WORKERS, DB_POOL_MAX_PENDING)
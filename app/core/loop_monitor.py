@@ -0,0 +1,108 @@
+# app/core/loop_monitor.py
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+# 事件循环被阻塞超过该时长（毫秒）时记录并打印调用栈；采样间隔（毫秒）
+LOOP_LAG_THRESHOLD_MS = int(os.environ.get("LOOP_LAG_THRESHOLD_MS", 100))
+LOOP_LAG_INTERVAL_MS = int(os.environ.get("LOOP_LAG_INTERVAL_MS", 50))
+# 调用栈最多保留的帧数
+STACK_LIMIT = 12
+
+
+class LoopLagMonitor:
+    """监测事件循环阻塞。
+
+    协程每隔 interval 睡眠一次并记录心跳，实际醒来的延迟即为事件循环的滞后；
+    看门狗线程发现心跳超过阈值未更新时，抓取事件循环线程当前的调用栈，
+    便于定位是哪个 async 路由在执行阻塞调用。
+    """
+
+    def __init__(self, threshold_ms: int = LOOP_LAG_THRESHOLD_MS, interval_ms: int = LOOP_LAG_INTERVAL_MS):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = 0.0
+        self._captured_stack: Optional[str] = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.max_lag_ms = 0.0
+            self.blocked_count = 0
+            self.last_blocked: Optional[dict] = None
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._sample())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sample(self) -> None:
+        while True:
+            started_at = time.monotonic()
+            self._heartbeat = started_at
+            await asyncio.sleep(self.interval)
+            lag = time.monotonic() - started_at - self.interval
+            if lag > self.threshold:
+                self._record(lag)
+
+    def _record(self, lag: float) -> None:
+        lag_ms = round(lag * 1000, 1)
+        with self._lock:
+            stack, self._captured_stack = self._captured_stack, None
+            self.blocked_count += 1
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            self.last_blocked = {"lag_ms": lag_ms, "at": time.time(), "stack": stack}
+        print(f"[loop] 事件循环被阻塞 {lag_ms}ms（阈值 {self.threshold * 1000:.0f}ms）")
+        if stack:
+            print(stack)
+
+    def _watch(self) -> None:
+        reported_heartbeat = None
+        while not self._stopped.wait(self.interval):
+            heartbeat = self._heartbeat
+            if heartbeat == reported_heartbeat:
+                continue
+            if time.monotonic() - heartbeat > self.interval + self.threshold:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    stack = "".join(traceback.format_stack(frame, limit=STACK_LIMIT))
+                    with self._lock:
+                        self._captured_stack = stack
+                reported_heartbeat = heartbeat
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "threshold_ms": round(self.threshold * 1000),
+                "max_lag_ms": self.max_lag_ms,
+                "blocked_count": self.blocked_count,
+                "last_blocked": self.last_blocked,
+            }
+
+
+# 创建全局实例
+loop_monitor = LoopLagMonitor()
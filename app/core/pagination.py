@@ -0,0 +1,68 @@
+# app/core/pagination.py
+import base64
+import json
+import time
+from threading import Lock
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import HTTPException
+
+# 缓存的总数有效期（秒），游标分页时按需返回总数，避免每次请求都执行 COUNT(*)
+COUNT_CACHE_SECONDS = 10
+
+
+def encode_cursor(last_id: int) -> str:
+    """把最后一条记录的 ID 编码为不透明的游标"""
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[int]:
+    """解析游标，空字符串表示第一页；格式错误时返回 400"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return int(data["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+class CountCache:
+    """带过期时间的总数缓存，数据变更时调用 invalidate 立即失效"""
+
+    def __init__(self, ttl: float = COUNT_CACHE_SECONDS):
+        self.ttl = ttl
+        self._values: Dict[Hashable, Tuple[float, int]] = {}
+        self._lock = Lock()
+
+    def get(self, key: Hashable, compute: Callable[[], int]) -> int:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._values.get(key)
+            if cached and now - cached[0] < self.ttl:
+                return cached[1]
+        value = compute()
+        with self._lock:
+            self._values[key] = (now, value)
+        return value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+def keyset_page(query, id_column, cursor: str, page_size: int):
+    """按 ID 倒序的游标分页，返回 (本页记录, 下一页游标)
+
+    多取一条用于判断是否还有下一页；翻页过程中新增的记录不会导致已有记录在页间移动。
+    """
+    last_id = decode_cursor(cursor)
+    if last_id is not None:
+        query = query.filter(id_column < last_id)
+    rows = query.order_by(id_column.desc()).limit(page_size + 1).all()
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = encode_cursor(rows[-1].id) if has_next and rows else None
+    return rows, next_cursor
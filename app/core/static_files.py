@@ -0,0 +1,153 @@
+# app/core/static_files.py
+import mimetypes
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+import anyio
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+# 补充系统 mime 数据库中可能缺失的类型
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("model/gltf-binary", ".glb")
+mimetypes.add_type("model/obj", ".obj")
+mimetypes.add_type("application/octet-stream", ".ply")
+mimetypes.add_type("application/octet-stream", ".splat")
+
+# 单个字节区间：bytes=起始-结束 / bytes=起始- / bytes=-末尾长度
+SINGLE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# 区间响应每次读取的块大小
+RANGE_CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    """请求的区间超出文件大小"""
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    """由 inode、修改时间（纳秒）和大小生成强 ETag"""
+    return f'"{stat_result.st_ino:x}-{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def is_not_modified(request: Request, etag: str, stat_result: os.stat_result) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # 有 If-None-Match 时忽略 If-Modified-Since
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in candidates or etag in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since is None:
+            return False
+        return int(stat_result.st_mtime) <= since.timestamp()
+    return False
+
+
+def if_range_matches(request: Request, etag: str, last_modified: str) -> bool:
+    """If-Range 与当前 ETag（强比较）或 Last-Modified 相同时，才按 Range 返回部分内容"""
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    return if_range == etag or if_range == last_modified
+
+
+def parse_single_range(http_range: str, size: int) -> Optional[Tuple[int, int]]:
+    """解析单个字节区间，返回闭区间 (start, end)。
+
+    多个区间或格式不合法时返回 None（交给 FileResponse 处理）；区间不可满足时抛出 RangeNotSatisfiable。
+    """
+    match = SINGLE_RANGE.match(http_range.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # 后缀区间：最后 N 个字节
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = size - 1 if last == "" else min(int(last), size - 1)
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if start > end:
+        return None
+    return start, end
+
+
+class FileRangeResponse(Response):
+    """文件中单个字节区间的 206 响应，按块异步读取"""
+
+    def __init__(self, path: str, start: int, end: int, headers: Dict[str, str]):
+        super().__init__(status_code=206, headers=headers)
+        self.path = path
+        self.start = start
+        self.end = end
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() != "HEAD":
+            remaining = self.end - self.start + 1
+            async with await anyio.open_file(self.path, mode="rb") as f:
+                await f.seek(self.start)
+                while remaining > 0:
+                    chunk = await f.read(min(RANGE_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break  # 文件在发送过程中被截短
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def conditional_file_response(
+    request: Request,
+    path: str,
+    stat_result: os.stat_result,
+    cache_control: str = "no-cache",
+    filename: Optional[str] = None,
+) -> Response:
+    """返回文件：命中 If-None-Match / If-Modified-Since 时返回 304；
+    带 Range 且 If-Range 与本函数生成的 ETag / Last-Modified 一致时返回 206，否则返回完整文件。
+
+    Starlette 的 FileResponse 按它自己的 ETag 校验 If-Range，与这里的 ETag 不同，
+    因此单区间请求在这里处理，FileResponse 只负责完整文件（及不带 If-Range 的多区间请求）。
+    """
+    etag = file_etag(stat_result)
+    last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+    headers = {
+        "etag": etag,
+        "cache-control": cache_control,
+    }
+    if is_not_modified(request, etag, stat_result):
+        headers["last-modified"] = last_modified
+        return Response(status_code=304, headers=headers)
+    media_type = mimetypes.guess_type(filename or path)[0] or "application/octet-stream"
+    response = FileResponse(
+        path,
+        filename=filename,
+        media_type=media_type,
+        headers=headers,
+        stat_result=stat_result
+    )
+    http_range = request.headers.get("range")
+    if http_range is None or not if_range_matches(request, etag, last_modified):
+        return response
+    try:
+        byte_range = parse_single_range(http_range, stat_result.st_size)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, "content-range": f"bytes */{stat_result.st_size}"})
+    if byte_range is None:
+        return response
+    start, end = byte_range
+    range_headers = dict(response.headers)
+    range_headers["content-length"] = str(end - start + 1)
+    range_headers["content-range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+    return FileRangeResponse(path, start, end, range_headers)
@@ -0,0 +1,19 @@
+# app/core/uploads.py
+import os
+
+# 上传目录（相对于工作目录）：/files 以它为根提供文件，任务记录中的各类 URL（result_url、lod_manifest_url 等）均相对于它
+UPLOAD_DIRECTORY = "uploads/"
+
+
+def uploads_root() -> str:
+    return os.path.abspath(UPLOAD_DIRECTORY)
+
+
+def upload_url(path: str) -> str:
+    """上传目录内的文件路径 → 相对上传目录的 URL（导入项目位于 uploads/<前缀>_extracted/<根目录> 下，同样适用）"""
+    return os.path.relpath(os.path.abspath(path), uploads_root()).replace(os.sep, "/")
+
+
+def upload_path(url: str) -> str:
+    """相对上传目录的 URL → 绝对路径"""
+    return os.path.join(uploads_root(), url)
@@ -1,7 +1,13 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import users, upload, data_resource, project, sse, three_d_gs, tag  # 导入新的路由
 from app.models.database import engine, Base
+from app.models.migrations import run_migrations
+from app.sse.connection_manager import manager
+from app.sse.event_bus import event_bus
+from app.core.executors import db_pool, io_pool
+from app.core.loop_monitor import loop_monitor
 
 app = FastAPI(
     title="Real Scene Data Engine API",
@@ -29,11 +35,65 @@ app.include_router(tag.router) # 标签相关接口
 
 # 初始化数据库表
 Base.metadata.create_all(bind=engine)
+# 为旧表补齐新增的列
+run_migrations(engine)
+
+@app.on_event("startup")
+async def attach_event_bus():
+    # 捕获主事件循环，后台线程通过它向 SSE 客户端广播
+    event_bus.attach(asyncio.get_running_loop())
+    # 启动 SSE 广播后端（数据库后端会开始轮询其他 worker 发布的消息）
+    await manager.start()
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    # 监测事件循环阻塞，async 路由中残留的阻塞调用会被打印出来
+    loop_monitor.start()
+
+@app.on_event("startup")
+def start_job_queue():
+    # 恢复重启前遗留的任务并开始认领排队任务
+    three_d_gs.job_queue.start()
+
+@app.on_event("startup")
+def resubmit_thumbnails():
+    # 预览帧任务只在进程内排队，重新提交重启前未完成的数据资源
+    data_resource.thumbnail_service.resubmit_missing()
+
+@app.on_event("shutdown")
+def stop_job_queue():
+    three_d_gs.job_queue.stop()
+    event_bus.detach()
+
+@app.on_event("shutdown")
+def stop_thumbnail_service():
+    data_resource.thumbnail_service.shutdown()
+
+@app.on_event("shutdown")
+def stop_mesh_export_service():
+    three_d_gs.mesh_export_service.shutdown()
+
+@app.on_event("shutdown")
+def stop_segmentation_service():
+    three_d_gs.segmentation_service.shutdown()
+
+@app.on_event("shutdown")
+async def stop_sse_backend():
+    await manager.stop()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    await loop_monitor.stop()
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to Real Scene Data Engine API"}
 
+@app.get("/debug/runtime")
+async def runtime_stats():
+    """事件循环阻塞情况与线程池排队情况"""
+    return {"loop": loop_monitor.stats(), "pools": [io_pool.stats(), db_pool.stats()]}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
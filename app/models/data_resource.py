@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.models.database import Base
 
@@ -8,5 +8,27 @@ class DataResource(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
     static_file_id = Column(Integer, ForeignKey("static_files.id"))
-    preview_frame_ids = Column(Text, nullable=True)  # 存储预览帧ID，以逗号分隔
-    static_file = relationship("StaticFile", back_populates="data_resources")
\ No newline at end of file
+    preview_frame_ids = Column(Text, nullable=True)  # 已废弃：旧版以逗号分隔存储预览帧ID，仅供迁移回填使用
+    static_file = relationship("StaticFile", back_populates="data_resources")
+    # 预览帧按抽帧顺序排列
+    preview_frames = relationship(
+        "DataResourcePreviewFrame",
+        back_populates="data_resource",
+        order_by="DataResourcePreviewFrame.position",
+        cascade="all, delete-orphan"
+    )
+
+# 数据资源预览帧关联表（一对多，带顺序）
+class DataResourcePreviewFrame(Base):
+    __tablename__ = "data_resource_preview_frames"
+    __table_args__ = (
+        UniqueConstraint("data_resource_id", "position", name="uq_data_resource_preview_frame_position"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    data_resource_id = Column(Integer, ForeignKey("data_resources.id", ondelete="CASCADE"), nullable=False, index=True)
+    static_file_id = Column(Integer, ForeignKey("static_files.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False, default=0)  # 帧序号，从 0 开始
+
+    data_resource = relationship("DataResource", back_populates="preview_frames")
+    static_file = relationship("StaticFile")
@@ -0,0 +1,24 @@
+# app/models/mesh_export.py
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.models.database import Base
+
+class MeshExport(Base):
+    """网格导出作业（gs-extract-mesh + texrecon + 打包 ZIP），结果按缓存键复用"""
+    __tablename__ = "mesh_exports"
+
+    id = Column(Integer, primary_key=True, index=True)
+    processed_file_id = Column(Integer, ForeignKey("processed_files.id", ondelete="CASCADE"), nullable=False, index=True)
+    cache_key = Column(String(64), nullable=False, unique=True)  # sha256(任务, 点云修改时间与大小, 导出参数)
+    params = Column(Text, nullable=False)  # 导出参数 JSON
+    status = Column(String(20), default="queued", index=True)  # queued / running / done / failed / cancelled
+    stage = Column(String(20), nullable=True)  # 最近完成的阶段：meshed / textured / packaged
+    progress = Column(Integer, default=0)  # 0-100
+    result_path = Column(String(255), nullable=True)  # ZIP 文件（相对 uploads 的路径）
+    error = Column(Text, nullable=True)
+    owner = Column(String(128), nullable=True)  # 执行该作业的工作进程标识
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    processed_file = relationship("ProcessedFile")
@@ -0,0 +1,75 @@
+# app/models/migrations.py
+from sqlalchemy import exists, inspect, select, text
+from sqlalchemy.engine import Engine
+from app.models.database import Base
+
+
+def _add_missing_columns(engine: Engine) -> None:
+    """为已存在的表补齐模型中新增的列（create_all 只会建新表，不会修改旧表）
+
+    新增列一律以可空方式添加，默认值由 ORM 负责填充。
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        with engine.begin() as conn:
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type} NULL"))
+                print(f"[migrations] 已为表 {table.name} 添加列 {column.name}")
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                if not any(column.name not in existing_columns for column in index.columns):
+                    # 旧列上的索引由历史建表语句负责，这里只补新列的索引
+                    continue
+                index.create(bind=conn)
+
+
+def _backfill_preview_frames(engine: Engine) -> None:
+    """把 data_resources.preview_frame_ids（逗号分隔）回填到 data_resource_preview_frames 表
+
+    只处理还没有任何关联行的数据资源，因此可以重复执行；指向已不存在的静态文件的 ID 会被跳过。
+    """
+    resources = Base.metadata.tables.get("data_resources")
+    frames = Base.metadata.tables.get("data_resource_preview_frames")
+    static_files = Base.metadata.tables.get("static_files")
+    if resources is None or frames is None or static_files is None:
+        return
+    with engine.begin() as conn:
+        rows = conn.execute(
+            select(resources.c.id, resources.c.preview_frame_ids).where(
+                resources.c.preview_frame_ids.isnot(None),
+                resources.c.preview_frame_ids != "",
+                ~exists().where(frames.c.data_resource_id == resources.c.id)
+            )
+        ).all()
+        if not rows:
+            return
+        frame_ids = {
+            data_resource_id: [int(frame_id) for frame_id in csv.split(",") if frame_id.strip().isdigit()]
+            for data_resource_id, csv in rows
+        }
+        all_ids = {frame_id for ids in frame_ids.values() for frame_id in ids}
+        existing_ids = set(conn.execute(
+            select(static_files.c.id).where(static_files.c.id.in_(all_ids))
+        ).scalars()) if all_ids else set()
+        values = [
+            {"data_resource_id": data_resource_id, "static_file_id": frame_id, "position": position}
+            for data_resource_id, ids in frame_ids.items()
+            for position, frame_id in enumerate(frame_id for frame_id in ids if frame_id in existing_ids)
+        ]
+        if values:
+            conn.execute(frames.insert(), values)
+        print(f"[migrations] 已为 {len(frame_ids)} 个数据资源回填 {len(values)} 条预览帧记录")
+
+
+def run_migrations(engine: Engine) -> None:
+    """启动时执行的轻量级数据库迁移"""
+    _add_missing_columns(engine)
+    _backfill_preview_frames(engine)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
 from sqlalchemy.orm import relationship
 from app.models.database import Base
 
@@ -11,7 +11,16 @@ class ProcessedFile(Base):
     status = Column(String(50), default="Pending")  # 指定长度
     result_url = Column(String(255), nullable=True)  # 指定长度
     algorithm = Column(String(50), default="3dgs")  # 算法类型字段
+    splat_url = Column(String(255), nullable=True)  # 训练后导出的 .splat（相对 uploads 的路径）
+    compressed_url = Column(String(255), nullable=True)  # 训练后导出的分块量化压缩 PLY
+    lod_manifest_url = Column(String(255), nullable=True)  # LOD 分块清单 manifest.json
+
+    # 持久化任务队列的租约信息（见 app/tasks/job_queue.py）
+    lease_owner = Column(String(128), nullable=True, index=True)  # 持有租约的工作进程标识
+    lease_expires_at = Column(DateTime, nullable=True)  # 租约过期时间（UTC），过期后任务可被其他进程接管
+    heartbeat_at = Column(DateTime, nullable=True)  # 最近一次心跳时间（UTC）
+    attempts = Column(Integer, default=0)  # 已被认领执行的次数
 
     static_file = relationship("StaticFile", back_populates="processed_files")
     projects = relationship("Project", back_populates="processed_file")
-    segment_files = relationship("SegmentFile", back_populates="processed_file")
\ No newline at end of file
+    segment_files = relationship("SegmentFile", back_populates="processed_file")
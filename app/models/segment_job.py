@@ -0,0 +1,28 @@
+# app/models/segment_job.py
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.models.database import Base
+
+class SegmentJob(Base):
+    """分割作业（Grounded-SAM-2 提取 mask + COB-GS 微调），同一场景同一提示只有一个作业"""
+    __tablename__ = "segment_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    processed_file_id = Column(Integer, ForeignKey("processed_files.id", ondelete="CASCADE"), nullable=False, index=True)
+    prompt_text = Column(String(255), nullable=False)  # 规范化后的提示（去除多余空白、小写）
+    status = Column(String(20), default="queued", index=True)  # queued / running / done / failed / cancelled
+    stage = Column(String(20), nullable=True)  # 最近完成的阶段：masked / segmented
+    progress = Column(Integer, default=0)  # 0-100
+    result_url = Column(String(255), nullable=True)  # segment.ply（相对 uploads 的路径）
+    error = Column(Text, nullable=True)
+    owner = Column(String(128), nullable=True)  # 执行该作业的工作进程标识
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    processed_file = relationship("ProcessedFile")
+
+    # 联合唯一约束保证并发提交同一提示时只创建一个作业
+    __table_args__ = (
+        UniqueConstraint('processed_file_id', 'prompt_text', name='uix_segment_job_prompt'),
+    )
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, BigInteger, Integer, Text, DateTime
+from sqlalchemy.sql import func
+from app.models.database import Base
+
+class SSEEvent(Base):
+    """跨进程 SSE 广播的消息日志（仅在 SSE_BACKEND=database 时使用）"""
+    __tablename__ = "sse_events"
+
+    # 自增 ID 同时作为 SSE 事件 ID，保证所有 worker 中同一消息的 ID 一致
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    payload = Column(Text, nullable=False)  # JSON 格式的消息体
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
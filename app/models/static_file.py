@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import BigInteger, Column, Integer, String
 from sqlalchemy.orm import relationship
 from app.models.database import Base
 
@@ -9,6 +9,8 @@ class StaticFile(Base):
     path = Column(String(255), unique=True, index=True)
     filename = Column(String(255), unique=True, index=True)
     original_filename = Column(String(255))
+    sha256 = Column(String(64), nullable=True, index=True)  # 文件内容的 SHA-256，用于上传去重
+    size = Column(BigInteger, nullable=True)  # 文件大小（字节）
     processed_files = relationship("ProcessedFile", back_populates="static_file")
     data_resources = relationship("DataResource", back_populates="static_file")  # 添加这行
     projects = relationship("Project", back_populates="static_file")
@@ -0,0 +1,34 @@
+# app/models/upload_session.py
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.models.database import Base
+
+class UploadSession(Base):
+    """可续传的分块上传会话，分块直接写入临时文件的对应偏移，完成后改名为最终文件"""
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(36), primary_key=True)  # uuid，作为 upload_id 返回给客户端
+    path = Column(String(255), nullable=False)  # 写入中的临时文件路径（uploads/.sessions/<id>.part）
+    filename = Column(String(255), nullable=False)  # 完成后在上传目录中的文件名
+    original_filename = Column(String(255))
+    size = Column(BigInteger, nullable=False)  # 文件总大小（字节）
+    chunk_size = Column(Integer, nullable=False)  # 分块大小，最后一块可以更小
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    chunks = relationship("UploadChunk", back_populates="session", cascade="all, delete-orphan")
+
+# 已接收的分块（每块一行，支持并行上传）
+class UploadChunk(Base):
+    __tablename__ = "upload_chunks"
+    __table_args__ = (
+        UniqueConstraint("session_id", "chunk_index", name="uq_upload_chunk_index"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String(36), ForeignKey("upload_sessions.id", ondelete="CASCADE"), nullable=False, index=True)
+    chunk_index = Column(Integer, nullable=False)
+    size = Column(Integer, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+
+    session = relationship("UploadSession", back_populates="chunks")
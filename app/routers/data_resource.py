@@ -1,14 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from app.models.database import get_db
-from app.models.data_resource import DataResource as DataResourceModel
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
+from app.models.database import SessionLocal, get_db
+from app.models.data_resource import DataResource as DataResourceModel, DataResourcePreviewFrame
 from app.models.static_file import StaticFile as StaticFileModel
 from app.schemas.data_resource import DataResourceCreate, DataResource
+from app.core.pagination import CountCache, keyset_page
+from app.tasks.thumbnails import thumbnail_service
+from typing import Dict, Iterator, List, Optional
+import json
 import os
-import subprocess
 
 router = APIRouter()
 
+# 数据资源总数缓存（游标分页时使用）
+data_resource_counts = CountCache()
+
+# listAll 每批从数据库读取的记录数
+LIST_ALL_BATCH_SIZE = 500
+
 @router.post("/data_resources/add", response_model=DataResource)
 def create_data_resource(data_resource: DataResourceCreate, db: Session = Depends(get_db)):
     # 检查 static_file 是否存在
@@ -21,137 +32,132 @@ def create_data_resource(data_resource: DataResourceCreate, db: Session = Depend
     db.add(new_data_resource)
     db.commit()
     db.refresh(new_data_resource)
+    data_resource_counts.invalidate()
 
-    # 创建视频预览帧
-    try:
-        # 获取视频文件路径
-        video_path = static_file.path
-        
-        # 检查文件是否存在
-        if not os.path.exists(video_path):
-            print(f"视频文件不存在: {video_path}")
-            return new_data_resource
-        
-        # 获取视频文件名(不带扩展名)
-        video_basename = os.path.splitext(os.path.basename(video_path))[0]
-        
-        # 创建预览文件夹
-        preview_folder = os.path.join("uploads", f"{video_basename}-video-preview")
-        os.makedirs(preview_folder, exist_ok=True)
-        
-        # 获取视频总时长
-        duration_cmd = [
-            "ffprobe", 
-            "-v", "error", 
-            "-show_entries", "format=duration", 
-            "-of", "default=noprint_wrappers=1:nokey=1", 
-            video_path
-        ]
-        duration = float(subprocess.check_output(duration_cmd).decode("utf-8").strip())
-        
-        # 明确只抽取4帧
-        num_frames = 5
-        # 修正计算逻辑，确保均匀分布包括起始和结束位置
-        frame_times = [duration * i / num_frames for i in range(num_frames)] if num_frames > 1 else [0]
-        
-        # 存储预览帧的ID列表
-        preview_frame_ids = []
-        
-        # 抽取并保存每一帧
-        for i, time_point in enumerate(frame_times):
-            output_file = os.path.join(preview_folder, f"frame_{i+1}.jpg")
-            
-            cmd = [
-                "ffmpeg", 
-                "-ss", str(time_point), 
-                "-i", video_path, 
-                "-frames:v", "1", 
-                "-q:v", "2", 
-                output_file,
-                "-y"  # 覆盖已存在的文件
-            ]
-            
-            subprocess.run(cmd, check=True)
-            
-            if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
-                # 将帧图片添加到static_files表
-                frame_filename = f"{video_basename}-video-preview/frame_{i+1}.jpg"
-                new_static_file = StaticFileModel(
-                    path=output_file,
-                    filename=frame_filename,
-                    original_filename=f"frame_{i+1}.jpg"
-                )
-                db.add(new_static_file)
-                db.flush()  # 刷新会话以获取ID
-                preview_frame_ids.append(str(new_static_file.id))
-            
-        # 循环结束后更新数据资源
-        new_data_resource.preview_frame_ids = ",".join(preview_frame_ids)
-        db.commit()
-            
-        print(f"成功抽取视频预览帧到: {preview_folder}")
-        
-    except Exception as e:
-        print(f"抽取视频预览帧时出错: {str(e)}")
-        # 这里我们不中断API请求，即使预览帧提取失败
+    # 预览帧在后台一次 ffmpeg 调用生成，完成后通过 SSE 推送 data_resource_preview_ready
+    thumbnail_service.submit(new_data_resource.id)
 
     return new_data_resource
 
+def _static_file_dict(static_file) -> dict:
+    if not static_file:
+        return {}
+    return {
+        "id": static_file.id,
+        "path": static_file.path,
+        "filename": static_file.filename,
+        "original_filename": static_file.original_filename
+    }
+
+
+def _load_preview_frames(db: Session, data_resources) -> Dict[int, List[dict]]:
+    """一次 IN 查询取出一批数据资源的预览帧，按数据资源 ID 分组并保持抽帧顺序"""
+    data_resource_ids = [data_resource.id for data_resource in data_resources]
+    preview_map: Dict[int, List[dict]] = {data_resource_id: [] for data_resource_id in data_resource_ids}
+    if not data_resource_ids:
+        return preview_map
+    rows = db.query(DataResourcePreviewFrame.data_resource_id, StaticFileModel).join(
+        StaticFileModel, StaticFileModel.id == DataResourcePreviewFrame.static_file_id
+    ).filter(
+        DataResourcePreviewFrame.data_resource_id.in_(data_resource_ids)
+    ).order_by(DataResourcePreviewFrame.data_resource_id, DataResourcePreviewFrame.position).all()
+    for data_resource_id, frame in rows:
+        preview_map[data_resource_id].append(_static_file_dict(frame))
+    return preview_map
+
+
+def _data_resource_dict(data_resource, preview_frames: Optional[List[dict]] = None) -> dict:
+    item = {
+        "id": data_resource.id,
+        "name": data_resource.name,
+        "static_file": _static_file_dict(data_resource.static_file)
+    }
+    if preview_frames is not None:
+        item["preview_images"] = preview_frames
+    return item
+
+
+def _serialize_data_resources(db: Session, data_resources, with_previews: bool) -> List[dict]:
+    preview_map = _load_preview_frames(db, data_resources) if with_previews else {}
+    return [
+        _data_resource_dict(data_resource, preview_map.get(data_resource.id, []) if with_previews else None)
+        for data_resource in data_resources
+    ]
+
+
 @router.get("/data_resources/list")
 def list_data_resources(
     page: int = Query(default=1, ge=1, description="页码"),
     page_size: int = Query(default=10, ge=1, le=100, description="每页数量"),
+    cursor: Optional[str] = Query(default=None, description="游标分页：传空字符串获取第一页，之后传上一页返回的 next_cursor；不传则使用页码分页"),
+    with_total: bool = Query(default=False, description="游标分页时是否返回总数（缓存值）"),
+    with_previews: bool = Query(default=False, description="是否在每条记录中附带预览帧（preview_images）"),
     db: Session = Depends(get_db)
 ):
-    # 计算跳过的记录数
-    skip = (page - 1) * page_size
-    data_resources = db.query(DataResourceModel).offset(skip).limit(page_size).all()
+    # static_file 随主查询一起 JOIN 取出，不再逐条查询
+    query = db.query(DataResourceModel).options(joinedload(DataResourceModel.static_file))
+    next_cursor = None
+    if cursor is not None:
+        # 游标分页：按 ID 倒序，不需要 OFFSET
+        data_resources, next_cursor = keyset_page(query, DataResourceModel.id, cursor, page_size)
+    else:
+        # 计算跳过的记录数
+        skip = (page - 1) * page_size
+        data_resources = query.order_by(DataResourceModel.id).offset(skip).limit(page_size).all()
 
     # 构建返回结果
-    result = []
-    for data_resource in data_resources:
-        static_file = db.query(StaticFileModel).filter(StaticFileModel.id == data_resource.static_file_id).first()
-        result.append({
-            "id": data_resource.id,
-            "name": data_resource.name,
-            "static_file": {
-                "id": static_file.id,
-                "path": static_file.path,
-                "filename": static_file.filename,
-                "original_filename": static_file.original_filename
-            }
-        })
+    result = _serialize_data_resources(db, data_resources, with_previews)
 
+    if cursor is not None:
+        return {
+            "code": 200,
+            "data": result,
+            "pagination": {
+                "page_size": page_size,
+                "next_cursor": next_cursor,
+                "has_next": next_cursor is not None,
+                "total": data_resource_counts.get("data_resources", db.query(DataResourceModel).count) if with_total else None
+            },
+            "msg": "请求成功"
+        }
     return {
         "code": 200,
         "data": result,
         "msg": "请求成功"
     }
 
-@router.get("/data_resources/listAll")
-def list_all_data_resources(db: Session = Depends(get_db)):
-    data_resources = db.query(DataResourceModel).all()
 
-    # 构建返回结果
-    result = []
-    for data_resource in data_resources:
-        static_file = db.query(StaticFileModel).filter(StaticFileModel.id == data_resource.static_file_id).first()
-        result.append({
-            "id": data_resource.id,
-            "name": data_resource.name,
-            "static_file": {
-                "id": static_file.id,
-                "path": static_file.path,
-                "filename": static_file.filename,
-                "original_filename": static_file.original_filename
-            }
-        })
+def _stream_all_data_resources(with_previews: bool) -> Iterator[str]:
+    """逐批读取并输出 JSON，内存占用与表大小无关。
 
-    return {
-        "code": 200,
-        "data": result,
-        "msg": "请求成功"
-    }
+    响应开始流式发送时请求依赖中的会话已经关闭，因此这里自行创建会话。
+    """
+    db = SessionLocal()
+    try:
+        yield '{"code": 200, "data": ['
+        statement = select(DataResourceModel).options(
+            joinedload(DataResourceModel.static_file)
+        ).order_by(DataResourceModel.id).execution_options(yield_per=LIST_ALL_BATCH_SIZE)
+        first = True
+        for batch in db.execute(statement).scalars().partitions():
+            items = _serialize_data_resources(db, batch, with_previews)
+            chunk = ", ".join(json.dumps(item, ensure_ascii=False) for item in items)
+            if not chunk:
+                continue
+            yield chunk if first else ", " + chunk
+            first = False
+            # 已输出的对象不再需要，避免会话的 identity map 持续增长
+            db.expunge_all()
+        yield '], "msg": "请求成功"}'
+    finally:
+        db.close()
+
+
+@router.get("/data_resources/listAll")
+def list_all_data_resources(
+    with_previews: bool = Query(default=False, description="是否在每条记录中附带预览帧（preview_images）")
+):
+    return StreamingResponse(_stream_all_data_resources(with_previews), media_type="application/json")
 
 
 @router.delete("/data_resources/{data_id}", response_model=bool)
@@ -163,23 +169,35 @@ def delete_data_resource(data_id: int, db: Session = Depends(get_db)):
     # 获取关联的 static_file
     static_file = db.query(StaticFileModel).filter(StaticFileModel.id == data_resource.static_file_id).first()
     
-    # 删除预览帧static_file记录
-    if data_resource.preview_frame_ids:
-        preview_frame_ids = [int(id) for id in data_resource.preview_frame_ids.split(',')]
-        preview_frames = db.query(StaticFileModel).filter(
-            StaticFileModel.id.in_(preview_frame_ids)
-        ).all()
+    # 上传去重后多个数据资源可能共用同一视频及其预览帧，只删除不再被其他数据资源引用的文件
+    preview_frames = [preview_frame.static_file for preview_frame in data_resource.preview_frames if preview_frame.static_file]
+    shared_frame_ids = set()
+    if preview_frames:
+        shared_frame_ids = {
+            frame_id for (frame_id,) in db.query(DataResourcePreviewFrame.static_file_id).filter(
+                DataResourcePreviewFrame.static_file_id.in_([frame.id for frame in preview_frames]),
+                DataResourcePreviewFrame.data_resource_id != data_id
+            ).all()
+        }
+    if static_file and db.query(DataResourceModel.id).filter(
+        DataResourceModel.static_file_id == static_file.id,
+        DataResourceModel.id != data_id
+    ).first():
+        static_file = None
+
+    # 删除预览帧static_file记录（关联行随数据资源级联删除）
+    for frame in preview_frames:
+        if frame.id in shared_frame_ids:
+            continue
+        # 删除预览帧文件
+        if os.path.exists(frame.path):
+            try:
+                os.remove(frame.path)
+            except Exception as e:
+                print(f"删除预览帧文件失败: {frame.path}, 错误: {str(e)}")
         
-        for frame in preview_frames:
-            # 删除预览帧文件
-            if os.path.exists(frame.path):
-                try:
-                    os.remove(frame.path)
-                except Exception as e:
-                    print(f"删除预览帧文件失败: {frame.path}, 错误: {str(e)}")
-            
-            # 删除预览帧记录
-            db.delete(frame)
+        # 删除预览帧记录
+        db.delete(frame)
     
     # 删除 data_resource
     db.delete(data_resource)
@@ -203,6 +221,7 @@ def delete_data_resource(data_id: int, db: Session = Depends(get_db)):
                 print(f"删除预览文件夹失败: {preview_folder}, 错误: {str(e)}")
     
     db.commit()
+    data_resource_counts.invalidate()
     return True
 
 @router.get("/data_resources/{data_id}/preview-images")
@@ -212,15 +231,12 @@ def get_data_resource_preview_images(data_id: int, db: Session = Depends(get_db)
     if data_resource is None:
         raise HTTPException(status_code=404, detail="数据资源不存在")
     
-    # 如果没有预览帧ID列表，返回空列表
-    if not data_resource.preview_frame_ids:
-        return []
-    
-    # 从预览帧ID列表中获取静态文件
-    preview_frame_ids = [int(id) for id in data_resource.preview_frame_ids.split(',')]
-    preview_frames = db.query(StaticFileModel).filter(
-        StaticFileModel.id.in_(preview_frame_ids)
-    ).all()
+    # 按抽帧顺序获取预览帧对应的静态文件
+    preview_frames = db.query(StaticFileModel).join(
+        DataResourcePreviewFrame, DataResourcePreviewFrame.static_file_id == StaticFileModel.id
+    ).filter(
+        DataResourcePreviewFrame.data_resource_id == data_id
+    ).order_by(DataResourcePreviewFrame.position).all()
     
     # 转换为响应格式
     image_files = [
@@ -233,4 +249,4 @@ def get_data_resource_preview_images(data_id: int, db: Session = Depends(get_db)
         for frame in preview_frames
     ]
     
-    return image_files
\ No newline at end of file
+    return image_files
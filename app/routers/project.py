@@ -1,11 +1,12 @@
 # app/routers/project.py
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
-from typing import Optional
-from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from sqlalchemy.orm import Session, contains_eager, joinedload, selectinload
 from sqlalchemy import or_
 import os
 import shutil
 import zipfile
+import aiofiles
 import tempfile
 import uuid
 import datetime
@@ -13,14 +14,24 @@ from app.models.database import get_db
 from app.models.project import Project as ProjectModel
 from app.models.static_file import StaticFile as StaticFileModel
 from app.models.processed_file import ProcessedFile as ProcessedFileModel
+from app.models.tag import Tag as TagModel
 from app.schemas.project import ProjectCreate, Project, ProjectImport
 from app.routers.three_d_gs import create_three_dgs
 from app.sse.connection_manager import manager
+from app.sse.event_bus import event_bus, task_projects
+from app.core.pagination import CountCache, keyset_page
+from app.tasks.project_import import ProjectImportError, import_archive
+from app.core.executors import db_pool, io_pool
 
 router = APIRouter()
 
-@router.post("/projects/add", response_model=Project)
-async def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
+# 项目总数缓存（游标分页时使用）
+project_counts = CountCache()
+
+# 导入项目时保存上传文件的分块大小
+SAVE_CHUNK_SIZE = 1024 * 1024
+
+def _check_project_static_files(project: ProjectCreate, db: Session) -> None:
     # 检查 static_file 是否存在
     static_file = db.query(StaticFileModel).filter(StaticFileModel.id == project.static_file_id).first()
     if not static_file:
@@ -32,20 +43,35 @@ async def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
         # 如果 cover_image 不存在，则使用 static_file 的第一个文件作为封面
         raise HTTPException(status_code=502, detail="Cover image static file not found")
 
+def _add_project(db: Session, **fields) -> ProjectModel:
+    new_project = ProjectModel(**fields)
+    db.add(new_project)
+    db.commit()
+    db.refresh(new_project)
+    # 在线程池中加载标签，避免序列化响应时在事件循环上懒加载
+    new_project.tags
+    return new_project
+
+@router.post("/projects/add", response_model=Project)
+async def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
+    # 数据库操作在 db_pool 中执行，不阻塞事件循环
+    await db_pool.run(_check_project_static_files, project, db)
+
     # 执行 create_three_dgs 并获取 processed_file_id
     processed_file = await create_three_dgs(file_id=project.static_file_id, algorithm=project.algorithm, db=db)
     processed_file_id = processed_file.id
 
     # 创建项目
-    new_project = ProjectModel(
+    new_project = await db_pool.run(
+        _add_project,
+        db,
         name=project.name,
         processed_file_id=processed_file_id,
         static_file_id=project.static_file_id,
         project_cover_image_static_id=project.project_cover_image_static_id
     )
-    db.add(new_project)
-    db.commit()
-    db.refresh(new_project)
+    task_projects.add(processed_file_id, new_project.id)
+    project_counts.invalidate()
 
     # 发送通知
     await manager.broadcast({
@@ -56,11 +82,58 @@ async def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
 
     return new_project
 
+def _static_file_dict(static_file) -> dict:
+    if not static_file:
+        return {}
+    return {
+        "id": static_file.id,
+        "path": static_file.path,
+        "filename": static_file.filename,
+        "original_filename": static_file.original_filename,
+    }
+
+
+def _processed_file_dict(processed_file) -> dict:
+    if not processed_file:
+        return {}
+    return {
+        "id": processed_file.id,
+        "file_id": processed_file.file_id,
+        "folder_path": processed_file.folder_path,
+        "status": processed_file.status,
+        "result_url": processed_file.result_url,
+        "splat_url": processed_file.splat_url,
+        "compressed_url": processed_file.compressed_url,
+        "lod_manifest_url": processed_file.lod_manifest_url,
+        "algorithm": processed_file.algorithm,
+    }
+
+
+def _serialize_project(project) -> dict:
+    """项目列表项，关联对象须已预加载，避免逐行触发懒加载查询"""
+    return {
+        "id": project.id,
+        "name": project.name,
+        "processed_file": _processed_file_dict(project.processed_file),
+        "static_file": _static_file_dict(project.static_file),
+        "cover_image": _static_file_dict(project.cover_image),
+        "tags": [
+            {
+                "id": tag.id,
+                "name": tag.name,
+                "color": tag.color
+            } for tag in project.tags
+        ]
+    }
+
+
 @router.get("/projects/list")
 def list_projects(
     page: int = Query(default=1, ge=1, description="页码"),
     page_size: int = Query(default=10, ge=1, le=100, description="每页数量"),
     tag_id: Optional[int] = Query(default=None, description="标签ID筛选"),
+    cursor: Optional[str] = Query(default=None, description="游标分页：传空字符串获取第一页，之后传上一页返回的 next_cursor；不传则使用页码分页"),
+    with_total: bool = Query(default=False, description="游标分页时是否返回总数（缓存值）"),
     db: Session = Depends(get_db)
 ):
     # 过滤掉处理失败的项目（ProcessedFile.status == 'failed'）
@@ -68,58 +141,44 @@ def list_projects(
         ProcessedFileModel, ProjectModel.processed_file_id == ProcessedFileModel.id
     ).filter(
         or_(ProcessedFileModel.id == None, ProcessedFileModel.status != "failed")
-    ).order_by(ProjectModel.id.desc())
+    )
     
-    # 如果指定了标签ID，则筛选包含该标签的项目
+    # 如果指定了标签ID，则筛选包含该标签的项目（EXISTS 子查询，不会产生重复行）
     if tag_id is not None:
-        from app.models.tag import Tag as TagModel
-        query = query.join(ProjectModel.tags).filter(TagModel.id == tag_id)
+        query = query.filter(ProjectModel.tags.any(TagModel.id == tag_id))
     
+    # 一次查询带出 processed_file / static_file / cover_image，标签用一条 IN 查询批量加载
+    eager_options = (
+        contains_eager(ProjectModel.processed_file),
+        joinedload(ProjectModel.static_file),
+        joinedload(ProjectModel.cover_image),
+        selectinload(ProjectModel.tags),
+    )
+
+    # 游标分页：按 ID 倒序，不需要 OFFSET，总数可选且来自缓存
+    if cursor is not None:
+        projects, next_cursor = keyset_page(query.options(*eager_options), ProjectModel.id, cursor, page_size)
+        return {
+            "code": 200,
+            "data": [_serialize_project(project) for project in projects],
+            "pagination": {
+                "page_size": page_size,
+                "next_cursor": next_cursor,
+                "has_next": next_cursor is not None,
+                "total": project_counts.get(("projects", tag_id), query.count) if with_total else None
+            },
+            "msg": "请求成功"
+        }
+
     # 获取项目总数
     total = query.count()
     
     # 计算跳过的记录数
     skip = (page - 1) * page_size
-    projects = query.offset(skip).limit(page_size).all()
+    projects = query.options(*eager_options).order_by(ProjectModel.id.desc()).offset(skip).limit(page_size).all()
 
     # 构建返回结果
-    result = []
-    for project in projects:
-        static_file = project.static_file
-        processed_file = project.processed_file
-        cover_image = project.cover_image
-
-        result.append({
-            "id": project.id,
-            "name": project.name,
-            "processed_file": {
-                "id": processed_file.id if processed_file else None,
-                "file_id": processed_file.file_id if processed_file else None,
-                "folder_path": processed_file.folder_path if processed_file else None,
-                "status": processed_file.status if processed_file else None,
-                "result_url": processed_file.result_url if processed_file else None,
-                "algorithm": processed_file.algorithm if processed_file else None
-            } if processed_file else {},
-            "static_file": {
-                "id": static_file.id if static_file else None,
-                "path": static_file.path if static_file else None,
-                "filename": static_file.filename if static_file else None,
-                "original_filename": static_file.original_filename if static_file else None,
-            } if static_file else {},
-            "cover_image": {
-                "id": cover_image.id if cover_image else None,
-                "path": cover_image.path if cover_image else None,
-                "filename": cover_image.filename if cover_image else None,
-                "original_filename": cover_image.original_filename if cover_image else None
-            } if cover_image else {},
-            "tags": [
-                {
-                    "id": tag.id,
-                    "name": tag.name,
-                    "color": tag.color
-                } for tag in project.tags
-            ]
-        })
+    result = [_serialize_project(project) for project in projects]
 
     # 计算总页数
     total_pages = (total + page_size - 1) // page_size if total > 0 else 0
@@ -191,8 +250,10 @@ def get_project_statistics(db: Session = Depends(get_db)):
         "msg": "获取项目统计信息成功"
     }
 
-@router.delete("/projects/{project_id}", response_model=bool)
-async def delete_project(project_id: int, db: Session = Depends(get_db)):
+def _delete_project_records(project_id: int, db: Session) -> Tuple[List[str], List[Tuple[str, str]]]:
+    """删除项目相关的数据库记录，返回提交后需要删除的目录与文件（在 io_pool 中删除）"""
+    folders_to_remove: List[str] = []
+    files_to_remove: List[Tuple[str, str]] = []
     project = db.query(ProjectModel).filter(ProjectModel.id == project_id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -231,21 +292,17 @@ async def delete_project(project_id: int, db: Session = Depends(get_db)):
     except Exception:
         is_imported_project = False
 
-    # 1) 处理 ProcessedFile：标记失败并清理目录
+    # 1) 处理 ProcessedFile：标记失败，记录要清理的目录
     if processed_file:
         # 删除训练/结果目录
-        try:
-            folder_abs = os.path.abspath(processed_file.folder_path) if processed_file.folder_path else None
-            if folder_abs and os.path.exists(folder_abs):
-                # 导入项目：优先删除其父级 *_extracted 目录，避免残留根目录
-                parent_dir = os.path.dirname(folder_abs)
-                if is_imported_project and os.path.basename(parent_dir).endswith("_extracted"):
-                    if os.path.exists(parent_dir):
-                        shutil.rmtree(parent_dir, ignore_errors=False)
-                else:
-                    shutil.rmtree(folder_abs, ignore_errors=False)
-        except Exception as e:
-            print(f"删除项目目录失败(project_id={project_id}, path={processed_file.folder_path}): {str(e)}")
+        folder_abs = os.path.abspath(processed_file.folder_path) if processed_file.folder_path else None
+        if folder_abs:
+            # 导入项目：优先删除其父级 *_extracted 目录，避免残留根目录
+            parent_dir = os.path.dirname(folder_abs)
+            if is_imported_project and os.path.basename(parent_dir).endswith("_extracted"):
+                folders_to_remove.append(parent_dir)
+            else:
+                folders_to_remove.append(folder_abs)
 
         # 标记状态为 failed
         processed_file.status = "failed"
@@ -258,20 +315,13 @@ async def delete_project(project_id: int, db: Session = Depends(get_db)):
         db.flush()
 
     # 2) 删除封面图与ZIP文件
-    def _safe_remove_file(path: str, label: str):
-        try:
-            if path and os.path.exists(path):
-                os.remove(path)
-        except Exception as e:
-            print(f"删除{label}失败(path={path}): {str(e)}")
-
     # 导入项目：删除封面与ZIP文件；训练项目：保留
     if is_imported_project:
         if cover_static:
-            _safe_remove_file(cover_static.path, "封面图文件")
+            files_to_remove.append((cover_static.path, "封面图文件"))
         if project_file_static:
             # 对导入项目，这个文件是ZIP
-            _safe_remove_file(project_file_static.path, "ZIP文件")
+            files_to_remove.append((project_file_static.path, "ZIP文件"))
 
     # 3) 删除 StaticFile 记录（如果存在）
     # 导入项目：删除 StaticFile 记录；训练项目：保留数据资源与封面图
@@ -282,10 +332,33 @@ async def delete_project(project_id: int, db: Session = Depends(get_db)):
             db.delete(project_file_static)
 
     # 4) 删除 Project 记录
+    task_projects.discard_project(project.processed_file_id, project.id)
     db.delete(project)
 
     # 5) 提交事务
     db.commit()
+    return folders_to_remove, files_to_remove
+
+def _remove_project_files(project_id: int, folders: List[str], files: List[Tuple[str, str]]) -> None:
+    for folder in folders:
+        try:
+            if os.path.exists(folder):
+                shutil.rmtree(folder, ignore_errors=False)
+        except Exception as e:
+            print(f"删除项目目录失败(project_id={project_id}, path={folder}): {str(e)}")
+    for path, label in files:
+        try:
+            if path and os.path.exists(path):
+                os.remove(path)
+        except Exception as e:
+            print(f"删除{label}失败(path={path}): {str(e)}")
+
+@router.delete("/projects/{project_id}", response_model=bool)
+async def delete_project(project_id: int, db: Session = Depends(get_db)):
+    # 先在 db_pool 中删除记录并提交，再在 io_pool 中删除目录与文件
+    folders, files = await db_pool.run(_delete_project_records, project_id, db)
+    project_counts.invalidate()
+    await io_pool.run(_remove_project_files, project_id, folders, files)
 
     # 6) 广播通知
     await manager.broadcast({
@@ -296,12 +369,75 @@ async def delete_project(project_id: int, db: Session = Depends(get_db)):
     return True
 
 
+async def _save_upload(upload: UploadFile, path: str):
+    """分块异步保存上传文件"""
+    async with aiofiles.open(path, "wb") as f:
+        while True:
+            chunk = await upload.read(SAVE_CHUNK_SIZE)
+            if not chunk:
+                break
+            await f.write(chunk)
+
+def _remove_files(*paths: str):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+def _create_imported_project(
+    db: Session,
+    name: str,
+    cover_image: Tuple[str, str, str],
+    zip_file: Tuple[str, str, str],
+    project_dir: str,
+    relative_ply_path: str
+) -> ProjectModel:
+    """创建导入项目的数据库记录；cover_image / zip_file 为 (路径, 文件名, 原始文件名)"""
+    # 3. 创建封面图与 ZIP 文件的静态文件记录
+    cover_image_static = StaticFileModel(
+        path=cover_image[0],
+        filename=cover_image[1],
+        original_filename=cover_image[2]
+    )
+    db.add(cover_image_static)
+    zip_static = StaticFileModel(
+        path=zip_file[0],
+        filename=zip_file[1],
+        original_filename=zip_file[2]
+    )
+    db.add(zip_static)
+    db.flush()
+    
+    # 4. 创建处理文件记录
+    processed_file = ProcessedFileModel(
+        file_id=zip_static.id,
+        folder_path=project_dir,
+        status="trained",  # 已经训练完成的项目
+        result_url=relative_ply_path  # 设置正确的 PLY 文件路径
+    )
+    db.add(processed_file)
+    db.flush()
+    
+    # 5. 创建项目
+    new_project = ProjectModel(
+        name=name,
+        processed_file_id=processed_file.id,
+        static_file_id=zip_static.id,
+        project_cover_image_static_id=cover_image_static.id
+    )
+    db.add(new_project)
+    db.commit()
+    db.refresh(new_project)
+    # 在线程池中加载标签，避免序列化响应时在事件循环上懒加载
+    new_project.tags
+    return new_project
+
 @router.post("/projects/import", response_model=Project)
 async def import_project(
     name: str = Form(...),
     root_dir: str = Form(...),
     cover_image: UploadFile = File(...),
     zip_file: UploadFile = File(...),
+    import_id: Optional[str] = Form(None),
     db: Session = Depends(get_db)
 ):
     """
@@ -312,6 +448,7 @@ async def import_project(
     - root_dir: 压缩包中符合项目结构要求的文件夹名称
     - cover_image: 项目封面图
     - zip_file: 项目压缩包
+    - import_id: 可选，SSE 进度消息（project_import_progress）中携带的标识，默认自动生成
     
     返回:
     - 创建的项目信息
@@ -320,109 +457,64 @@ async def import_project(
     unique_id = str(uuid.uuid4())[:8]
     timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
     unique_prefix = f"{timestamp}_{unique_id}"
-    
-    # 1. 保存封面图
-    cover_image_ext = os.path.splitext(cover_image.filename)[1]
-    cover_image_filename = f"{unique_prefix}_cover{cover_image_ext}"
-    cover_image_path = os.path.join("uploads", cover_image_filename)
+    import_id = import_id or unique_prefix
     
     # 确保上传目录存在
     os.makedirs("uploads", exist_ok=True)
     
-    # 保存封面图文件
-    with open(cover_image_path, "wb") as f:
-        shutil.copyfileobj(cover_image.file, f)
-    
-    # 创建封面图的静态文件记录
-    cover_image_static = StaticFileModel(
-        path=cover_image_path,
-        filename=cover_image_filename,
-        original_filename=cover_image.filename
-    )
-    db.add(cover_image_static)
-    db.flush()
-    
-    # 2. 保存并解压ZIP文件
+    # 1. 保存封面图与 ZIP 文件（异步分块写入，不阻塞事件循环）
+    cover_image_ext = os.path.splitext(cover_image.filename)[1]
+    cover_image_filename = f"{unique_prefix}_cover{cover_image_ext}"
+    cover_image_path = os.path.join("uploads", cover_image_filename)
     zip_ext = os.path.splitext(zip_file.filename)[1]
     zip_filename = f"{unique_prefix}_project{zip_ext}"
     zip_path = os.path.join("uploads", zip_filename)
-    
-    # 保存ZIP文件
-    with open(zip_path, "wb") as f:
-        shutil.copyfileobj(zip_file.file, f)
-    
-    # 创建ZIP文件的静态文件记录
-    zip_static = StaticFileModel(
-        path=zip_path,
-        filename=zip_filename,
-        original_filename=zip_file.filename
-    )
-    db.add(zip_static)
-    db.flush()
-    
-    # 3. 解压并验证项目结构
     extract_dir = os.path.join("uploads", f"{unique_prefix}_extracted")
-    os.makedirs(extract_dir, exist_ok=True)
-    
-    # 解压ZIP文件
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(extract_dir)
-    
-    # 验证项目结构
-    project_dir = os.path.join(extract_dir, root_dir)
-    cameras_json_path = os.path.join(project_dir, "cameras.json")
-    point_cloud_dir = os.path.join(project_dir, "point_cloud")
-    iteration_30000_dir = os.path.join(point_cloud_dir, "iteration_30000")
-    point_cloud_ply = os.path.join(iteration_30000_dir, "point_cloud.ply")
-    
-    # 检查必要的文件和目录是否存在
-    if not os.path.exists(cameras_json_path):
-        raise HTTPException(status_code=400, detail="项目结构无效：缺少 cameras.json 文件")
+    await _save_upload(cover_image, cover_image_path)
+    await _save_upload(zip_file, zip_path)
     
-    if not os.path.exists(point_cloud_dir):
-        raise HTTPException(status_code=400, detail="项目结构无效：缺少 point_cloud 目录")
-    
-    if not os.path.exists(iteration_30000_dir):
-        raise HTTPException(status_code=400, detail="项目结构无效：缺少 iteration_30000 目录")
+    # 2. 读取 ZIP 中央目录校验项目结构，再在线程池中并行解压需要的文件
+    def report_progress(done: int, total: int):
+        event_bus.publish({
+            "type": "project_import_progress",
+            "import_id": import_id,
+            "stage": "extracting",
+            "progress": done * 100 // total if total else 100,
+            "bytes_done": done,
+            "bytes_total": total
+        })
     
-    if not os.path.exists(point_cloud_ply):
-        raise HTTPException(status_code=400, detail="项目结构无效：缺少 point_cloud.ply 文件")
+    try:
+        plan = await io_pool.run(import_archive, zip_path, root_dir, extract_dir, report_progress)
+    except (ProjectImportError, zipfile.BadZipFile) as e:
+        await io_pool.run(_remove_files, cover_image_path, zip_path)
+        await manager.broadcast({"type": "project_import_failed", "import_id": import_id, "msg": str(e)})
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        await io_pool.run(_remove_files, cover_image_path, zip_path)
+        await manager.broadcast({"type": "project_import_failed", "import_id": import_id, "msg": str(e)})
+        raise HTTPException(status_code=500, detail=f"解压项目失败: {str(e)}")
     
+    project_dir = os.path.join(extract_dir, plan.root_dir)
     # 构建相对路径的 result_url，用于前端访问
-    relative_ply_path = os.path.join(
-        os.path.basename(extract_dir),
-        root_dir,
-        "point_cloud",
-        "iteration_30000",
-        "point_cloud.ply"
-    )
-    
-    # 4. 创建处理文件记录
-    processed_file = ProcessedFileModel(
-        file_id=zip_static.id,
-        folder_path=project_dir,
-        status="trained",  # 已经训练完成的项目
-        result_url=relative_ply_path  # 设置正确的 PLY 文件路径
+    relative_ply_path = os.path.join(os.path.basename(extract_dir), plan.point_cloud_path)
+    new_project = await db_pool.run(
+        _create_imported_project,
+        db,
+        name,
+        (cover_image_path, cover_image_filename, cover_image.filename),
+        (zip_path, zip_filename, zip_file.filename),
+        project_dir,
+        relative_ply_path
     )
-    db.add(processed_file)
-    db.flush()
-    
-    # 5. 创建项目
-    new_project = ProjectModel(
-        name=name,
-        processed_file_id=processed_file.id,
-        static_file_id=zip_static.id,
-        project_cover_image_static_id=cover_image_static.id
-    )
-    db.add(new_project)
-    db.commit()
-    db.refresh(new_project)
+    project_counts.invalidate()
     
     # 6. 发送通知
     await manager.broadcast({
         "type": "project_updated",
         "action": "create",
-        "project_id": new_project.id
+        "project_id": new_project.id,
+        "import_id": import_id
     })
     
     return new_project
\ No newline at end of file
@@ -1,20 +1,38 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Query
 from fastapi.responses import StreamingResponse
+from typing import Optional
 from app.sse.connection_manager import manager
 
 router = APIRouter()
 
 @router.get("/sse/projects")
-async def sse_projects(request: Request):
+async def sse_projects(
+    request: Request,
+    project_ids: Optional[str] = Query(default=None, description="只接收这些项目的消息，逗号分隔"),
+    types: Optional[str] = Query(default=None, description="只接收这些类型的消息，逗号分隔，如 project_updated,project_progress"),
+):
     """建立 SSE 连接，以接收项目更新通知"""
-    queue = await manager.connect(request)
+    try:
+        project_id_filter = {int(item) for item in project_ids.split(",") if item.strip()} if project_ids else None
+    except ValueError:
+        project_id_filter = None
+    type_filter = {item.strip() for item in types.split(",") if item.strip()} if types else None
+    # 浏览器自动重连时会带上最后收到的事件 ID，据此补发断线期间错过的消息
+    last_event_id_header = request.headers.get("last-event-id")
+    last_event_id = int(last_event_id_header) if last_event_id_header and last_event_id_header.isdigit() else None
+    client = await manager.connect(
+        request,
+        project_ids=project_id_filter,
+        event_types=type_filter,
+        last_event_id=last_event_id,
+    )
     
     return StreamingResponse(
-        manager.send_event(queue, request),
+        manager.send_event(client, request),
         media_type="text/event-stream",
         headers={
             'Cache-Control': 'no-cache',
             'Connection': 'keep-alive',
             'X-Accel-Buffering': 'no'  # Nginx 特殊设置
         }
-    )
\ No newline at end of file
+    )
@@ -1,25 +1,59 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
+import asyncio
 import os
 import ffmpeg
-import subprocess
-from fastapi.responses import FileResponse
 from app.models.database import get_db, SessionLocal
 from app.models.static_file import StaticFile as StaticFileModel
 from app.models.processed_file import ProcessedFile as ProcessedFileModel
 from app.models.segment_file import SegmentFile as SegmentFileModel
 from app.schemas.processed_file import ProcessedFile
 import traceback  # 添加这行
-from concurrent.futures import ThreadPoolExecutor
 import shutil
+import json
 from app.models.project import Project as ProjectModel
-import zipfile
 from app.sse.connection_manager import manager
-from threading import Event, Lock
+from app.sse.event_bus import event_bus, task_projects
+from app.tasks.scheduler import scheduler
+from app.tasks.job_queue import DurableJobQueue
+from app.tasks.pipeline import (
+    ConvertStage,
+    ExportStage,
+    ExtractFramesStage,
+    Pipeline,
+    PipelineContext,
+    PostProcessStage,
+    StageFailed,
+    TaskCancelled,
+    TrainStage,
+    read_timings,
+)
+from app.tasks.progress import ProgressReporter
+from app.splat.export import export_assets
+from app.splat.tiles import LOD_DIRNAME, MANIFEST_FILENAME, build_lod_tiles
+from app.splat.stats import get_ply_stats
+from app.core.static_files import conditional_file_response
+from app.core.uploads import UPLOAD_DIRECTORY, upload_path, upload_url
+from app.core.executors import db_pool, io_pool
+from app.models.mesh_export import MeshExport as MeshExportModel
+from app.models.segment_job import SegmentJob as SegmentJobModel
+from app.tasks.background_jobs import ACTIVE_STATUSES
+from app.tasks.mesh_export import mesh_export_key, mesh_export_service, resolve_mesh_inputs
+from app.tasks.segmentation import (
+    SEGMENT_BATCH_MAX_PROMPTS,
+    normalize_prompt,
+    resolve_segment_inputs,
+    segmentation_service,
+)
+from app.tasks.task_log import is_valid_stage_name, list_stage_logs, read_log
+from app.tasks.processes import forget_task_processes, terminate_task_processes
+from threading import Event
 import uuid
 import datetime
-from typing import Optional, Dict, List
-import signal
+from typing import Dict, List, Literal, Optional, Tuple
 import sys
 import logging
 
@@ -36,69 +70,14 @@ def debug_print(message):
 
 router = APIRouter()
 
-UPLOAD_DIRECTORY = "uploads/"
-GAUSSIAN_SPLATTING_DIRECTORY = "/workspace/gaussian-splatting/"
-GAUSTUDIO_DIRECTORY = "/workspace/gaustudio/"
-COB_GS_DIRECTORY = '/workspace/COB-GS/'
+# 可通过环境变量指向其他目录（例如用桩脚本代替 train.py 进行调度测试）
+GAUSSIAN_SPLATTING_DIRECTORY = os.environ.get("GAUSSIAN_SPLATTING_DIRECTORY", "/workspace/gaussian-splatting/")
 
 # 任务取消标志字典
 task_cancel_events = {}
 
-# 任务取消标志字典
-task_cancel_events = {}
-
-# 创建线程池
-thread_pool = ThreadPoolExecutor(max_workers=1)
-
-# 任务运行中的子进程记录（用于快速终止）
-# 注意：子进程以新的会话启动（start_new_session=True），便于通过进程组一次性杀死孙子进程
-task_processes: Dict[int, List[subprocess.Popen]] = {}
-task_proc_lock = Lock()
-
-
-def _register_process(task_id: int, process: subprocess.Popen) -> None:
-    with task_proc_lock:
-        task_processes.setdefault(task_id, []).append(process)
-
-
-def _unregister_process(task_id: int, process: subprocess.Popen) -> None:
-    with task_proc_lock:
-        processes = task_processes.get(task_id)
-        if processes and process in processes:
-            processes.remove(process)
-            if not processes:
-                task_processes.pop(task_id, None)
-
-
-def _terminate_task_processes(task_id: int, grace_seconds: float = 2.0) -> None:
-    """向任务的进程组发送终止信号，尽快结束正在进行的阶段。
-
-    先发 SIGTERM 给予优雅退出时间，随后用 SIGKILL 强制终止。
-    """
-    with task_proc_lock:
-        procs = list(task_processes.get(task_id, []))
-    if not procs:
-        return
-    # 先尝试 SIGTERM 到整个进程组
-    for p in procs:
-        try:
-            if p.poll() is None:
-                os.killpg(p.pid, signal.SIGTERM)
-        except Exception:
-            pass
-    # 等待一个很短的宽限期
-    try:
-        import time
-        time.sleep(max(0.0, min(grace_seconds, 5.0)))
-    except Exception:
-        pass
-    # 仍未退出则 SIGKILL
-    for p in procs:
-        try:
-            if p.poll() is None:
-                os.killpg(p.pid, signal.SIGKILL)
-        except Exception:
-            pass
+# 任务由 app.tasks.scheduler 中的多槽位调度器执行（ffmpeg / convert / train 分阶段限流），
+# 排队信息持久化在 processed_files 表中，由 job_queue 认领（在文件末尾创建）
 
 # 确保上传目录存在
 if not os.path.exists(UPLOAD_DIRECTORY):
@@ -109,10 +88,10 @@ def _find_latest_point_cloud_ply(absolute_output_folder: str) -> Optional[str]:
     """在输出目录内查找最新一次迭代的 point_cloud.ply，并返回相对 uploads 的 URL 路径。
 
     返回值示例："<folder_name>/results/point_cloud/iteration_30000/point_cloud.ply"
+    （导入项目为 "<前缀>_extracted/<根目录>/point_cloud/iteration_N/point_cloud.ply"）
     若找不到则返回 None。
     """
     try:
-        folder_name = os.path.basename(absolute_output_folder.rstrip(os.sep))
         # 候选基础目录：优先 results，其次根目录（兼容不同算法的 model_path 约定）
         base_candidates = [
             os.path.join(absolute_output_folder, "results"),
@@ -138,19 +117,175 @@ def _find_latest_point_cloud_ply(absolute_output_folder: str) -> Optional[str]:
             ply_path_abs = os.path.join(point_cloud_root, latest_dir, "point_cloud.ply")
             if os.path.isfile(ply_path_abs):
                 # 构造相对 uploads 的 URL
-                rel_from_output = os.path.relpath(ply_path_abs, start=os.path.join(absolute_output_folder))
-                return f"{folder_name}/{rel_from_output}"
+                return upload_url(ply_path_abs)
         return None
     except Exception:
         return None
 
 @router.get("/threeDGS/status/{task_id}")
 async def get_task_status(task_id: int, db: Session = Depends(get_db)):
-    debug_print(f"[threeDGS] 查询任务状态: task_id={task_id}")
+    # 实时进度通过 SSE 的 project_progress 事件推送，此接口仅用于兜底查询，不再逐次打印日志
+    return await db_pool.run(_task_status, task_id, db)
+
+def _task_status(task_id: int, db: Session) -> dict:
+    task = db.query(ProcessedFileModel).filter(ProcessedFileModel.id == task_id).first()
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    timings = read_timings(os.path.abspath(task.folder_path)) if task.folder_path else None
+    return {
+        "task_id": task.id,
+        "status": task.status,
+        "result_url": task.result_url,
+        # 压缩格式（可能为空），前端可按需选择
+        "splat_url": task.splat_url,
+        "compressed_url": task.compressed_url,
+        "lod_manifest_url": task.lod_manifest_url,
+        "timings": timings
+    }
+
+@router.get("/threeDGS/logs/{task_id}")
+def get_task_logs(
+    task_id: int,
+    stage: Optional[str] = Query(default=None, description="阶段名（extract/convert/train），默认最近的阶段"),
+    offset: Optional[int] = Query(default=None, ge=0, description="字节偏移，不传时返回末尾若干行"),
+    limit: int = Query(default=64 * 1024, ge=1, le=1024 * 1024, description="单次最多读取的字节数"),
+    db: Session = Depends(get_db)
+):
+    """增量读取任务各阶段的子进程输出，前端以返回的 next_offset 作为下一次请求的 offset"""
+    task = db.query(ProcessedFileModel).filter(ProcessedFileModel.id == task_id).first()
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    absolute_output_folder = os.path.abspath(task.folder_path)
+    stages = list_stage_logs(absolute_output_folder)
+    if stage is None:
+        if not stages:
+            return {"task_id": task_id, "stages": [], "stage": None, "offset": 0, "next_offset": 0, "size": 0, "lines": []}
+        stage = stages[-1]
+    if not is_valid_stage_name(stage):
+        raise HTTPException(status_code=400, detail="Invalid stage")
+    result = read_log(task_id, absolute_output_folder, stage, offset, limit)
+    return {"task_id": task_id, "stages": stages, **result}
+
+@router.get("/threeDGS/stats/{task_id}")
+def get_task_stats(task_id: int, db: Session = Depends(get_db)):
+    """点云统计：高斯数量、包围盒、不透明度直方图、文件大小（按文件修改时间缓存）"""
     task = db.query(ProcessedFileModel).filter(ProcessedFileModel.id == task_id).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    return {"task_id": task.id, "status": task.status, "result_url": task.result_url}
+    result_url = _find_latest_point_cloud_ply(os.path.abspath(task.folder_path)) or task.result_url
+    ply_path = upload_path(result_url) if result_url else None
+    try:
+        stats = get_ply_stats(ply_path) if ply_path else None
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"无法解析点云文件: {str(e)}")
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Point cloud not found")
+    return {"task_id": task_id, "result_url": result_url, **stats}
+
+
+# 按需补建 LOD 分块的后台任务（task_id -> asyncio.Task），同一任务只构建一次
+_lod_builds: Dict[int, asyncio.Task] = {}
+# 补建失败记录（task_id -> ((点云路径, 修改时间), 状态码, 错误信息)），点云文件未变化时不再重复构建
+_lod_failures: Dict[int, Tuple[Tuple[str, int], int, str]] = {}
+
+
+def _lod_manifest_state(task_id: int, db: Session) -> Tuple[Optional[str], Optional[Tuple[str, int]]]:
+    """返回 (已有 LOD 清单的绝对路径, None)；需要补建时返回 (None, (点云路径, 修改时间))。
+
+    任务未训练或没有点云时抛出 HTTP 错误。
+    """
+    task = db.query(ProcessedFileModel).filter(ProcessedFileModel.id == task_id).first()
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if task.lod_manifest_url:
+        manifest_path = upload_path(task.lod_manifest_url)
+        if os.path.isfile(manifest_path):
+            return manifest_path, None
+    if task.status != "trained":
+        raise HTTPException(status_code=409, detail="Task is not trained yet")
+    result_url = _find_latest_point_cloud_ply(os.path.abspath(task.folder_path))
+    if not result_url:
+        raise HTTPException(status_code=404, detail="Point cloud not found")
+    ply_path = upload_path(result_url)
+    try:
+        return None, (ply_path, os.stat(ply_path).st_mtime_ns)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Point cloud not found")
+
+
+def _build_lod_manifest(task_id: int) -> None:
+    """为训练早于分块功能（或分块已被删除）的任务补建 LOD 分块并记录清单 URL，在 I/O 线程池中执行"""
+    db = SessionLocal()
+    try:
+        task = db.query(ProcessedFileModel).filter(ProcessedFileModel.id == task_id).first()
+        result_url = _find_latest_point_cloud_ply(os.path.abspath(task.folder_path)) if task else None
+        if not result_url:
+            return
+        ply_path = upload_path(result_url)
+        manifest_path = os.path.join(os.path.dirname(ply_path), LOD_DIRNAME, MANIFEST_FILENAME)
+        if not os.path.isfile(manifest_path):
+            # 与训练后的导出阶段共用并发名额，避免补建与导出同时占满 CPU / 内存
+            with scheduler.stage("export"):
+                manifest_path = build_lod_tiles(ply_path)
+        task.lod_manifest_url = upload_url(manifest_path)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _run_lod_build(task_id: int, ply_key: Tuple[str, int]) -> None:
+    try:
+        await io_pool.run(_build_lod_manifest, task_id)
+        _lod_failures.pop(task_id, None)
+        await manager.broadcast({"type": "lod_ready", "task_id": task_id})
+    except Exception as e:
+        print(f"[threeDGS] 补建 LOD 分块失败 (task_id={task_id}): {str(e)}")
+        # 点云无法解析时返回 422，其他错误返回 500；记录后客户端轮询不会反复触发构建
+        status_code = 422 if isinstance(e, ValueError) else 500
+        _lod_failures[task_id] = (ply_key, status_code, str(e))
+        await manager.broadcast({"type": "lod_failed", "task_id": task_id, "error": str(e)})
+    finally:
+        _lod_builds.pop(task_id, None)
+
+
+def _read_json(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@router.get("/threeDGS/lod/{task_id}")
+async def get_lod_manifest(task_id: int, db: Session = Depends(get_db)):
+    """返回 LOD 分块清单；分块通过 base_url + tile.url 获取，先加载第 0 级再逐级细化。
+
+    清单不存在时在后台补建并返回 202，完成后推送 SSE 消息 lod_ready，客户端随后重新请求；
+    补建失败时推送 lod_failed，之后的请求返回 422（点云无法解析）或 500，直到点云文件发生变化。
+    """
+    manifest_path, ply_key = await db_pool.run(_lod_manifest_state, task_id, db)
+    if manifest_path is None:
+        failure = _lod_failures.get(task_id)
+        if failure and failure[0] == ply_key:
+            raise HTTPException(status_code=failure[1], detail=f"LOD build failed: {failure[2]}")
+        if task_id not in _lod_builds:
+            _lod_builds[task_id] = asyncio.create_task(_run_lod_build(task_id, ply_key))
+        return JSONResponse(status_code=202, content={"task_id": task_id, "status": "building"}, headers={"Retry-After": "2"})
+    manifest = await io_pool.run(_read_json, manifest_path)
+    return {**manifest, "task_id": task_id, "base_url": f"/threeDGS/lod/{task_id}/tiles/"}
+
+
+@router.api_route("/threeDGS/lod/{task_id}/tiles/{tile_path:path}", methods=["GET", "HEAD"])
+def get_lod_tile(task_id: int, tile_path: str, request: Request, db: Session = Depends(get_db)):
+    task = db.query(ProcessedFileModel).filter(ProcessedFileModel.id == task_id).first()
+    if not task or not task.lod_manifest_url:
+        raise HTTPException(status_code=404, detail="LOD tiles not found")
+    lod_dir = os.path.dirname(upload_path(task.lod_manifest_url))
+    tile_location = os.path.realpath(os.path.join(lod_dir, tile_path))
+    # 安全检查：只能访问 LOD 目录内的文件
+    if os.path.commonpath([tile_location, os.path.realpath(lod_dir)]) != os.path.realpath(lod_dir):
+        raise HTTPException(status_code=403, detail="Access denied")
+    if not os.path.isfile(tile_location):
+        raise HTTPException(status_code=404, detail="Tile not found")
+    # 重新训练或重建分块后内容会变化，通过 ETag 重新验证
+    return conditional_file_response(request, tile_location, os.stat(tile_location))
 
 def clean_failed_task_results(folder_path: str):
     """清理失败任务的结果文件"""
@@ -163,6 +298,9 @@ def clean_failed_task_results(folder_path: str):
 
 @router.post("/threeDGS/createThreeDGS", response_model=ProcessedFile)
 async def create_three_dgs(file_id: int, algorithm: str = "3dgs", db: Session = Depends(get_db)):
+    return await db_pool.run(_create_three_dgs, file_id, algorithm, db)
+
+def _create_three_dgs(file_id: int, algorithm: str, db: Session) -> ProcessedFileModel:
     debug_print(f"[threeDGS] 收到创建请求: file_id={file_id}, algorithm={algorithm}")
     # 获取文件信息
     static_file = db.query(StaticFileModel).filter(StaticFileModel.id == file_id).first()
@@ -174,6 +312,18 @@ async def create_three_dgs(file_id: int, algorithm: str = "3dgs", db: Session =
     completed_task = next((task for task in processed_files if task.status == "trained" and task.algorithm == algorithm), None)
     if completed_task:
         return completed_task
+    # 内容相同的其他文件已经用同一算法训练完成时直接复用其结果
+    if static_file.sha256:
+        same_content_task = db.query(ProcessedFileModel).join(
+            StaticFileModel, StaticFileModel.id == ProcessedFileModel.file_id
+        ).filter(
+            StaticFileModel.sha256 == static_file.sha256,
+            StaticFileModel.size == static_file.size,
+            ProcessedFileModel.status == "trained",
+            ProcessedFileModel.algorithm == algorithm
+        ).order_by(ProcessedFileModel.id.desc()).first()
+        if same_content_task:
+            return same_content_task
     # 检查是否有正在处理的任务
     running_task = next((task for task in processed_files if task.status not in ["failed", "trained"] and task.algorithm == algorithm), None)
     if running_task:
@@ -183,11 +333,6 @@ async def create_three_dgs(file_id: int, algorithm: str = "3dgs", db: Session =
         if failed_task.status == "failed" and failed_task.algorithm == algorithm:
             clean_failed_task_results(failed_task.folder_path)
     db.commit()
-    # 检查当前是否有正在运行的任务 (pending, imaged, converted)
-    active_task_exists = db.query(ProcessedFileModel).filter(
-        ProcessedFileModel.status.in_(["pending", "imaged", "converted"]),
-        ProcessedFileModel.algorithm == algorithm
-    ).first() is not None
     # 创建新任务 - 修改目录命名逻辑，确保唯一性
     base_folder_name = os.path.splitext(os.path.basename(static_file.path))[0]
     # 生成唯一标识符
@@ -200,386 +345,307 @@ async def create_three_dgs(file_id: int, algorithm: str = "3dgs", db: Session =
         os.makedirs(output_folder)
     if not os.path.exists(os.path.join(output_folder, 'input')):
         os.makedirs(os.path.join(output_folder, 'input'))
-    # 存储处理结果
+    # 存储处理结果，任务先进入排队状态，由调度器在有空闲名额时启动
     new_processed_file = ProcessedFileModel(
         file_id=file_id, 
         folder_path=output_folder, 
-        status="queued" if active_task_exists else "pending",
+        status="queued",
         result_url=None,
         algorithm=algorithm
     )
     db.add(new_processed_file)
     db.commit()
     db.refresh(new_processed_file)
-    # 将 output_folder 转换为绝对路径
-    absolute_output_folder = os.path.abspath(output_folder)
-    # 构建输出模式
-    output_pattern = os.path.join(absolute_output_folder, 'input', "%04d.jpg")
-    # 如果没有其他活动任务，则启动当前任务
-    if new_processed_file.status == "pending":
-        thread_pool.submit(
-            run_task_in_thread, 
-            new_processed_file.id, 
-            absolute_output_folder, 
-            static_file.path,
-            output_pattern,
-            algorithm
-        )
+    # 通知持久化队列认领任务（任意 API 进程均可认领，调度器有空闲名额时开始执行）
+    job_queue.wake()
     return new_processed_file
 
 
+def _run_queued_task(task_id: int) -> None:
+    """持久化队列认领到任务后的执行入口"""
+    db = SessionLocal()
+    try:
+        task = db.query(ProcessedFileModel).filter(ProcessedFileModel.id == task_id).first()
+        if not task:
+            return
+        static_file = db.query(StaticFileModel).filter(StaticFileModel.id == task.file_id).first()
+        if not static_file:
+            print(f"错误：无法为排队任务 {task_id} 找到关联的 StaticFileModel。")
+            task.status = "failed"
+            db.commit()
+            return
+        # 将 output_folder 转换为绝对路径
+        absolute_output_folder = os.path.abspath(task.folder_path)
+        os.makedirs(os.path.join(absolute_output_folder, 'input'), exist_ok=True)
+        # 构建输出模式
+        output_pattern = os.path.join(absolute_output_folder, 'input', "%04d.jpg")
+        input_video_path = static_file.path
+        algorithm = task.algorithm or "3dgs"
+    finally:
+        db.close()
+    run_task_in_thread(task_id, absolute_output_folder, input_video_path, output_pattern, algorithm)
+
+
+def _on_lease_lost(task_id: int) -> None:
+    """租约被其他进程接管时停止本进程中的执行，避免同一任务被重复训练"""
+    if task_id in task_cancel_events:
+        task_cancel_events[task_id].set()
+    terminate_task_processes(task_id, grace_seconds=0.0)
+
+
+def _build_algorithm_commands(algorithm: str, absolute_output_folder: str):
+    """根据算法类型返回 (工作目录, 转换命令, 训练命令)，未知算法抛出 ValueError"""
+    model_path = os.path.join(absolute_output_folder, 'results')
+    if algorithm == "3dgs":
+        work_dir = GAUSSIAN_SPLATTING_DIRECTORY
+        convert_py = os.path.join(work_dir, 'convert.py')
+        train_py = os.path.join(work_dir, 'train.py')
+        convert_command = f"python {convert_py} -s {absolute_output_folder}" if os.path.exists(convert_py) else None
+        train_command = f"python {train_py} -s {absolute_output_folder} --model_path {model_path}"
+    elif algorithm == "lp-3dgs":
+        work_dir = "/workspace/LP-3DGS/"
+        convert_py = os.path.join(work_dir, 'convert.py')
+        train_py = os.path.join(work_dir, 'train.py')
+        convert_command = f"python {convert_py} -s {absolute_output_folder}" if os.path.exists(convert_py) else None
+        train_command = f"python {train_py} -s {absolute_output_folder} --model_path {model_path} --prune_method rad_splat"
+    elif algorithm == "gaussianpro":
+        work_dir = "/workspace/GaussianPro/"
+        work_dir_3dgs = GAUSSIAN_SPLATTING_DIRECTORY
+        convert_py = os.path.join(work_dir_3dgs, 'convert.py')
+        train_py = os.path.join(work_dir, 'train.py')
+        convert_command = f"python {convert_py} -s {absolute_output_folder}" if os.path.exists(convert_py) else None
+        train_command = f"python {train_py} -s {absolute_output_folder} --model_path {model_path}"
+    elif algorithm == "dashgaussian":
+        work_dir = "/workspace/DashGaussian/"
+        convert_py = os.path.join(work_dir, 'convert.py')
+        train_dash_py = os.path.join(work_dir, 'train_dash.py')
+        train_fallback_py = os.path.join(work_dir, 'train.py')
+        convert_command = f"python {convert_py} -s {absolute_output_folder}" if os.path.exists(convert_py) else None
+        if os.path.exists(train_dash_py):
+            train_command = f"python {train_dash_py} -s {absolute_output_folder} --model_path {model_path} --disable_viewer"
+        else:
+            train_command = f"python {train_fallback_py} -s {absolute_output_folder} --model_path {model_path} --dash --disable_viewer"
+    else:
+        raise ValueError(f"未知算法类型: {algorithm}")
+    return work_dir, convert_command, train_command
+
+
+def _resolve_result_url(ctx: PipelineContext) -> str:
+    # 动态查找最新的 point_cloud.ply
+    dynamic_result_url = _find_latest_point_cloud_ply(ctx.absolute_output_folder)
+    if dynamic_result_url:
+        return dynamic_result_url
+    # 兜底：保持旧逻辑（可能不存在，但能帮助排查）
+    return upload_url(os.path.join(ctx.absolute_output_folder, "results", "point_cloud", "iteration_30000", "point_cloud.ply"))
+
+
+def _export_compressed_assets(ctx: PipelineContext) -> dict:
+    """把最新的 point_cloud.ply 导出为 .splat 与压缩 PLY，返回需要写入任务记录的 URL"""
+    result_url = _find_latest_point_cloud_ply(ctx.absolute_output_folder)
+    if not result_url:
+        return {}
+    outputs = export_assets(upload_path(result_url))
+    return {
+        "splat_url": upload_url(outputs["splat"]),
+        "compressed_url": upload_url(outputs["compressed"]),
+    }
+
+
+def _build_lod_tiles(ctx: PipelineContext) -> dict:
+    """按最新的 point_cloud.ply 生成 LOD 分块，返回清单 URL"""
+    result_url = _find_latest_point_cloud_ply(ctx.absolute_output_folder)
+    if not result_url:
+        return {}
+    manifest_path = build_lod_tiles(upload_path(result_url))
+    return {"lod_manifest_url": upload_url(manifest_path)}
+
+
 def run_task_in_thread(task_id: int, absolute_output_folder: str, input_video_path: str, output_pattern: str, algorithm: str = "3dgs"):
-    def get_db_session():
-        db = SessionLocal()
-        try:
-            yield db
-        finally:
-            db.close()
     def send_status_update(db, task):
-        projects = db.query(ProjectModel).filter(ProjectModel.processed_file_id == task.id).all()
-        project_ids = [project.id for project in projects]
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            loop.run_until_complete(manager.broadcast({
-                "type": "project_updated",
-                "action": "status_changed",
-                "task_id": task.id,
-                "status": task.status,
-                "project_ids": project_ids
-            }))
-        finally:
-            loop.close()
+        # 通过事件总线交给主事件循环广播，项目 ID 取自缓存
+        event_bus.publish({
+            "type": "project_updated",
+            "action": "status_changed",
+            "task_id": task.id,
+            "status": task.status,
+            "project_ids": task_projects.get(task.id)
+        })
+
     # 创建/获取取消事件
     cancel_event = task_cancel_events.setdefault(task_id, Event())
     debug_print(f"[threeDGS] ===== 开始处理任务 {task_id} (算法: {algorithm}) =====")
+    db = SessionLocal()
     try:
-        db = next(get_db_session())
         task = db.query(ProcessedFileModel).filter(ProcessedFileModel.id == task_id).first()
-        # 1. FFmpeg处理视频（可中断）
-        try:
-            if cancel_event.is_set() or (task and task.status == "failed"):
-                debug_print(f"任务{task_id}已被取消，终止执行。")
-                return
-            ffmpeg_cmd = [
-                "ffmpeg",
-                "-y",
-                "-i",
-                input_video_path,
-                "-qscale",
-                "1",
-                "-qmin",
-                "1",
-                "-vf",
-                "fps=2",
-                output_pattern,
-            ]
-            ffmpeg_proc = subprocess.Popen(
-                ffmpeg_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,  # 合并 stderr 到 stdout
-                text=True,
-                encoding="utf-8",
-                errors="replace",
-                start_new_session=True,
-                bufsize=1,  # 行缓冲
-                universal_newlines=True,
-            )
-            _register_process(task_id, ffmpeg_proc)
-
-            # 实时打印 FFmpeg 输出
-            ffmpeg_output = []
-            for line in iter(ffmpeg_proc.stdout.readline, ""):
-                if cancel_event.is_set() or (task and task.status == "failed"):
-                    print(f"任务{task_id}已被取消，终止 FFmpeg 进程。")
-                    ffmpeg_proc.terminate()
-                    break
-                if line.rstrip():
-                    print(f"[threeDGS][FFmpeg][{task_id}] {line.rstrip()}")
-                    ffmpeg_output.append(line.rstrip())
-            ffmpeg_proc.wait()
-            _unregister_process(task_id, ffmpeg_proc)
-            if cancel_event.is_set() or (task and task.status == "failed"):
-                debug_print(f"任务{task_id}已被取消，终止执行。")
-                return
-            if ffmpeg_proc.returncode != 0:
-                print(f"[threeDGS] ffmpeg failed rc={ffmpeg_proc.returncode}")
-                print("[threeDGS] 最后 10 行 FFmpeg 输出:")
-                for msg in ffmpeg_output[-10:]:
-                    print(f"[threeDGS]   {msg}")
-                task.status = "failed"
-                db.commit()
-                send_status_update(db, task)
-                return
-            task.status = "imaged"
-            db.commit()
-            send_status_update(db, task)
-        except Exception as e:
-            print(f"FFmpeg处理失败: {str(e)}")
-            task.status = "failed"
-            db.commit()
-            send_status_update(db, task)
+        # 排队期间任务可能已被取消或删除
+        if not task or task.status == "failed":
+            debug_print(f"任务{task_id}已被取消，终止执行。")
             return
-        # 2. 构建命令和目录
-        if algorithm == "3dgs":
-            work_dir = GAUSSIAN_SPLATTING_DIRECTORY
-            convert_py = os.path.join(work_dir, 'convert.py')
-            train_py = os.path.join(work_dir, 'train.py')
-            convert_command = f"python {convert_py} -s {absolute_output_folder}" if os.path.exists(convert_py) else None
-            train_command = f"python {train_py} -s {absolute_output_folder} --model_path {os.path.join(absolute_output_folder, 'results')}"
-        elif algorithm == "lp-3dgs":
-            work_dir = "/workspace/LP-3DGS/"
-            convert_py = os.path.join(work_dir, 'convert.py')
-            train_py = os.path.join(work_dir, 'train.py')
-            convert_command = f"python {convert_py} -s {absolute_output_folder}" if os.path.exists(convert_py) else None
-            train_command = f"python {train_py} -s {absolute_output_folder} --model_path {os.path.join(absolute_output_folder, 'results')} --prune_method rad_splat"
-        elif algorithm == "gaussianpro":
-            work_dir = "/workspace/GaussianPro/"
-            work_dir_3dgs = GAUSSIAN_SPLATTING_DIRECTORY
-            convert_py = os.path.join(work_dir_3dgs, 'convert.py')
-            train_py = os.path.join(work_dir, 'train.py')
-            convert_command = f"python {convert_py} -s {absolute_output_folder}" if os.path.exists(convert_py) else None
-            train_command = f"python {train_py} -s {absolute_output_folder} --model_path {os.path.join(absolute_output_folder, 'results')}"
-        elif algorithm == "dashgaussian":
-            work_dir = "/workspace/DashGaussian/"
-            convert_py = os.path.join(work_dir, 'convert.py')
-            train_dash_py = os.path.join(work_dir, 'train_dash.py')
-            train_fallback_py = os.path.join(work_dir, 'train.py')
-            convert_command = f"python {convert_py} -s {absolute_output_folder}" if os.path.exists(convert_py) else None
-            if os.path.exists(train_dash_py):
-                train_command = f"python {train_dash_py} -s {absolute_output_folder} --model_path {os.path.join(absolute_output_folder, 'results')} --disable_viewer"
-            else:
-                train_command = f"python {train_fallback_py} -s {absolute_output_folder} --model_path {os.path.join(absolute_output_folder, 'results')} --dash --disable_viewer"
-        else:
-            print(f"未知算法类型: {algorithm}")
-            task.status = "failed"
+
+        def set_status(status: str, fields: Optional[dict] = None):
+            db.refresh(task)
+            if task.status == "failed":
+                # 其他进程通过取消接口结束了任务，不再覆盖其状态
+                if status == "failed":
+                    return
+                cancel_event.set()
+                raise TaskCancelled()
+            task.status = status
+            for key, value in (fields or {}).items():
+                setattr(task, key, value)
             db.commit()
             send_status_update(db, task)
+
+        set_status("pending")
+        try:
+            work_dir, convert_command, train_command = _build_algorithm_commands(algorithm, absolute_output_folder)
+        except ValueError as e:
+            print(str(e))
+            set_status("failed")
             return
-        # 3. 执行转换命令（如有）
+        # 特殊处理：GaussianPro 的 convert 需要 mask 目录
+        if algorithm == "gaussianpro":
+            os.makedirs(os.path.join(absolute_output_folder, "mask"), exist_ok=True)
         run_cwd = work_dir if os.path.isdir(work_dir) else None
-        if convert_command:
-            try:
-                debug_print(f"[threeDGS] 开始执行转换命令 (task_id={task_id}, algorithm={algorithm})")
-                debug_print(f"[threeDGS] 工作目录: {run_cwd}")
-                debug_print(f"[threeDGS] 转换命令: {convert_command}")
-                
-                # 检查输入目录状态
-                input_dir = os.path.join(absolute_output_folder, 'input')
-                if os.path.exists(input_dir):
-                    input_files = os.listdir(input_dir)
-                    debug_print(f"[threeDGS] 输入目录包含 {len(input_files)} 个文件")
-                    if len(input_files) > 0:
-                        debug_print(f"[threeDGS] 示例文件: {input_files[:3]}")
-                else:
-                    debug_print(f"[threeDGS] 警告：输入目录不存在: {input_dir}")
-                
-                # 特殊处理：GaussianPro 的 convert 需要 mask 目录
-                if algorithm == "gaussianpro":
-                    os.makedirs(os.path.join(absolute_output_folder, "mask"), exist_ok=True)
-                if cancel_event.is_set() or (task and task.status == "failed"):
-                    debug_print(f"任务{task_id}已被取消，终止执行。")
-                    return
-                convert_proc = subprocess.Popen(
-                    convert_command,
-                    shell=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,  # 合并 stderr 到 stdout
-                    text=True,
-                    encoding='utf-8',
-                    errors='replace',
-                    cwd=run_cwd,
-                    start_new_session=True,
-                    bufsize=1,  # 行缓冲
-                    universal_newlines=True,
-                )
-                _register_process(task_id, convert_proc)
-                
-                # 实时打印转换输出
-                convert_output = []
-                for line in iter(convert_proc.stdout.readline, ""):
-                    if cancel_event.is_set() or (task and task.status == "failed"):
-                        debug_print(f"任务{task_id}已被取消，终止转换进程。")
-                        convert_proc.terminate()
-                        break
-                    if line.rstrip():
-                        debug_print(f"[threeDGS][Convert][{task_id}] {line.rstrip()}")
-                        convert_output.append(line.rstrip())
-                convert_proc.wait()
-                _unregister_process(task_id, convert_proc)
-                if cancel_event.is_set() or (task and task.status == "failed"):
-                    debug_print(f"任务{task_id}已被取消，终止执行。")
-                    return
-                if convert_proc.returncode != 0:
-                    debug_print(f"[threeDGS] convert failed (algorithm={algorithm}) rc={convert_proc.returncode}")
-                    debug_print(f"[threeDGS] 最后 10 行转换输出:")
-                    for msg in convert_output[-10:]:
-                        debug_print(f"[threeDGS]   {msg}")
-                    task.status = "failed"
-                    db.commit()
-                    send_status_update(db, task)
-                    return
-                debug_print(f"[threeDGS] 转换命令成功完成 (task_id={task_id})")
-                task.status = "converted"
-                db.commit()
-                send_status_update(db, task)
-            except Exception as e:
-                print(f"convert命令执行错误: {str(e)}")
-                task.status = "failed"
-                db.commit()
-                send_status_update(db, task)
-                return
-        # 4. 执行训练命令
+        pipeline = Pipeline(scheduler, [
+            ExtractFramesStage(input_video_path, output_pattern),
+            ConvertStage(convert_command, cwd=run_cwd),
+            TrainStage(train_command, cwd=run_cwd),
+            ExportStage(_export_compressed_assets),
+            ExportStage(_build_lod_tiles, name="tiles"),
+            PostProcessStage(_resolve_result_url),
+        ])
+        progress = ProgressReporter(
+            task_id,
+            lambda payload: event_bus.publish({**payload, "project_ids": task_projects.get(task_id)}),
+        )
         try:
-            if cancel_event.is_set() or (task and task.status == "failed"):
-                debug_print(f"任务{task_id}已被取消，终止执行。")
-                return
-            train_proc = subprocess.Popen(
-                train_command,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                cwd=run_cwd,
-                start_new_session=True,
-                bufsize=1,
-                universal_newlines=True,
-            )
-            _register_process(task_id, train_proc)
-
-            # 实时打印训练输出
-            print(f"[threeDGS] 开始训练 (task_id={task_id})")
-            train_output = []
-            for line in iter(train_proc.stdout.readline, ""):
-                if cancel_event.is_set() or (task and task.status == "failed"):
-                    print(f"任务{task_id}已被取消，终止训练进程。")
-                    train_proc.terminate()
-                    break
-                if line.rstrip():
-                    print(f"[threeDGS][Train][{task_id}] {line.rstrip()}")
-                    train_output.append(line.rstrip())
-            train_proc.wait()
-            _unregister_process(task_id, train_proc)
-            if cancel_event.is_set() or (task and task.status == "failed"):
-                debug_print(f"任务{task_id}已被取消，终止执行。")
-                return
-            if train_proc.returncode != 0:
-                print(f"[threeDGS] train failed (algorithm={algorithm}) rc={train_proc.returncode}")
-                print(f"[threeDGS] 最后 10 行训练输出:")
-                for msg in train_output[-10:]:
-                    print(f"[threeDGS]   {msg}")
-                task.status = "failed"
-            else:
-                task.status = "trained"
-                # 动态查找最新的 point_cloud.ply
-                dynamic_result_url = _find_latest_point_cloud_ply(absolute_output_folder)
-                if dynamic_result_url:
-                    task.result_url = dynamic_result_url
-                else:
-                    # 兜底：保持旧逻辑（可能不存在，但能帮助排查）
-                    folder_name = os.path.basename(absolute_output_folder)
-                    task.result_url = f"{folder_name}/results/point_cloud/iteration_30000/point_cloud.ply"
-            db.commit()
-            send_status_update(db, task)
-        except Exception as e:
-            print(f"train命令执行错误: {str(e)}")
-            task.status = "failed"
-            db.commit()
-            send_status_update(db, task)
+            pipeline.run(PipelineContext(task_id, absolute_output_folder, cancel_event, progress), set_status)
+        except TaskCancelled:
+            debug_print(f"任务{task_id}已被取消，终止执行。")
+        except StageFailed as e:
+            print(f"[threeDGS] {str(e)} (algorithm={algorithm})")
+            print(f"[threeDGS] 最后 {len(e.tail)} 行 {e.stage} 输出:")
+            for msg in e.tail:
+                print(f"[threeDGS]   {msg}")
+            set_status("failed")
     except Exception as e:
         print(f"Process task 错误: {str(e)}")
         print(f"错误堆栈: ", traceback.format_exc())
-        db = next(get_db_session())
+        db.rollback()
         task = db.query(ProcessedFileModel).filter(ProcessedFileModel.id == task_id).first()
-        task.status = "failed"
-        db.commit()
-        send_status_update(db, task)
+        if task:
+            task.status = "failed"
+            db.commit()
+            send_status_update(db, task)
     finally:
+        # 排队中的任务由调度器在释放阶段名额后自动启动，无需在此接力
         db.close()
-        # 任务结束后，检查是否有排队的任务并启动
-        try:
-            next_db_session = SessionLocal()
-            queued_task = next_db_session.query(ProcessedFileModel).filter(
-                ProcessedFileModel.status == "queued"
-            ).order_by(ProcessedFileModel.id.asc()).first()
-            if queued_task:
-                print(f"找到排队任务: {queued_task.id}, 准备启动...")
-                static_file_for_queued_task = next_db_session.query(StaticFileModel).filter(StaticFileModel.id == queued_task.file_id).first()
-                if static_file_for_queued_task:
-                    absolute_output_folder_for_queued_task = os.path.abspath(queued_task.folder_path)
-                    output_pattern_for_queued_task = os.path.join(absolute_output_folder_for_queued_task, 'input', "%04d.jpg")
-                    queued_task.status = "pending"
-                    next_db_session.commit()
-                    thread_pool.submit(
-                        run_task_in_thread,
-                        queued_task.id,
-                        absolute_output_folder_for_queued_task,
-                        static_file_for_queued_task.path,
-                        output_pattern_for_queued_task,
-                        queued_task.algorithm
-                    )
-                    print(f"排队任务 {queued_task.id} 已提交执行。")
-                else:
-                    print(f"错误：无法为排队任务 {queued_task.id} 找到关联的 StaticFileModel。")
-                    queued_task.status = "failed"
-                    next_db_session.commit()
-                    # 可发送失败通知
-        except Exception as e:
-            print(f"启动排队任务时出错: {str(e)}")
-        finally:
-            next_db_session.close()
     # 任务结束后清理进程与取消事件
-    _terminate_task_processes(task_id, grace_seconds=0.0)
+    terminate_task_processes(task_id, grace_seconds=0.0)
     if task_id in task_cancel_events:
         del task_cancel_events[task_id]
 
 
-@router.post("/threeDGS/cancel/{task_id}")
-async def cancel_task(task_id: int, db: Session = Depends(get_db)):
+def _remove_task_folder(task_id: int, folder_path: Optional[str]) -> None:
+    """删除任务目录及其中所有数据"""
+    try:
+        folder_abs = os.path.abspath(folder_path) if folder_path else None
+        if folder_abs and os.path.exists(folder_abs):
+            shutil.rmtree(folder_abs, ignore_errors=False)
+    except Exception as e:
+        print(f"删除任务目录失败(task_id={task_id}): {str(e)}")
+
+
+def _delete_task_projects(task_id: int, db: Session) -> List[int]:
+    """删除关联的 projects 记录，返回被删除的项目 id"""
+    try:
+        related_projects = db.query(ProjectModel).filter(ProjectModel.processed_file_id == task_id).all()
+        deleted_ids = [p.id for p in related_projects]
+        for p in related_projects:
+            db.delete(p)
+        if related_projects:
+            db.commit()
+        return deleted_ids
+    except Exception as e:
+        print(f"删除关联项目记录失败(task_id={task_id}): {str(e)}")
+        return []
+
+
+def _mark_task_cancelled(task_id: int, db: Session) -> Tuple[bool, Optional[str]]:
+    """把未结束的任务标记为失败，返回 (是否需要清理, 任务目录)"""
     task = db.query(ProcessedFileModel).filter(ProcessedFileModel.id == task_id).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    if task.status not in ["trained", "failed"]:
-        task.status = "failed"
-        db.commit()
-        # 设置取消事件并立即终止正在运行的进程
+    if task.status in ["trained", "failed"]:
+        return False, None
+    folder_path = task.folder_path
+    task.status = "failed"
+    # 清除租约：任务在其他进程中执行时，其心跳会发现租约丢失并停止执行
+    task.lease_owner = None
+    task.lease_expires_at = None
+    db.commit()
+    return True, folder_path
+
+
+@router.post("/threeDGS/cancel/{task_id}")
+async def cancel_task(task_id: int, db: Session = Depends(get_db)):
+    cancelled, folder_path = await db_pool.run(_mark_task_cancelled, task_id, db)
+    if cancelled:
+        # 设置取消事件并立即终止正在运行的进程（等待进程退出与删除目录都在 I/O 线程池中执行）
         if task_id in task_cancel_events:
             task_cancel_events[task_id].set()
-        _terminate_task_processes(task_id)
-        # 删除任务目录及其中所有数据
-        try:
-            folder_abs = os.path.abspath(task.folder_path) if task.folder_path else None
-            if folder_abs and os.path.exists(folder_abs):
-                shutil.rmtree(folder_abs, ignore_errors=False)
-        except Exception as e:
-            print(f"删除任务目录失败(task_id={task_id}): {str(e)}")
+        await io_pool.run(terminate_task_processes, task_id)
+        await io_pool.run(_remove_task_folder, task_id, folder_path)
         # 清理进程登记映射
-        with task_proc_lock:
-            task_processes.pop(task_id, None)
+        forget_task_processes(task_id)
+        task_projects.invalidate(task_id)
         # 删除关联的 projects 记录并广播
-        try:
-            related_projects = db.query(ProjectModel).filter(ProjectModel.processed_file_id == task_id).all()
-            if related_projects:
-                deleted_ids = [p.id for p in related_projects]
-                for p in related_projects:
-                    db.delete(p)
-                db.commit()
-                for pid in deleted_ids:
-                    await manager.broadcast({
-                        "type": "project_updated",
-                        "action": "delete",
-                        "project_id": pid
-                    })
-        except Exception as e:
-            print(f"删除关联项目记录失败(task_id={task_id}): {str(e)}")
+        for pid in await db_pool.run(_delete_task_projects, task_id, db):
+            await manager.broadcast({
+                "type": "project_updated",
+                "action": "delete",
+                "project_id": pid
+            })
     return {"msg": "任务已取消"}
 
 
+def _mesh_export_dict(export: MeshExportModel) -> dict:
+    return {
+        "export_id": export.id,
+        "processed_file_id": export.processed_file_id,
+        "status": export.status,
+        "stage": export.stage,
+        "progress": export.progress,
+        "params": json.loads(export.params),
+        "error": export.error,
+        "created_at": export.created_at,
+        "updated_at": export.updated_at,
+        "download_url": f"/threeDGS/meshExports/{export.id}/download" if export.status == "done" else None,
+    }
+
+
+def _get_mesh_export(export_id: int, db: Session) -> MeshExportModel:
+    export = db.query(MeshExportModel).filter(MeshExportModel.id == export_id).first()
+    if not export:
+        raise HTTPException(status_code=404, detail="Mesh export not found")
+    return export
+
+
 @router.post("/threeDGS/toObj")
-def to_obj(project_id: int, db: Session = Depends(get_db)):
+def to_obj(
+    project_id: int,
+    response: Response,
+    texture: bool = True,
+    data_term: Literal["area", "gmi"] = "area",
+    outlier_removal: Literal["none", "gauss_clamping", "gauss_damping"] = "gauss_clamping",
+    db: Session = Depends(get_db)
+):
+    """提交网格导出作业（后台执行），返回作业状态；相同点云与参数已导出过时直接返回已有结果。
+
+    进度通过 SSE 的 mesh_export_progress / mesh_export_done / mesh_export_failed 事件推送，
+    也可以轮询 /threeDGS/meshExports/{export_id}；完成后从 download_url 下载 ZIP。
+    """
     project = db.query(ProjectModel).filter(ProjectModel.id == project_id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -587,79 +653,171 @@ def to_obj(project_id: int, db: Session = Depends(get_db)):
     processed_file = db.query(ProcessedFileModel).filter(ProcessedFileModel.id == project.processed_file_id).first()
     if not processed_file:
         raise HTTPException(status_code=404, detail="Processed file not found")
+    if processed_file.status != "trained":
+        raise HTTPException(status_code=409, detail="Task is not trained yet")
 
-    # 定义结果目录和相机文件路径
-    result_dir = os.path.join(processed_file.folder_path, "results")
-    result_dir_abs = os.path.abspath(result_dir)
-    
-    # 检查 results 目录是否存在，如果不存在，可能是导入的项目
-    if not os.path.exists(result_dir):
-        # 对于导入的项目，直接使用处理文件的文件夹路径
-        result_dir = processed_file.folder_path
-        result_dir_abs = os.path.abspath(result_dir)
-    
-    # 尝试找到 cameras.json 文件
-    # 首先检查 results 目录下
-    result_camera_json = os.path.join(result_dir, "cameras.json")
-    
-    # 如果 results 目录下没有，则检查项目根目录
-    if not os.path.exists(result_camera_json):
-        root_camera_json = os.path.join(processed_file.folder_path, "cameras.json")
-        if os.path.exists(root_camera_json):
-            result_camera_json = root_camera_json
-    
-    result_camera_json_abs = os.path.abspath(result_camera_json)
-    
-    # 如果仍然找不到 cameras.json，抛出异常
-    if not os.path.exists(result_camera_json_abs):
+    _, cameras_path = resolve_mesh_inputs(processed_file.folder_path)
+    if cameras_path is None:
         raise HTTPException(status_code=404, detail="cameras.json not found in project")
-    
-    mesh_obj_dir = os.path.join(processed_file.folder_path, "mesh", "obj")
-    mesh_obj_dir_abs = os.path.abspath(mesh_obj_dir)
-
-    # 创建目标目录如果不存在
-    os.makedirs(mesh_obj_dir_abs, exist_ok=True)
-
-    # 定义ZIP文件名和路径
-    zip_filename = f"{project.name}.zip"
-    zip_filepath = os.path.join(mesh_obj_dir_abs, zip_filename)
-
-    # 检查ZIP文件是否已存在
-    if os.path.exists(zip_filepath):
-        return FileResponse(zip_filepath, filename=zip_filename, media_type="application/octet-stream")
-
-    # 确保 cameras.json 在 /results 下
-    # 如果 cameras.json 在项目根目录，复制到 results 目录
-    if os.path.exists(result_dir) and not os.path.exists(os.path.join(result_dir, "cameras.json")):
-        src_cameras = os.path.join(processed_file.folder_path, "cameras.json")
-        dest_cameras = os.path.join(result_dir_abs, "cameras.json")
-        if os.path.exists(src_cameras):
-            shutil.copy2(src_cameras, dest_cameras)
-            result_camera_json_abs = os.path.abspath(dest_cameras)
-    
-    extract_cmd = f"gs-extract-mesh -m \"{result_dir_abs}\" -s \"{result_camera_json_abs}\" -o \"{mesh_obj_dir_abs}\""
-    print(extract_cmd)
-    subprocess.run(extract_cmd, shell=True, cwd=GAUSTUDIO_DIRECTORY)
-    
-    texrecon_cmd = (
-        "texrecon ./images ./fused_mesh.ply ./textured_mesh "
-        "--outlier_removal=gauss_clamping --data_term=area --no_intermediate_results"
-    )
-    subprocess.run(texrecon_cmd, shell=True, cwd=mesh_obj_dir_abs)
-    
-    # 创建ZIP文件
-    with zipfile.ZipFile(zip_filepath, "w", zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(mesh_obj_dir_abs):
-            for file in files:
-                if file.startswith("textured_mesh"):
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, mesh_obj_dir_abs)
-                    zipf.write(file_path, arcname)
-    
-    return FileResponse(zip_filepath, filename=zip_filename, media_type="application/octet-stream")
+    result_url = _find_latest_point_cloud_ply(os.path.abspath(processed_file.folder_path))
+    if not result_url:
+        raise HTTPException(status_code=404, detail="Point cloud not found")
+
+    params = {"texture": texture, "data_term": data_term, "outlier_removal": outlier_removal}
+    cache_key = mesh_export_key(processed_file.id, upload_path(result_url), params)
+    export = db.query(MeshExportModel).filter(MeshExportModel.cache_key == cache_key).first()
+    if export is None:
+        export = MeshExportModel(
+            processed_file_id=processed_file.id,
+            cache_key=cache_key,
+            params=json.dumps(params, sort_keys=True),
+            status="queued",
+            progress=0,
+            owner=mesh_export_service.worker_id
+        )
+        db.add(export)
+        try:
+            db.commit()
+        except IntegrityError:
+            # 并发请求已创建了同一作业
+            db.rollback()
+            export = db.query(MeshExportModel).filter(MeshExportModel.cache_key == cache_key).first()
+            response.status_code = 202
+            return _mesh_export_dict(export)
+    elif export.status == "done" and export.result_path and os.path.isfile(upload_path(export.result_path)):
+        return _mesh_export_dict(export)
+    elif export.status in ACTIVE_STATUSES and not mesh_export_service.is_orphaned(export):
+        response.status_code = 202
+        return _mesh_export_dict(export)
+    else:
+        # 失败、取消、结果文件丢失或执行进程已退出：重新执行
+        export.status = "queued"
+        export.stage = None
+        export.progress = 0
+        export.error = None
+        export.result_path = None
+        export.owner = mesh_export_service.worker_id
+        db.commit()
+    mesh_export_service.submit(export.id)
+    response.status_code = 202
+    return _mesh_export_dict(export)
 
-@router.post("/threeDGS/segmentGS")
-def segmentGS(project_id: int, prompt_text: str, db: Session = Depends(get_db)):
+
+@router.get("/threeDGS/meshExports/{export_id}")
+def get_mesh_export(export_id: int, db: Session = Depends(get_db)):
+    return _mesh_export_dict(_get_mesh_export(export_id, db))
+
+
+@router.post("/threeDGS/meshExports/{export_id}/cancel")
+def cancel_mesh_export(export_id: int, db: Session = Depends(get_db)):
+    export = _get_mesh_export(export_id, db)
+    if export.status in ACTIVE_STATUSES:
+        export.status = "cancelled"
+        db.commit()
+        # 作业在本进程中执行时立即终止其进程；在其他进程中执行时，下一阶段开始前停止
+        mesh_export_service.cancel(export_id)
+    return _mesh_export_dict(export)
+
+
+@router.api_route("/threeDGS/meshExports/{export_id}/download", methods=["GET", "HEAD"])
+def download_mesh_export(export_id: int, request: Request, db: Session = Depends(get_db)):
+    export = _get_mesh_export(export_id, db)
+    if export.status != "done" or not export.result_path:
+        raise HTTPException(status_code=409, detail="Mesh export is not finished")
+    processed_file = export.processed_file
+    zip_path = upload_path(export.result_path)
+    if not os.path.isfile(zip_path):
+        raise HTTPException(status_code=404, detail="Mesh export file not found")
+    project = processed_file.projects[0] if processed_file.projects else None
+    filename = f"{project.name}.zip" if project else f"mesh_{export_id}.zip"
+    # 支持 Range 断点续传与 ETag 条件请求
+    return conditional_file_response(request, zip_path, os.stat(zip_path), filename=filename)
+
+def _segment_job_dict(job: SegmentJobModel) -> dict:
+    return {
+        "job_id": job.id,
+        "processed_file_id": job.processed_file_id,
+        "prompt_text": job.prompt_text,
+        "status": job.status,
+        "stage": job.stage,
+        "progress": job.progress,
+        "result_url": job.result_url if job.status == "done" else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+
+
+def _get_segment_job(job_id: int, db: Session) -> SegmentJobModel:
+    job = db.query(SegmentJobModel).filter(SegmentJobModel.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Segment job not found")
+    return job
+
+
+def _queue_segment_job(db: Session, processed_file: ProcessedFileModel, prompt: str, raw_prompt: str) -> Tuple[dict, Optional[int]]:
+    """返回 (作业状态, 需要提交执行的作业编号)；已有分割结果或作业已在执行时编号为 None"""
+    job = db.query(SegmentJobModel).filter(SegmentJobModel.processed_file_id == processed_file.id,
+                                           SegmentJobModel.prompt_text == prompt).first()
+    if job is None or job.status not in ACTIVE_STATUSES:
+        # 兼容规范化之前按原始提示保存的结果
+        segment_file = db.query(SegmentFileModel).filter(
+            SegmentFileModel.processed_file_id == processed_file.id,
+            SegmentFileModel.segment_prompt_text.in_([prompt, raw_prompt])
+        ).first()
+        if segment_file and os.path.isfile(upload_path(segment_file.result_url)):
+            result = _segment_job_dict(job) if job is not None and job.status == "done" else {
+                "job_id": None,
+                "processed_file_id": processed_file.id,
+                "prompt_text": segment_file.segment_prompt_text,
+                "status": "done",
+                "stage": "segmented",
+                "progress": 100,
+                "error": None,
+                "created_at": None,
+                "updated_at": None,
+            }
+            result["result_url"] = segment_file.result_url
+            return result, None
+
+    _, image_dir, checkpoint_path = resolve_segment_inputs(processed_file.folder_path)
+    if not os.path.isdir(image_dir):
+        raise HTTPException(status_code=404, detail="images not found in project")
+    if not os.path.isfile(checkpoint_path):
+        raise HTTPException(status_code=404, detail="Checkpoint not found in project")
+
+    if job is None:
+        job = SegmentJobModel(
+            processed_file_id=processed_file.id,
+            prompt_text=prompt,
+            status="queued",
+            progress=0,
+            owner=segmentation_service.worker_id
+        )
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:
+            # 并发请求已创建了同一作业
+            db.rollback()
+            job = db.query(SegmentJobModel).filter(SegmentJobModel.processed_file_id == processed_file.id,
+                                                   SegmentJobModel.prompt_text == prompt).first()
+            return _segment_job_dict(job), None
+    elif job.status in ACTIVE_STATUSES and not segmentation_service.is_orphaned(job):
+        return _segment_job_dict(job), None
+    else:
+        # 失败、取消、结果文件丢失或执行进程已退出：重新执行（已提取的 mask 仍会复用）
+        job.status = "queued"
+        job.stage = None
+        job.progress = 0
+        job.error = None
+        job.result_url = None
+        job.owner = segmentation_service.worker_id
+        db.commit()
+    return _segment_job_dict(job), job.id
+
+
+def _get_segment_processed_file(project_id: int, db: Session) -> ProcessedFileModel:
     project = db.query(ProjectModel).filter(ProjectModel.id == project_id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -667,51 +825,85 @@ def segmentGS(project_id: int, prompt_text: str, db: Session = Depends(get_db)):
     processed_file = db.query(ProcessedFileModel).filter(ProcessedFileModel.id == project.processed_file_id).first()
     if not processed_file:
         raise HTTPException(status_code=404, detail="Processed file not found")
+    return processed_file
 
-    absolute_output_folder = os.path.abspath(processed_file.folder_path)
-    scene = absolute_output_folder.split('/')[-1]
-    model_path = absolute_output_folder + "/results"
-    source_path = absolute_output_folder
-    image_path = source_path + "/images"
-    ckpt_path = model_path + "/chkpnt30000.pth"
-
-    segment_file = db.query(SegmentFileModel).filter(SegmentFileModel.processed_file_id == processed_file.id,
-                                                     SegmentFileModel.segment_prompt_text == prompt_text).first()
-    if segment_file:
-        return segment_file.result_url
-
-    # 基于提示文本对原图片提取mask
-    extract_masks_command = f'python submodules/Grounded-SAM-2/grounded_sam2_stable_tracking.py --video_dir {image_path} --output {model_path} --text \"{prompt_text}\"'
-    # 3DGS 分割
-    segment_command = f'python train.py -s {source_path} -m {model_path} --start_checkpoint {ckpt_path} --include_mask --finetune_mask --text \"{prompt_text}\" --N4views 14 --mask_signals_threshold 0.8 -r 1'
-    extract_masks_result = subprocess.run(
-                extract_masks_command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                cwd=COB_GS_DIRECTORY
-            )
-    segment_result = subprocess.run(
-                segment_command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                cwd=COB_GS_DIRECTORY
-            )
-    
-    # 保存到数据库
-    if extract_masks_result.returncode == 0 and segment_result.returncode == 0:
-        result_url = scene + '/results/masks/' + prompt_text + '/segment.ply'
-        new_segment_file = SegmentFileModel(
-            processed_file_id = processed_file.id,
-            segment_prompt_text = prompt_text,
-            result_url = result_url # 相对路径
-        )
-        db.add(new_segment_file)
+
+@router.post("/threeDGS/segmentGS")
+def segmentGS(project_id: int, prompt_text: str, response: Response, db: Session = Depends(get_db)):
+    """提交分割作业（后台执行），返回作业状态；该提示已有分割结果时直接返回（200，含 result_url）。
+
+    提示去除多余空白并转为小写后作为去重键：同一场景同一提示同时只有一个作业，
+    并发请求返回同一作业（202）。进度通过 SSE 的 segment_job_progress / segment_job_done /
+    segment_job_failed 事件推送，也可以轮询 /threeDGS/segmentJobs/{job_id}。
+    """
+    processed_file = _get_segment_processed_file(project_id, db)
+    try:
+        prompt = normalize_prompt(prompt_text)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    result, job_id = _queue_segment_job(db, processed_file, prompt, prompt_text)
+    if job_id is not None:
+        segmentation_service.submit(job_id)
+    if result["status"] != "done":
+        response.status_code = 202
+    return result
+
+
+class SegmentBatchRequest(BaseModel):
+    project_id: int
+    prompts: List[str]
+
+
+@router.post("/threeDGS/segmentGS/batch")
+def segment_gs_batch(request: SegmentBatchRequest, response: Response, db: Session = Depends(get_db)):
+    """批量提交分割：同一场景的多个提示作为一个批次执行，每个阶段只启动一次执行器进程、只占用一次 GPU 槽位，
+    模型仍由每个提示各自加载（见 app/tasks/segment_batch_runner.py）。
+
+    每个提示仍是独立的分割作业（去重、缓存、取消与 SSE 进度同 segmentGS），各自登记一条 SegmentFile；
+    已有结果的提示直接返回，已在执行的提示返回已有作业。全部已完成时返回 200，否则返回 202。
+    """
+    processed_file = _get_segment_processed_file(request.project_id, db)
+    prompts: Dict[str, str] = {}
+    try:
+        for raw_prompt in request.prompts:
+            prompts.setdefault(normalize_prompt(raw_prompt), raw_prompt)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not prompts:
+        raise HTTPException(status_code=422, detail="prompts is empty")
+    if len(prompts) > SEGMENT_BATCH_MAX_PROMPTS:
+        raise HTTPException(status_code=422, detail=f"At most {SEGMENT_BATCH_MAX_PROMPTS} prompts per batch")
+
+    results = []
+    job_ids = []
+    for prompt, raw_prompt in prompts.items():
+        result, job_id = _queue_segment_job(db, processed_file, prompt, raw_prompt)
+        results.append(result)
+        if job_id is not None:
+            job_ids.append(job_id)
+    if job_ids:
+        segmentation_service.submit_batch(job_ids)
+    if any(result["status"] != "done" for result in results):
+        response.status_code = 202
+    return {"processed_file_id": processed_file.id, "jobs": results}
+
+
+@router.get("/threeDGS/segmentJobs/{job_id}")
+def get_segment_job(job_id: int, db: Session = Depends(get_db)):
+    return _segment_job_dict(_get_segment_job(job_id, db))
+
+
+@router.post("/threeDGS/segmentJobs/{job_id}/cancel")
+def cancel_segment_job(job_id: int, db: Session = Depends(get_db)):
+    job = _get_segment_job(job_id, db)
+    if job.status in ACTIVE_STATUSES:
+        job.status = "cancelled"
         db.commit()
-        db.refresh(new_segment_file)
-        return result_url
+        # 作业在本进程中执行时立即终止其进程；在其他进程中执行时，下一阶段开始前停止
+        segmentation_service.cancel(job_id)
+    return _segment_job_dict(job)
+
+
+# 持久化任务队列：在应用启动时启动（见 app/main.py）
+job_queue = DurableJobQueue(SessionLocal, scheduler, _run_queued_task, on_lease_lost=_on_lease_lost)
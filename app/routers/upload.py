@@ -1,21 +1,49 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Header, Query, Request
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 import os
-from fastapi.responses import FileResponse
 from app.models.database import get_db
 from app.models.static_file import StaticFile as StaticFileModel
+from app.models.upload_session import UploadSession as UploadSessionModel, UploadChunk as UploadChunkModel
 from app.schemas.static_file import StaticFile
+from app.schemas.upload_session import UploadSessionCreate, UploadSessionComplete
+from app.core.static_files import conditional_file_response
+from app.core.uploads import UPLOAD_DIRECTORY
+from app.core.executors import db_pool, io_pool
 from pathlib import Path
+import datetime
+import re
 import uuid
+import hashlib
+from typing import Optional
 import aiofiles  # 新增: 异步文件操作库
 
 router = APIRouter()
 
-UPLOAD_DIRECTORY = "uploads/"
+# 分块上传：默认 / 最小 / 最大分块大小（字节），未完成会话的保留时长（小时）
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+UPLOAD_SESSION_TTL_HOURS = int(os.environ.get("UPLOAD_SESSION_TTL_HOURS", 24))
+
+# 以 uuid 命名的上传文件（内容不会再变化）
+CONTENT_ADDRESSED_FILENAME = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.[\w]+$")
+
+# 分块上传过程中的临时文件目录（完成后改名到上传目录，不通过 /files 对外提供）
+UPLOAD_SESSION_DIRECTORY = os.path.join(UPLOAD_DIRECTORY, ".sessions")
 
 # 确保上传目录存在
 if not os.path.exists(UPLOAD_DIRECTORY):
     os.makedirs(UPLOAD_DIRECTORY)
+os.makedirs(UPLOAD_SESSION_DIRECTORY, exist_ok=True)
+
+def find_duplicate_static_file(db: Session, sha256: str, size: int) -> Optional[StaticFileModel]:
+    """按内容摘要查找仍在磁盘上的同内容文件"""
+    candidates = db.query(StaticFileModel).filter(
+        StaticFileModel.sha256 == sha256,
+        StaticFileModel.size == size
+    ).order_by(StaticFileModel.id).all()
+    return next((candidate for candidate in candidates if os.path.exists(candidate.path)), None)
 
 @router.post("/upload/", response_model=StaticFile)
 async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db)): 
@@ -26,7 +54,9 @@ async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db
     # 构建文件保存路径
     file_location = os.path.join(UPLOAD_DIRECTORY, unique_filename)
     
-    # 以异步方式分块保存文件，避免一次性读入大文件导致内存暴涨
+    # 以异步方式分块保存文件，避免一次性读入大文件导致内存暴涨；写入的同时计算 SHA-256
+    hasher = hashlib.sha256()
+    size = 0
     try:
         async with aiofiles.open(file_location, "wb") as f:
             chunk_size = 1024 * 1024  # 1MB
@@ -34,16 +64,38 @@ async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db
                 chunk = await file.read(chunk_size)
                 if not chunk:
                     break
+                hasher.update(chunk)
+                size += len(chunk)
                 await f.write(chunk)
     except Exception as err:
+        if os.path.exists(file_location):
+            os.remove(file_location)
         # 写文件失败时，返回 500 并中断后续数据库操作
         raise HTTPException(status_code=500, detail=f"Failed to save file: {err}")
+    sha256 = hasher.hexdigest()
+    return await db_pool.run(_register_uploaded_file, db, file_location, unique_filename, file.filename, sha256, size)
+
+def _register_uploaded_file(
+    db: Session,
+    file_location: str,
+    unique_filename: str,
+    original_filename: str,
+    sha256: str,
+    size: int
+) -> StaticFileModel:
+    # 内容相同的文件已存在时直接复用原记录，删除刚写入的副本
+    existing = find_duplicate_static_file(db, sha256, size)
+    if existing:
+        os.remove(file_location)
+        return existing
     
     # 保存文件信息到数据库，保存原始文件名和新文件名
     static_file = StaticFileModel(
         path=file_location, 
         filename=unique_filename,
-        original_filename=file.filename  # 需要在数据库模型中添加此字段
+        original_filename=original_filename,
+        sha256=sha256,
+        size=size
     )
     db.add(static_file)
     db.commit()
@@ -51,8 +103,256 @@ async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db
     
     return static_file
 
-@router.get("/files/{file_path:path}")
-async def get_file(file_path: str):
+def _hash_file(path: str) -> str:
+    """分块计算整个文件的 SHA-256（在线程池中调用）"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _remove_upload_session(db: Session, upload_session: UploadSessionModel) -> None:
+    if os.path.exists(upload_session.path):
+        try:
+            os.remove(upload_session.path)
+        except Exception as e:
+            print(f"删除未完成的上传文件失败: {upload_session.path}, 错误: {str(e)}")
+    db.delete(upload_session)
+
+
+def _cleanup_expired_upload_sessions(db: Session) -> None:
+    cutoff = datetime.datetime.now() - datetime.timedelta(hours=UPLOAD_SESSION_TTL_HOURS)
+    expired = db.query(UploadSessionModel).filter(UploadSessionModel.created_at < cutoff).all()
+    for upload_session in expired:
+        _remove_upload_session(db, upload_session)
+    if expired:
+        db.commit()
+        print(f"已清理 {len(expired)} 个过期的上传会话")
+
+
+def _get_upload_session(db: Session, upload_id: str) -> UploadSessionModel:
+    upload_session = db.query(UploadSessionModel).filter(UploadSessionModel.id == upload_id).first()
+    if not upload_session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return upload_session
+
+
+def _upload_session_status(upload_session: UploadSessionModel, chunks) -> dict:
+    total_chunks = (upload_session.size + upload_session.chunk_size - 1) // upload_session.chunk_size
+    received = sorted(chunk.chunk_index for chunk in chunks)
+    received_set = set(received)
+    return {
+        "upload_id": upload_session.id,
+        "filename": upload_session.original_filename,
+        "size": upload_session.size,
+        "chunk_size": upload_session.chunk_size,
+        "total_chunks": total_chunks,
+        "received_chunks": received,
+        "missing_chunks": [index for index in range(total_chunks) if index not in received_set],
+        "received_bytes": sum(chunk.size for chunk in chunks)
+    }
+
+
+@router.post("/upload/sessions")
+def create_upload_session(payload: UploadSessionCreate, db: Session = Depends(get_db)):
+    """创建分块上传会话，并预先分配临时文件"""
+    chunk_size = payload.chunk_size or DEFAULT_CHUNK_SIZE
+    if chunk_size < MIN_CHUNK_SIZE or chunk_size > MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=400, detail=f"chunk_size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE}")
+    _cleanup_expired_upload_sessions(db)
+
+    upload_id = str(uuid.uuid4())
+    unique_filename = f"{uuid.uuid4()}{Path(payload.filename).suffix}"
+    # 预先分配临时文件，各分块按偏移直接写入；完成后再改名为最终文件名，
+    # 避免未写完的文件以 uuid 文件名被当作不可变内容缓存
+    part_location = os.path.join(UPLOAD_SESSION_DIRECTORY, f"{upload_id}.part")
+    with open(part_location, "wb") as f:
+        f.truncate(payload.size)
+
+    upload_session = UploadSessionModel(
+        id=upload_id,
+        path=part_location,
+        filename=unique_filename,
+        original_filename=payload.filename,
+        size=payload.size,
+        chunk_size=chunk_size
+    )
+    db.add(upload_session)
+    db.commit()
+    return _upload_session_status(upload_session, [])
+
+
+@router.get("/upload/sessions/{upload_id}")
+def get_upload_session(upload_id: str, db: Session = Depends(get_db)):
+    """查询已接收的分块，客户端断线后据此续传缺失的分块"""
+    upload_session = _get_upload_session(db, upload_id)
+    return _upload_session_status(upload_session, upload_session.chunks)
+
+
+@router.put("/upload/sessions/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0, description="分块在文件中的起始偏移，必须是 chunk_size 的整数倍"),
+    chunk_sha256: str = Header(..., alias="X-Chunk-SHA256", description="分块内容的 SHA-256"),
+    db: Session = Depends(get_db)
+):
+    """上传一个分块（请求体为原始字节）。不同分块可以并行上传，同一分块可以重复上传。"""
+    upload_session = await db_pool.run(_get_upload_session, db, upload_id)
+    if offset % upload_session.chunk_size != 0 or offset >= upload_session.size:
+        raise HTTPException(status_code=400, detail="Invalid offset")
+    chunk_index = offset // upload_session.chunk_size
+    expected_size = min(upload_session.chunk_size, upload_session.size - offset)
+
+    # 请求体先写入该分块自己的临时文件，长度与校验和都通过后才写入 .part 文件对应位置，
+    # 重传被中断或内容有误时不会覆盖已接收的分块
+    chunk_location = os.path.join(UPLOAD_SESSION_DIRECTORY, f"{upload_id}.{chunk_index}.{uuid.uuid4().hex}.chunk")
+    hasher = hashlib.sha256()
+    received = 0
+    try:
+        async with aiofiles.open(chunk_location, "wb") as f:
+            async for data in request.stream():
+                if not data:
+                    continue
+                received += len(data)
+                if received > expected_size:
+                    raise HTTPException(status_code=400, detail="Chunk exceeds expected size")
+                hasher.update(data)
+                await f.write(data)
+        if received != expected_size:
+            raise HTTPException(status_code=400, detail=f"Chunk size mismatch: expected {expected_size}, got {received}")
+        digest = hasher.hexdigest()
+        if chunk_sha256.lower() != digest:
+            raise HTTPException(status_code=400, detail="Chunk checksum mismatch")
+
+        # 先删除该分块的记录再写入：写入过程中断时该分块会重新出现在 missing_chunks 中
+        await db_pool.run(_forget_chunk, db, upload_id, chunk_index)
+        try:
+            await io_pool.run(_write_chunk, upload_session.path, offset, chunk_location)
+        except FileNotFoundError:
+            raise HTTPException(status_code=410, detail="Upload file is missing, please restart the upload")
+    finally:
+        if os.path.exists(chunk_location):
+            os.remove(chunk_location)
+
+    await db_pool.run(_record_chunk, db, upload_id, chunk_index, received, digest)
+    return {"upload_id": upload_id, "chunk_index": chunk_index, "size": received, "sha256": digest}
+
+
+def _write_chunk(part_location: str, offset: int, chunk_location: str) -> None:
+    """把已校验的分块临时文件复制到 .part 文件的对应偏移（在线程池中调用）"""
+    with open(part_location, "r+b") as part, open(chunk_location, "rb") as chunk:
+        part.seek(offset)
+        while True:
+            data = chunk.read(1024 * 1024)
+            if not data:
+                break
+            part.write(data)
+
+
+def _forget_chunk(db: Session, upload_id: str, chunk_index: int) -> None:
+    db.query(UploadChunkModel).filter(
+        UploadChunkModel.session_id == upload_id,
+        UploadChunkModel.chunk_index == chunk_index
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+def _record_chunk(db: Session, upload_id: str, chunk_index: int, size: int, sha256: str) -> None:
+    chunk = db.query(UploadChunkModel).filter(
+        UploadChunkModel.session_id == upload_id,
+        UploadChunkModel.chunk_index == chunk_index
+    ).first()
+    if chunk:
+        chunk.size = size
+        chunk.sha256 = sha256
+    else:
+        db.add(UploadChunkModel(session_id=upload_id, chunk_index=chunk_index, size=size, sha256=sha256))
+    try:
+        db.commit()
+    except IntegrityError:
+        # 同一分块被并行重复上传，内容已写入，忽略重复记录
+        db.rollback()
+
+
+@router.post("/upload/sessions/{upload_id}/complete", response_model=StaticFile)
+async def complete_upload_session(
+    upload_id: str,
+    payload: Optional[UploadSessionComplete] = None,
+    db: Session = Depends(get_db)
+):
+    """所有分块到齐后生成 StaticFile 记录（与 /upload/ 相同，内容重复时复用已有记录）"""
+    upload_session = await db_pool.run(_get_complete_upload_session, db, upload_id)
+    sha256 = await io_pool.run(_hash_file, upload_session.path)
+    if payload and payload.sha256 and payload.sha256.lower() != sha256:
+        raise HTTPException(status_code=400, detail="File checksum mismatch")
+    return await db_pool.run(_finish_upload_session, db, upload_session, sha256)
+
+
+def _get_complete_upload_session(db: Session, upload_id: str) -> UploadSessionModel:
+    upload_session = _get_upload_session(db, upload_id)
+    status = _upload_session_status(upload_session, upload_session.chunks)
+    if status["missing_chunks"]:
+        raise HTTPException(status_code=409, detail={"msg": "Upload incomplete", "missing_chunks": status["missing_chunks"]})
+    return upload_session
+
+
+def _claim_upload_session(db: Session, upload_session: UploadSessionModel) -> None:
+    """删除会话记录以独占完成操作（不提交）；并发的 complete 中只有一个能删除成功，其余返回 409"""
+    upload_id = upload_session.id
+    db.expunge(upload_session)
+    db.query(UploadChunkModel).filter(UploadChunkModel.session_id == upload_id).delete(synchronize_session=False)
+    claimed = db.query(UploadSessionModel).filter(UploadSessionModel.id == upload_id).delete(synchronize_session=False)
+    if not claimed:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Upload session is already being completed")
+
+
+def _finish_upload_session(db: Session, upload_session: UploadSessionModel, sha256: str) -> StaticFileModel:
+    _claim_upload_session(db, upload_session)
+    existing = find_duplicate_static_file(db, sha256, upload_session.size)
+    if existing:
+        db.commit()
+        if os.path.exists(upload_session.path):
+            os.remove(upload_session.path)
+        return existing
+
+    file_location = os.path.join(UPLOAD_DIRECTORY, upload_session.filename)
+    os.replace(upload_session.path, file_location)
+    static_file = StaticFileModel(
+        path=file_location,
+        filename=upload_session.filename,
+        original_filename=upload_session.original_filename,
+        sha256=sha256,
+        size=upload_session.size
+    )
+    db.add(static_file)
+    db.commit()
+    db.refresh(static_file)
+    return static_file
+
+
+@router.delete("/upload/sessions/{upload_id}", response_model=bool)
+def abort_upload_session(upload_id: str, db: Session = Depends(get_db)):
+    upload_session = _get_upload_session(db, upload_id)
+    _remove_upload_session(db, upload_session)
+    db.commit()
+    return True
+
+
+def _cache_control(relative_path: str) -> str:
+    # 上传文件以 uuid 命名、写入后不再修改，可永久缓存；其他文件（预览帧、训练结果等）每次使用 ETag 重新验证
+    if "/" not in relative_path and CONTENT_ADDRESSED_FILENAME.match(relative_path):
+        return "public, max-age=31536000, immutable"
+    return "no-cache"
+
+
+@router.api_route("/files/{file_path:path}", methods=["GET", "HEAD"])
+async def get_file(file_path: str, request: Request):
     # 构建完整文件路径
     file_location = Path(UPLOAD_DIRECTORY) / file_path
     
@@ -62,22 +362,22 @@ async def get_file(file_path: str):
         upload_dir = Path(UPLOAD_DIRECTORY).resolve()
         
         # 安全检查：确保请求的文件在上传目录内
-        if not str(file_location).startswith(str(upload_dir)):
+        if not file_location.is_relative_to(upload_dir):
             raise HTTPException(status_code=403, detail="Access denied")
+        # 分块上传中的临时文件尚未写完，不对外提供
+        if file_location.is_relative_to(Path(UPLOAD_SESSION_DIRECTORY).resolve()):
+            raise HTTPException(status_code=404, detail="File not found")
             
         # 检查文件是否存在
         if not file_location.is_file():
             raise HTTPException(status_code=404, detail="File not found")
-        
-        # 获取文件名    
-        filename = file_location.name
-        
-        # 返回文件响应，设置为下载模式
-        return FileResponse(
-            str(file_location),
-            filename=filename,  # 指定下载时的文件名
-            media_type="application/octet-stream"  # 强制浏览器下载而不是显示
-        )
-        
+        stat_result = file_location.stat()
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Error accessing file: {str(e)}")
+
+    # 获取文件名，保持下载模式
+    filename = file_location.name
+    cache_control = _cache_control(file_location.relative_to(upload_dir).as_posix())
+    return conditional_file_response(request, str(file_location), stat_result, cache_control, filename=filename)
@@ -12,6 +12,9 @@ class ProcessedFile(BaseModel):
     folder_path: str
     status: str
     result_url: Optional[str] = None
+    splat_url: Optional[str] = None
+    compressed_url: Optional[str] = None
+    lod_manifest_url: Optional[str] = None
     algorithm: str = "3dgs"
 
     class Config:
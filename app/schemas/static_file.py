@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import Optional
 
 class StaticFileCreate(BaseModel):
     path: str
@@ -8,6 +9,8 @@ class StaticFile(BaseModel):
     id: int
     path: str
     filename: str
+    sha256: Optional[str] = None
+    size: Optional[int] = None
 
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -0,0 +1,11 @@
+# app/schemas/upload_session.py
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int = Field(gt=0, description="文件总大小（字节）")
+    chunk_size: Optional[int] = Field(default=None, description="分块大小（字节），不传使用服务端默认值")
+
+class UploadSessionComplete(BaseModel):
+    sha256: Optional[str] = Field(default=None, description="整个文件的 SHA-256，传入时会校验")
@@ -0,0 +1,261 @@
+# app/splat/export.py
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.splat.ply import read_element, write_ply
+
+# 0 阶球谐系数到 RGB 的换算常数
+SH_C0 = 0.28209479177387814
+# 压缩 PLY 中每个分块的高斯数，分块内按各自的最小/最大值量化
+CHUNK_SIZE = 256
+# 压缩 PLY 保留的球谐阶数（0-3），阶数越低体积越小、视角相关的颜色越少
+EXPORT_SH_DEGREE = int(os.environ.get("THREEDGS_EXPORT_SH_DEGREE", 0))
+
+SPLAT_SUFFIX = ".splat"
+COMPRESSED_SUFFIX = ".compressed.ply"
+
+# .splat 每个高斯 32 字节：位置 3×f32、尺度 3×f32、RGBA 4×u8、旋转 4×u8
+SPLAT_DTYPE = np.dtype([
+    ("position", "<f4", (3,)),
+    ("scale", "<f4", (3,)),
+    ("color", "u1", (4,)),
+    ("rotation", "u1", (4,)),
+])
+
+
+class Gaussians:
+    """从 3DGS 的 point_cloud.ply 中取出的高斯参数（均为 float32 连续数组）"""
+
+    def __init__(self, positions, scales, rotations, opacities, f_dc, f_rest):
+        self.positions = positions      # (N, 3)
+        self.scales = scales            # (N, 3)，对数尺度
+        self.rotations = rotations      # (N, 4)，单位四元数，顺序同 rot_0..rot_3
+        self.opacities = opacities      # (N,)，sigmoid 之前的值
+        self.f_dc = f_dc                # (N, 3)
+        self.f_rest = f_rest            # (N, 3, K)，按颜色通道分组的高阶球谐系数
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    @property
+    def sh_degree(self) -> int:
+        coefficients = self.f_rest.shape[2] + 1
+        return int(round(np.sqrt(coefficients))) - 1
+
+    def take(self, indices: np.ndarray) -> "Gaussians":
+        return Gaussians(
+            self.positions[indices], self.scales[indices], self.rotations[indices],
+            self.opacities[indices], self.f_dc[indices], self.f_rest[indices],
+        )
+
+
+def _columns(vertices: np.ndarray, names) -> np.ndarray:
+    return np.stack([np.asarray(vertices[name], dtype=np.float32) for name in names], axis=1)
+
+
+def load_gaussians(ply_path: str) -> Gaussians:
+    """读取高斯参数；非有限值的高斯会被丢弃"""
+    vertices = read_element(ply_path, "vertex")
+    names = set(vertices.dtype.names)
+    positions = _columns(vertices, ("x", "y", "z"))
+    scales = _columns(vertices, ("scale_0", "scale_1", "scale_2"))
+    rotations = _columns(vertices, ("rot_0", "rot_1", "rot_2", "rot_3"))
+    opacities = np.asarray(vertices["opacity"], dtype=np.float32)
+    f_dc = _columns(vertices, ("f_dc_0", "f_dc_1", "f_dc_2"))
+    rest_count = sum(1 for name in names if name.startswith("f_rest_"))
+    per_channel = rest_count // 3
+    if per_channel:
+        f_rest = _columns(vertices, [f"f_rest_{i}" for i in range(per_channel * 3)]).reshape(-1, 3, per_channel)
+    else:
+        f_rest = np.zeros((len(positions), 3, 0), dtype=np.float32)
+
+    norms = np.linalg.norm(rotations, axis=1, keepdims=True)
+    valid = (
+        np.isfinite(positions).all(axis=1)
+        & np.isfinite(scales).all(axis=1)
+        & np.isfinite(rotations).all(axis=1)
+        & np.isfinite(opacities)
+        & (norms[:, 0] > 0)
+    )
+    rotations = rotations / np.where(norms > 0, norms, 1)
+    gaussians = Gaussians(positions, scales, rotations, opacities, f_dc, f_rest)
+    if not valid.all():
+        gaussians = gaussians.take(np.flatnonzero(valid))
+    return gaussians
+
+
+def _sigmoid(values: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-values))
+
+
+def importance_order(gaussians: Gaussians) -> np.ndarray:
+    """按 不透明度 × 体积 从大到小排序，越靠前对画面贡献越大"""
+    importance = _sigmoid(gaussians.opacities) * np.exp(np.clip(gaussians.scales.sum(axis=1), -60, 60))
+    return np.argsort(-importance, kind="stable")
+
+
+def _part1by2(values: np.ndarray) -> np.ndarray:
+    """把 10 位整数的各位间隔两位展开，用于计算 Morton 码"""
+    x = values.astype(np.uint32) & 0x3FF
+    x = (x | (x << 16)) & 0x030000FF
+    x = (x | (x << 8)) & 0x0300F00F
+    x = (x | (x << 4)) & 0x030C30C3
+    x = (x | (x << 2)) & 0x09249249
+    return x
+
+
+def morton_codes(positions: np.ndarray, bounds: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> np.ndarray:
+    """在包围盒（默认为位置自身的包围盒）内把位置量化到 1024³ 网格并计算 30 位 Morton（Z 序）码"""
+    if len(positions) == 0:
+        return np.zeros(0, dtype=np.uint32)
+    low, high = bounds if bounds is not None else (positions.min(axis=0), positions.max(axis=0))
+    extent = np.array(high - low, dtype=np.float64)
+    extent[extent == 0] = 1
+    grid = np.clip(((positions - low) / extent * 1023).astype(np.int64), 0, 1023)
+    return (_part1by2(grid[:, 0]) << 2) | (_part1by2(grid[:, 1]) << 1) | _part1by2(grid[:, 2])
+
+
+def morton_order(positions: np.ndarray) -> np.ndarray:
+    """按 Morton 码排序，使每个分块在空间上尽量紧凑"""
+    return np.argsort(morton_codes(positions), kind="stable")
+
+
+def _unorm(values: np.ndarray, bits: int) -> np.ndarray:
+    scale = (1 << bits) - 1
+    return np.floor(np.clip(values, 0, 1) * scale + 0.5).astype(np.uint32)
+
+
+def _to_u8(values: np.ndarray) -> np.ndarray:
+    return np.clip(np.floor(values * 255 + 0.5), 0, 255).astype(np.uint8)
+
+
+def export_splat(gaussians: Gaussians, out_path: str) -> int:
+    """写出 .splat（antimatter15 格式，只保留 0 阶球谐），按重要性排序，返回文件大小"""
+    gaussians = gaussians.take(importance_order(gaussians))
+    records = np.empty(len(gaussians), dtype=SPLAT_DTYPE)
+    records["position"] = gaussians.positions
+    records["scale"] = np.exp(gaussians.scales)
+    records["color"][:, :3] = _to_u8(0.5 + SH_C0 * gaussians.f_dc)
+    records["color"][:, 3] = _to_u8(_sigmoid(gaussians.opacities))
+    records["rotation"] = np.clip(np.floor(gaussians.rotations * 128 + 128), 0, 255).astype(np.uint8)
+    records.tofile(out_path)
+    return os.path.getsize(out_path)
+
+
+def _chunk_bounds(values: np.ndarray, chunk_count: int):
+    """按 CHUNK_SIZE 分块求最小/最大值，最后一块用末尾元素补齐（不影响最值）"""
+    padded_length = chunk_count * CHUNK_SIZE
+    if len(values) < padded_length:
+        padding = np.repeat(values[-1:], padded_length - len(values), axis=0)
+        values = np.concatenate([values, padding])
+    blocks = values.reshape(chunk_count, CHUNK_SIZE, -1)
+    return blocks.min(axis=1), blocks.max(axis=1)
+
+
+def _normalize_in_chunks(values: np.ndarray, minimum: np.ndarray, maximum: np.ndarray) -> np.ndarray:
+    chunk_index = np.arange(len(values)) // CHUNK_SIZE
+    low = minimum[chunk_index]
+    extent = maximum[chunk_index] - low
+    return np.where(extent > 0, (values - low) / np.where(extent > 0, extent, 1), 0)
+
+
+def _pack_111011(normalized: np.ndarray) -> np.ndarray:
+    return (_unorm(normalized[:, 0], 11) << 21) | (_unorm(normalized[:, 1], 10) << 11) | _unorm(normalized[:, 2], 11)
+
+
+def _pack_rotations(rotations: np.ndarray) -> np.ndarray:
+    """最大分量索引占 2 位，其余三个分量各占 10 位（smallest-three 编码）"""
+    rows = np.arange(len(rotations))
+    largest = np.argmax(np.abs(rotations), axis=1)
+    sign = np.where(rotations[rows, largest] < 0, -1.0, 1.0).astype(np.float32)
+    rotations = rotations * sign[:, None]
+    keep = np.ones(rotations.shape, dtype=bool)
+    keep[rows, largest] = False
+    rest = rotations[keep].reshape(-1, 3) * (np.sqrt(2) * 0.5) + 0.5
+    packed = largest.astype(np.uint32)
+    for i in range(3):
+        packed = (packed << 10) | _unorm(rest[:, i], 10)
+    return packed
+
+
+def export_compressed_ply(gaussians: Gaussians, out_path: str, sh_degree: int = EXPORT_SH_DEGREE) -> int:
+    """写出分块量化的压缩 PLY（参考 PlayCanvas compressed.ply 的布局），返回文件大小。
+
+    高斯按 Morton 序排列后每 256 个一块，位置与尺度按块内范围量化为 11/10/11 位，
+    颜色与不透明度 8 位，旋转 2+10+10+10 位；高阶球谐截断到 sh_degree 阶并量化为 8 位。
+    """
+    gaussians = gaussians.take(morton_order(gaussians.positions))
+    count = len(gaussians)
+    chunk_count = max(1, (count + CHUNK_SIZE - 1) // CHUNK_SIZE)
+
+    scales = np.clip(gaussians.scales, -20, 20)
+    colors = 0.5 + SH_C0 * gaussians.f_dc
+    chunk_fields = ["min_x", "min_y", "min_z", "max_x", "max_y", "max_z",
+                    "min_scale_x", "min_scale_y", "min_scale_z", "max_scale_x", "max_scale_y", "max_scale_z",
+                    "min_r", "min_g", "min_b", "max_r", "max_g", "max_b"]
+    chunks = np.zeros(chunk_count if count else 0, dtype=[(name, "<f4") for name in chunk_fields])
+    vertex_dtype = [(name, "<u4") for name in ("packed_position", "packed_rotation", "packed_scale", "packed_color")]
+    vertices = np.zeros(count, dtype=vertex_dtype)
+    if count:
+        bounds = {}
+        for key, values in (("", gaussians.positions), ("scale_", scales), ("color", colors)):
+            bounds[key] = _chunk_bounds(values, chunk_count)
+        for axis, suffix in enumerate(("x", "y", "z")):
+            chunks[f"min_{suffix}"] = bounds[""][0][:, axis]
+            chunks[f"max_{suffix}"] = bounds[""][1][:, axis]
+            chunks[f"min_scale_{suffix}"] = bounds["scale_"][0][:, axis]
+            chunks[f"max_scale_{suffix}"] = bounds["scale_"][1][:, axis]
+        for axis, suffix in enumerate(("r", "g", "b")):
+            chunks[f"min_{suffix}"] = bounds["color"][0][:, axis]
+            chunks[f"max_{suffix}"] = bounds["color"][1][:, axis]
+
+        vertices["packed_position"] = _pack_111011(_normalize_in_chunks(gaussians.positions, *bounds[""]))
+        vertices["packed_scale"] = _pack_111011(_normalize_in_chunks(scales, *bounds["scale_"]))
+        vertices["packed_rotation"] = _pack_rotations(gaussians.rotations)
+        color = _normalize_in_chunks(colors, *bounds["color"])
+        vertices["packed_color"] = (
+            (_unorm(color[:, 0], 8) << 24) | (_unorm(color[:, 1], 8) << 16)
+            | (_unorm(color[:, 2], 8) << 8) | _unorm(_sigmoid(gaussians.opacities), 8)
+        )
+
+    elements = [("chunk", chunks), ("vertex", vertices)]
+    sh_degree = max(0, min(sh_degree, gaussians.sh_degree))
+    per_channel = (sh_degree + 1) ** 2 - 1
+    if per_channel:
+        # 与原始 PLY 相同的按通道排列：f_rest_{通道 × 每通道系数数 + k}
+        sh = gaussians.f_rest[:, :, :per_channel].reshape(count, -1)
+        quantized = np.clip(np.floor((sh / 8 + 0.5) * 256), 0, 255).astype(np.uint8)
+        sh_records = np.zeros(count, dtype=[(f"f_rest_{i}", "u1") for i in range(quantized.shape[1])])
+        for i in range(quantized.shape[1]):
+            sh_records[f"f_rest_{i}"] = quantized[:, i]
+        elements.append(("sh", sh_records))
+
+    write_ply(out_path, elements, comments=["generated by RealSceneDataEngine"])
+    return os.path.getsize(out_path)
+
+
+def export_assets(ply_path: str, sh_degree: Optional[int] = None) -> Dict[str, str]:
+    """在原始 PLY 旁生成 .splat 与 .compressed.ply，返回 {格式: 绝对路径}"""
+    started_at = time.monotonic()
+    gaussians = load_gaussians(ply_path)
+    base = ply_path[:-len(".ply")] if ply_path.endswith(".ply") else ply_path
+    outputs = {
+        "splat": base + SPLAT_SUFFIX,
+        "compressed": base + COMPRESSED_SUFFIX,
+    }
+    # 先写临时文件再改名，避免前端读到写了一半的文件
+    splat_size = export_splat(gaussians, outputs["splat"] + ".tmp")
+    compressed_size = export_compressed_ply(
+        gaussians, outputs["compressed"] + ".tmp", EXPORT_SH_DEGREE if sh_degree is None else sh_degree
+    )
+    for path in outputs.values():
+        os.replace(path + ".tmp", path)
+    original_size = os.path.getsize(ply_path)
+    print(
+        f"[splat] 导出完成: {len(gaussians)} 个高斯, 原始 {original_size} 字节, "
+        f"splat {splat_size} 字节, compressed {compressed_size} 字节, 耗时 {time.monotonic() - started_at:.2f}s"
+    )
+    return outputs
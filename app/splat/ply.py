@@ -0,0 +1,126 @@
+# app/splat/ply.py
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# PLY 标量类型到 numpy 类型的映射（不含字节序）
+PLY_SCALAR_TYPES = {
+    "char": "i1", "int8": "i1",
+    "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2",
+    "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4",
+    "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4",
+    "double": "f8", "float64": "f8",
+}
+_NUMPY_TO_PLY = {"i1": "char", "u1": "uchar", "i2": "short", "u2": "ushort", "i4": "int", "u4": "uint", "f4": "float", "f8": "double"}
+_BYTE_ORDERS = {"binary_little_endian": "<", "binary_big_endian": ">"}
+
+# 头部最大长度，防止把非 PLY 文件整个读进来
+MAX_HEADER_BYTES = 64 * 1024
+
+
+class PlyElement:
+    def __init__(self, name: str, count: int):
+        self.name = name
+        self.count = count
+        self.properties: List[Tuple[str, str]] = []
+
+    def dtype(self, byte_order: str) -> np.dtype:
+        return np.dtype([(name, byte_order + type_code) for name, type_code in self.properties])
+
+
+class PlyHeader:
+    """PLY 文件头：格式、各元素及其属性、二进制数据起始偏移"""
+
+    def __init__(self, fmt: str, elements: List[PlyElement], data_offset: int):
+        self.format = fmt
+        self.elements = elements
+        self.data_offset = data_offset
+
+    @property
+    def byte_order(self) -> str:
+        return _BYTE_ORDERS[self.format]
+
+    def element(self, name: str) -> Optional[PlyElement]:
+        return next((element for element in self.elements if element.name == name), None)
+
+    def element_offset(self, name: str) -> int:
+        """元素数据在文件中的字节偏移"""
+        offset = self.data_offset
+        for element in self.elements:
+            if element.name == name:
+                return offset
+            offset += element.count * element.dtype(self.byte_order).itemsize
+        raise KeyError(name)
+
+
+def read_header(path: str) -> PlyHeader:
+    """解析二进制 PLY 文件头（不支持 ascii 格式与 list 属性）"""
+    with open(path, "rb") as f:
+        if f.readline().strip() != b"ply":
+            raise ValueError(f"不是 PLY 文件: {path}")
+        fmt = None
+        elements: List[PlyElement] = []
+        while True:
+            line = f.readline()
+            if not line or f.tell() > MAX_HEADER_BYTES:
+                raise ValueError(f"PLY 文件头不完整: {path}")
+            parts = line.decode("ascii", errors="replace").split()
+            if not parts or parts[0] in ("comment", "obj_info"):
+                continue
+            if parts[0] == "end_header":
+                break
+            if parts[0] == "format":
+                fmt = parts[1]
+            elif parts[0] == "element":
+                elements.append(PlyElement(parts[1], int(parts[2])))
+            elif parts[0] == "property":
+                if not elements:
+                    raise ValueError(f"PLY 属性出现在元素之前: {path}")
+                if parts[1] == "list":
+                    raise ValueError(f"不支持 list 属性: {elements[-1].name}.{parts[-1]}")
+                if parts[1] not in PLY_SCALAR_TYPES:
+                    raise ValueError(f"未知的 PLY 属性类型: {parts[1]}")
+                elements[-1].properties.append((parts[2], PLY_SCALAR_TYPES[parts[1]]))
+        if fmt not in _BYTE_ORDERS:
+            raise ValueError(f"仅支持二进制 PLY，当前格式: {fmt}")
+        return PlyHeader(fmt, elements, f.tell())
+
+
+def read_element(path: str, name: str = "vertex", header: Optional[PlyHeader] = None) -> np.ndarray:
+    """以只读内存映射方式读取一个元素，返回结构化数组（不会把整个文件读入内存）"""
+    header = header or read_header(path)
+    element = header.element(name)
+    if element is None:
+        raise ValueError(f"PLY 文件中没有 {name} 元素: {path}")
+    if element.count == 0:
+        return np.zeros(0, dtype=element.dtype(header.byte_order))
+    return np.memmap(
+        path,
+        dtype=element.dtype(header.byte_order),
+        mode="r",
+        offset=header.element_offset(name),
+        shape=(element.count,),
+    )
+
+
+def write_ply(path: str, elements: Sequence[Tuple[str, np.ndarray]], comments: Sequence[str] = ()) -> None:
+    """把若干结构化数组按顺序写成 binary_little_endian PLY"""
+    lines = ["ply", "format binary_little_endian 1.0"]
+    lines += [f"comment {comment}" for comment in comments]
+    arrays = []
+    for name, array in elements:
+        lines.append(f"element {name} {len(array)}")
+        fields = []
+        for field in array.dtype.names:
+            field_dtype = array.dtype.fields[field][0]
+            lines.append(f"property {_NUMPY_TO_PLY[field_dtype.kind + str(field_dtype.itemsize)]} {field}")
+            fields.append((field, "<" + field_dtype.kind + str(field_dtype.itemsize)))
+        arrays.append(np.ascontiguousarray(array, dtype=np.dtype(fields)))
+    lines.append("end_header")
+    with open(path, "wb") as f:
+        f.write(("\n".join(lines) + "\n").encode("ascii"))
+        for array in arrays:
+            array.tofile(f)
@@ -0,0 +1,99 @@
+# app/splat/stats.py
+import os
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+from app.splat.ply import read_element, read_header
+
+# 每次从内存映射中处理的高斯数，内存占用与文件大小无关
+STATS_BLOCK_SIZE = 1 << 20
+# 不透明度直方图的区间数（sigmoid 之后的 0-1 范围）
+OPACITY_BINS = 20
+# 低于该不透明度的高斯视为几乎透明
+LOW_OPACITY_THRESHOLD = 0.05
+
+
+def compute_ply_stats(path: str) -> dict:
+    """逐块读取内存映射的 3DGS PLY，统计高斯数量、包围盒、不透明度分布等"""
+    header = read_header(path)
+    vertex = header.element("vertex")
+    if vertex is None:
+        raise ValueError(f"PLY 文件中没有 vertex 元素: {path}")
+    vertices = read_element(path, "vertex", header)
+    names = set(vertices.dtype.names)
+    has_opacity = "opacity" in names
+    rest_count = sum(1 for name in names if name.startswith("f_rest_"))
+
+    low = np.full(3, np.inf)
+    high = np.full(3, -np.inf)
+    edges = np.linspace(0.0, 1.0, OPACITY_BINS + 1)
+    histogram = np.zeros(OPACITY_BINS, dtype=np.int64)
+    non_finite = 0
+    low_opacity = 0
+    opacity_sum = 0.0
+    scale_sum = np.zeros(3)
+    has_scale = {"scale_0", "scale_1", "scale_2"} <= names
+    for begin in range(0, vertex.count, STATS_BLOCK_SIZE):
+        block = vertices[begin:begin + STATS_BLOCK_SIZE]
+        positions = np.stack([np.asarray(block[axis], dtype=np.float64) for axis in ("x", "y", "z")], axis=1)
+        finite = np.isfinite(positions).all(axis=1)
+        if has_opacity:
+            opacity = 1.0 / (1.0 + np.exp(-np.asarray(block["opacity"], dtype=np.float64)))
+            finite &= np.isfinite(opacity)
+        non_finite += int(len(block) - finite.sum())
+        if not finite.any():
+            continue
+        positions = positions[finite]
+        low = np.minimum(low, positions.min(axis=0))
+        high = np.maximum(high, positions.max(axis=0))
+        if has_opacity:
+            opacity = opacity[finite]
+            histogram += np.histogram(opacity, bins=edges)[0]
+            low_opacity += int((opacity < LOW_OPACITY_THRESHOLD).sum())
+            opacity_sum += float(opacity.sum())
+        if has_scale:
+            scales = np.stack([np.asarray(block[f"scale_{i}"], dtype=np.float64)[finite] for i in range(3)], axis=1)
+            scale_sum += np.exp(np.clip(scales, -60, 60)).sum(axis=0)
+
+    valid = vertex.count - non_finite
+    stats = {
+        "file_size": os.path.getsize(path),
+        "gaussian_count": vertex.count,
+        "non_finite_count": non_finite,
+        "properties": len(vertices.dtype.names),
+        "sh_degree": int(round(np.sqrt(rest_count // 3 + 1))) - 1 if rest_count else 0,
+        "bounding_box": None,
+        "opacity": None,
+        "mean_scale": None,
+    }
+    if valid:
+        stats["bounding_box"] = {
+            "min": low.round(4).tolist(),
+            "max": high.round(4).tolist(),
+            "size": (high - low).round(4).tolist(),
+        }
+        if has_opacity:
+            stats["opacity"] = {
+                "mean": round(opacity_sum / valid, 4),
+                "low_opacity_ratio": round(low_opacity / valid, 4),
+                "histogram": {"bin_edges": edges.round(4).tolist(), "counts": histogram.tolist()},
+            }
+        if has_scale:
+            stats["mean_scale"] = (scale_sum / valid).round(6).tolist()
+    return stats
+
+
+@lru_cache(maxsize=128)
+def _cached_ply_stats(path: str, mtime_ns: int, size: int) -> dict:
+    return compute_ply_stats(path)
+
+
+def get_ply_stats(path: str) -> Optional[dict]:
+    """按 (路径, 修改时间, 大小) 缓存统计结果，文件被重新训练覆盖后自动重新计算"""
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return dict(_cached_ply_stats(os.path.abspath(path), stat_result.st_mtime_ns, stat_result.st_size))
@@ -0,0 +1,129 @@
+# app/splat/tiles.py
+import json
+import os
+import shutil
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.splat.export import Gaussians, export_splat, importance_order, load_gaussians, morton_codes
+
+# 第 0 级（最粗）包含的高斯数，之后每一级是上一级的 LOD_GROWTH 倍，直到包含全部高斯
+LOD_BASE_COUNT = int(os.environ.get("THREEDGS_LOD_BASE_COUNT", 50000))
+LOD_GROWTH = 4
+# 单个分块最多包含的高斯数（.splat 每个高斯 32 字节，65536 个约 2MB）
+MAX_TILE_GAUSSIANS = int(os.environ.get("THREEDGS_LOD_TILE_SIZE", 65536))
+# Morton 码每轴 10 位，八叉树最多细分 10 层
+MAX_OCTREE_DEPTH = 10
+
+LOD_DIRNAME = "lod"
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def lod_level_ranges(count: int, base_count: int = LOD_BASE_COUNT, growth: int = LOD_GROWTH) -> List[Tuple[int, int]]:
+    """按重要性排名划分各级 LOD：第 l 级为排名 [start, end) 的高斯，前 l 级叠加即为该精度下的完整场景"""
+    ranges = []
+    start, size = 0, max(1, base_count)
+    while start < count:
+        end = min(count, start + size)
+        ranges.append((start, end))
+        start, size = end, size * growth
+    return ranges
+
+
+def octree_partition(
+    codes: np.ndarray,
+    max_count: int = MAX_TILE_GAUSSIANS,
+    start: int = 0,
+    end: Optional[int] = None,
+    depth: int = 0,
+    key: str = "r",
+) -> List[Tuple[str, int, int]]:
+    """对已按 Morton 码排序的数组做自适应八叉树划分，返回 (节点键, 起始, 结束) 列表。
+
+    同一节点的子节点在排序结果中是连续的区间，因此只需二分查找每个子节点的边界。
+    节点键由根 r 加上逐层的子节点编号（0-7）组成。
+    """
+    end = len(codes) if end is None else end
+    if end - start <= max_count or depth >= MAX_OCTREE_DEPTH:
+        return [(key, start, end)] if end > start else []
+    shift = np.uint32(3 * (MAX_OCTREE_DEPTH - depth - 1))
+    digits = (codes[start:end] >> shift) & np.uint32(7)
+    boundaries = np.searchsorted(digits, np.arange(9), side="left")
+    tiles = []
+    for child in range(8):
+        child_start, child_end = start + int(boundaries[child]), start + int(boundaries[child + 1])
+        if child_end > child_start:
+            tiles.extend(octree_partition(codes, max_count, child_start, child_end, depth + 1, f"{key}{child}"))
+    return tiles
+
+
+def _bounds(positions: np.ndarray) -> dict:
+    return {
+        "min": positions.min(axis=0).astype(np.float64).round(4).tolist(),
+        "max": positions.max(axis=0).astype(np.float64).round(4).tolist(),
+    }
+
+
+def build_lod_tiles(
+    ply_path: str,
+    output_dir: Optional[str] = None,
+    base_count: int = LOD_BASE_COUNT,
+    max_tile_gaussians: int = MAX_TILE_GAUSSIANS,
+) -> str:
+    """把点云切分为多级 LOD、每级按八叉树分块的 .splat 文件，并写出 manifest.json，返回清单路径。
+
+    第 0 级是最重要的少量高斯，客户端可先加载第 0 级快速显示粗略场景，
+    再按视点逐级加载更细的分块（各级之间不重复，叠加渲染）。
+    """
+    started_at = time.monotonic()
+    gaussians = load_gaussians(ply_path)
+    output_dir = output_dir or os.path.join(os.path.dirname(ply_path), LOD_DIRNAME)
+    # 先写入临时目录，完成后整体替换，避免客户端读到不完整的分块
+    staging_dir = output_dir + ".tmp"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+
+    ranked = gaussians.take(importance_order(gaussians))
+    scene_bounds = (ranked.positions.min(axis=0), ranked.positions.max(axis=0)) if len(ranked) else None
+    levels = []
+    for level, (start, end) in enumerate(lod_level_ranges(len(ranked), base_count)):
+        level_gaussians: Gaussians = ranked.take(np.arange(start, end))
+        codes = morton_codes(level_gaussians.positions, scene_bounds)
+        order = np.argsort(codes, kind="stable")
+        level_gaussians, codes = level_gaussians.take(order), codes[order]
+        level_dir = os.path.join(staging_dir, f"L{level}")
+        os.makedirs(level_dir)
+        tiles = []
+        for key, tile_start, tile_end in octree_partition(codes, max_tile_gaussians):
+            tile = level_gaussians.take(np.arange(tile_start, tile_end))
+            size = export_splat(tile, os.path.join(level_dir, f"{key}.splat"))
+            tiles.append({
+                "key": key,
+                "url": f"L{level}/{key}.splat",
+                "count": len(tile),
+                "bytes": size,
+                **_bounds(tile.positions),
+            })
+        levels.append({"level": level, "count": end - start, "tiles": tiles})
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "format": "splat",
+        "source": os.path.basename(ply_path),
+        "count": len(ranked),
+        "bounds": _bounds(ranked.positions) if len(ranked) else None,
+        "levels": levels,
+    }
+    with open(os.path.join(staging_dir, MANIFEST_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(staging_dir, output_dir)
+    tile_count = sum(len(level["tiles"]) for level in levels)
+    print(
+        f"[splat] LOD 分块完成: {len(ranked)} 个高斯, {len(levels)} 级, {tile_count} 个分块, "
+        f"耗时 {time.monotonic() - started_at:.2f}s"
+    )
+    return os.path.join(output_dir, MANIFEST_FILENAME)
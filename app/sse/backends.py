@@ -0,0 +1,187 @@
+# app/sse/backends.py
+import asyncio
+import datetime
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import or_
+
+from app.models.database import SessionLocal
+from app.models.sse_event import SSEEvent as SSEEventModel
+
+# 选择广播后端：memory（默认，仅当前进程）或 database（多个 uvicorn worker 共享）
+SSE_BACKEND_ENV = "SSE_BACKEND"
+# 数据库后端的轮询间隔与消息保留时长（秒）
+DB_POLL_SECONDS = float(os.environ.get("SSE_DB_POLL_SECONDS", 0.2))
+DB_RETENTION_SECONDS = int(os.environ.get("SSE_DB_RETENTION_SECONDS", 600))
+# 每轮最多读取的消息数
+DB_POLL_BATCH = 500
+# 自增 ID 的分配顺序与提交顺序不一定一致（多个 worker 同时写入时，小 ID 可能晚于大 ID 提交），
+# 读取时跳过的 ID 会被记为缺口并在之后的轮询中补读；超过该时长仍未出现的缺口视为已回滚的插入（秒）
+DB_GAP_TIMEOUT_SECONDS = float(os.environ.get("SSE_DB_GAP_TIMEOUT_SECONDS", 10))
+# 最多同时跟踪的缺口数（自增 ID 大幅跳跃时只跟踪最近的部分）
+DB_MAX_GAPS = 1000
+
+# 投递回调：(消息, 事件 ID)，事件 ID 为 None 时由连接管理器自行分配
+Deliver = Callable[[Dict[str, Any], Optional[int]], Awaitable[None]]
+
+
+class BroadcastBackend:
+    """广播后端：负责把 publish 的消息送达每个进程的 deliver 回调"""
+
+    deliver: Optional[Deliver] = None
+
+    def bind(self, deliver: Deliver) -> None:
+        self.deliver = deliver
+
+    async def start(self) -> None:
+        pass
+
+    async def publish(self, message: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def stop(self) -> None:
+        pass
+
+
+class InProcessBackend(BroadcastBackend):
+    """默认后端：直接投递给当前进程中的连接"""
+
+    async def publish(self, message: Dict[str, Any]) -> None:
+        if self.deliver is not None:
+            await self.deliver(message, None)
+
+
+class DatabaseBackend(BroadcastBackend):
+    """基于 sse_events 表的跨进程后端，无需额外的消息中间件。
+
+    发布方写入一行，所有 worker（包括发布方自己）轮询读取新行后投递给本进程的连接，
+    行的自增 ID 作为事件 ID，因此 Last-Event-ID 在任意 worker 上重连都有效。
+    并发写入时 ID 可能乱序提交：读取时跳过的 ID 记为缺口，之后每轮一并查询，
+    迟到的消息仍会投递（且只投递一次），超时未出现的缺口被丢弃。
+    """
+
+    def __init__(self, poll_seconds: float = DB_POLL_SECONDS, retention_seconds: int = DB_RETENTION_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self._last_seen_id = 0
+        # 缺口 ID -> 发现时间（time.monotonic()）
+        self._missing: Dict[int, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._last_seen_id = await asyncio.to_thread(self._max_id)
+        self._task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def publish(self, message: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._insert, json.dumps(message))
+
+    # ---------- 以下方法在线程池中执行 ----------
+
+    @staticmethod
+    def _max_id() -> int:
+        db = SessionLocal()
+        try:
+            row = db.query(SSEEventModel.id).order_by(SSEEventModel.id.desc()).first()
+            return row[0] if row else 0
+        finally:
+            db.close()
+
+    @staticmethod
+    def _insert(payload: str) -> None:
+        db = SessionLocal()
+        try:
+            db.add(SSEEventModel(payload=payload))
+            db.commit()
+        finally:
+            db.close()
+
+    def _fetch_new(self, last_seen_id: int, missing_ids: List[int]) -> list:
+        db = SessionLocal()
+        try:
+            condition = SSEEventModel.id > last_seen_id
+            if missing_ids:
+                condition = or_(condition, SSEEventModel.id.in_(missing_ids))
+            return db.query(SSEEventModel.id, SSEEventModel.payload).filter(
+                condition
+            ).order_by(SSEEventModel.id.asc()).limit(DB_POLL_BATCH).all()
+        finally:
+            db.close()
+
+    def _prune(self) -> None:
+        db = SessionLocal()
+        try:
+            cutoff = datetime.datetime.now() - datetime.timedelta(seconds=self.retention_seconds)
+            db.query(SSEEventModel).filter(SSEEventModel.created_at < cutoff).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    # ---------- 轮询 ----------
+
+    def _accept(self, event_id: int) -> bool:
+        """判断读到的行是否需要投递，并维护已读位置与缺口"""
+        if event_id in self._missing:
+            del self._missing[event_id]
+            return True
+        if event_id <= self._last_seen_id:
+            return False  # 已投递过
+        now = time.monotonic()
+        for gap_id in range(max(self._last_seen_id + 1, event_id - DB_MAX_GAPS), event_id):
+            self._missing[gap_id] = now
+        self._last_seen_id = event_id
+        return True
+
+    def _expire_gaps(self) -> None:
+        deadline = time.monotonic() - DB_GAP_TIMEOUT_SECONDS
+        for gap_id in [gap_id for gap_id, seen_at in self._missing.items() if seen_at < deadline]:
+            del self._missing[gap_id]
+        if len(self._missing) > DB_MAX_GAPS:
+            for gap_id in sorted(self._missing)[:len(self._missing) - DB_MAX_GAPS]:
+                del self._missing[gap_id]
+
+    async def poll_once(self) -> int:
+        """读取并投递一批新消息，返回读取到的行数"""
+        self._expire_gaps()
+        rows = await asyncio.to_thread(self._fetch_new, self._last_seen_id, sorted(self._missing))
+        for event_id, payload in rows:
+            if self._accept(event_id):
+                await self.deliver(json.loads(payload), event_id)
+        return len(rows)
+
+    async def _poll_loop(self) -> None:
+        polls = 0
+        prune_every = max(1, int(60 / self.poll_seconds))
+        while True:
+            try:
+                count = await self.poll_once()
+                polls += 1
+                if polls % prune_every == 0:
+                    await asyncio.to_thread(self._prune)
+                if count == DB_POLL_BATCH:
+                    continue  # 还有积压，立即读取下一批
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[sse] 轮询广播消息失败: {str(e)}")
+            await asyncio.sleep(self.poll_seconds)
+
+
+def create_backend(name: Optional[str] = None) -> BroadcastBackend:
+    name = (name or os.environ.get(SSE_BACKEND_ENV) or "memory").lower()
+    if name == "database":
+        return DatabaseBackend()
+    if name != "memory":
+        print(f"[sse] 未知的广播后端 {name}，使用 memory")
+    return InProcessBackend()
@@ -1,45 +1,190 @@
 from fastapi import Request
-from typing import List, Dict, Any
+from collections import deque
+from typing import Dict, Any, Optional, Set, Iterable
 import asyncio
 import json
+import time
+from app.sse.backends import BroadcastBackend, create_backend
+
+# 每个客户端最多积压的消息数，超过后丢弃最旧的（优先丢弃可合并的进度消息）
+CLIENT_QUEUE_SIZE = 100
+# 心跳间隔（秒），同时也是检测客户端断开的周期
+HEARTBEAT_SECONDS = 15
+
+# 同一任务的进度消息只保留最新一条
+COALESCE_EVENT_TYPES = {"project_progress"}
+
+# 重放缓冲区大小：客户端携带 Last-Event-ID 重连时，从这里补发错过的消息
+REPLAY_BUFFER_SIZE = 1000
+
+
+def _message_project_ids(message: Dict[str, Any]) -> Set[int]:
+    project_ids = set(message.get("project_ids") or [])
+    if message.get("project_id") is not None:
+        project_ids.add(message["project_id"])
+    return project_ids
+
+
+def _coalesce_key(message: Dict[str, Any]) -> Optional[str]:
+    if message.get("type") in COALESCE_EVENT_TYPES and message.get("task_id") is not None:
+        return f"{message['type']}:{message['task_id']}"
+    return None
+
+
+class SSEClient:
+    """单个 SSE 连接：有界的待发送队列 + 订阅过滤条件"""
+
+    def __init__(
+        self,
+        request: Request,
+        project_ids: Optional[Set[int]] = None,
+        event_types: Optional[Set[str]] = None,
+        max_queue: int = CLIENT_QUEUE_SIZE,
+    ):
+        self.request = request
+        self.project_ids = project_ids or None
+        self.event_types = event_types or None
+        self.max_queue = max_queue
+        self.dropped = 0
+        # 元素为 (合并键, 已序列化的消息帧)
+        self._buffer = deque()
+        self._wakeup = asyncio.Event()
+
+    def wants(self, message: Dict[str, Any], project_ids: Set[int]) -> bool:
+        if self.event_types is not None and message.get("type") not in self.event_types:
+            return False
+        if self.project_ids is not None and not (project_ids & self.project_ids):
+            return False
+        return True
+
+    def offer(self, frame: str, coalesce_key: Optional[str] = None) -> None:
+        """非阻塞入队：可合并的消息替换旧值，队列满时丢弃最旧的消息"""
+        if coalesce_key is not None:
+            for index, (key, _) in enumerate(self._buffer):
+                if key == coalesce_key:
+                    del self._buffer[index]
+                    break
+        if len(self._buffer) >= self.max_queue:
+            self._drop_one()
+        self._buffer.append((coalesce_key, frame))
+        self._wakeup.set()
+
+    def _drop_one(self) -> None:
+        self.dropped += 1
+        for index, (key, _) in enumerate(self._buffer):
+            if key is not None:
+                del self._buffer[index]
+                return
+        self._buffer.popleft()
+
+    def drain(self) -> Iterable[str]:
+        while self._buffer:
+            yield self._buffer.popleft()[1]
+        self._wakeup.clear()
+
+    async def wait(self, timeout: float) -> bool:
+        """等待新消息，超时返回 False"""
+        if self._buffer:
+            return True
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
 
 class SSEConnectionManager:
-    def __init__(self):
-        self.active_connections: List[Request] = []
-        self.connection_queues: Dict[Request, asyncio.Queue] = {}
-    
-    async def connect(self, request: Request) -> asyncio.Queue:
-        # 为每个连接创建一个消息队列
-        queue = asyncio.Queue()
-        self.active_connections.append(request)
-        self.connection_queues[request] = queue
-        return queue
-    
-    def disconnect(self, request: Request):
+    def __init__(
+        self,
+        heartbeat_seconds: float = HEARTBEAT_SECONDS,
+        replay_size: int = REPLAY_BUFFER_SIZE,
+        backend: Optional[BroadcastBackend] = None,
+    ):
+        # 以客户端对象为键，断开时 O(1) 移除
+        self.clients: Dict[int, SSEClient] = {}
+        self.heartbeat_seconds = heartbeat_seconds
+        # 事件 ID 以启动时间（毫秒）为起点单调递增，进程重启后仍大于之前发出的 ID
+        self._last_event_id = int(time.time() * 1000)
+        # 元素为 (事件 ID, 消息, 关联项目 ID, 合并键, 已序列化的消息帧)
+        self._replay = deque(maxlen=replay_size)
+        # 广播后端：默认只在当前进程内投递，多 worker 部署时改用数据库后端
+        self.backend = backend or create_backend()
+        self.backend.bind(self._deliver)
+
+    async def start(self):
+        await self.backend.start()
+
+    async def stop(self):
+        await self.backend.stop()
+
+    async def connect(
+        self,
+        request: Request,
+        project_ids: Optional[Set[int]] = None,
+        event_types: Optional[Set[str]] = None,
+        last_event_id: Optional[int] = None,
+    ) -> SSEClient:
+        # 为每个连接创建一个有界的消息队列
+        client = SSEClient(request, project_ids=project_ids, event_types=event_types)
+        if last_event_id is not None:
+            self._replay_to(client, last_event_id)
+        self.clients[id(client)] = client
+        return client
+
+    def _replay_to(self, client: SSEClient, last_event_id: int) -> None:
+        """补发 last_event_id 之后的消息；缓冲区已覆盖不到时通知客户端全量刷新"""
+        oldest_id = self._replay[0][0] if self._replay else self._last_event_id + 1
+        if last_event_id > self._last_event_id or last_event_id < oldest_id - 1:
+            # ID 来自更早的进程或早于缓冲区，无法保证不漏消息
+            client.offer(self._format({"type": "resync_required"}, self._last_event_id))
+            return
+        for event_id, message, project_ids, coalesce_key, frame in self._replay:
+            if event_id > last_event_id and client.wants(message, project_ids):
+                client.offer(frame, coalesce_key)
+
+    def disconnect(self, client: SSEClient):
         # 断开连接时清理资源
-        if request in self.active_connections:
-            self.active_connections.remove(request)
-        if request in self.connection_queues:
-            del self.connection_queues[request]
-    
+        self.clients.pop(id(client), None)
+
+    @staticmethod
+    def _format(message: Dict[str, Any], event_id: int) -> str:
+        return f"id: {event_id}\ndata: {json.dumps(message)}\n\n"
+
     async def broadcast(self, message: Dict[str, Any]):
-        # 向所有活跃连接广播消息
-        for request, queue in list(self.connection_queues.items()):
-            await queue.put(json.dumps(message))
-    
-    async def send_event(self, queue: asyncio.Queue, request: Request):
+        # 交给广播后端，由其投递到（所有进程中的）连接
+        await self.backend.publish(message)
+
+    async def _deliver(self, message: Dict[str, Any], event_id: Optional[int] = None):
+        # 每条消息只序列化一次，记入重放缓冲区，再按订阅条件分发到各连接
+        if event_id is None:
+            event_id = self._last_event_id + 1
+        # 数据库后端可能补投 ID 更小的迟到消息，最新 ID 不回退
+        self._last_event_id = max(self._last_event_id, event_id)
+        frame = self._format(message, event_id)
+        project_ids = _message_project_ids(message)
+        coalesce_key = _coalesce_key(message)
+        self._replay.append((event_id, message, project_ids, coalesce_key, frame))
+        for client in list(self.clients.values()):
+            if client.wants(message, project_ids):
+                client.offer(frame, coalesce_key)
+
+    async def send_event(self, client: SSEClient, request: Request):
         try:
-            # 发送事件格式
-            yield "data: connected\n\n"
-            
+            # 发送事件格式，并建议浏览器断线 3 秒后重连
+            yield "retry: 3000\ndata: connected\n\n"
+
             while True:
-                # 等待有消息放入队列
-                message = await queue.get()
-                yield f"data: {message}\n\n"
-        except asyncio.CancelledError:
-            # 当请求被取消时，清理连接
-            self.disconnect(request)
-            raise
+                if not await client.wait(self.heartbeat_seconds):
+                    # 长时间无消息：检测断开并发送心跳注释，防止代理断开空闲连接
+                    if await request.is_disconnected():
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+                for frame in client.drain():
+                    yield frame
+        finally:
+            # 客户端断开或请求被取消时，清理连接
+            self.disconnect(client)
 
 # 创建全局实例
-manager = SSEConnectionManager()
\ No newline at end of file
+manager = SSEConnectionManager()
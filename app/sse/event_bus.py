@@ -0,0 +1,147 @@
+# app/sse/event_bus.py
+import asyncio
+import os
+import time
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.models.database import SessionLocal
+from app.models.project import Project as ProjectModel
+from app.sse.connection_manager import SSEConnectionManager, manager
+
+# 尚未投递到事件循环的消息上限，超过后新消息直接丢弃，保证发布方永不阻塞
+MAX_PENDING_EVENTS = 1000
+# 任务 → 项目 ID 缓存的有效期（秒）：其他 worker 进程新建或删除的项目最迟在这段时间后生效
+TASK_PROJECT_CACHE_SECONDS = int(os.environ.get("TASK_PROJECT_CACHE_SECONDS", 5))
+
+
+class EventBus:
+    """后台线程向 SSE 客户端发布消息的统一入口。
+
+    应用启动时捕获 uvicorn 的事件循环，工作线程通过 call_soon_threadsafe
+    把广播交给该循环执行，避免每次发布都新建事件循环、跨线程操作 asyncio.Queue。
+    """
+
+    def __init__(self, sse_manager: SSEConnectionManager, max_pending: int = MAX_PENDING_EVENTS):
+        self.manager = sse_manager
+        self.max_pending = max_pending
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.dropped = 0
+        self._pending = 0
+        self._lock = Lock()
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+
+    def detach(self) -> None:
+        self.loop = None
+
+    def publish(self, message: Dict[str, Any]) -> bool:
+        """线程安全、非阻塞地发布消息；事件循环未就绪或积压过多时丢弃并返回 False"""
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return self._drop()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return self._drop_locked()
+            self._pending += 1
+        try:
+            loop.call_soon_threadsafe(self._dispatch, message)
+        except RuntimeError:
+            # 事件循环已关闭
+            with self._lock:
+                self._pending -= 1
+            return self._drop()
+        return True
+
+    def _dispatch(self, message: Dict[str, Any]) -> None:
+        task = asyncio.ensure_future(self.manager.broadcast(message))
+        task.add_done_callback(self._on_done)
+
+    def _on_done(self, task: "asyncio.Future") -> None:
+        with self._lock:
+            self._pending -= 1
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[event_bus] 广播失败: {task.exception()}")
+
+    def _drop(self) -> bool:
+        with self._lock:
+            return self._drop_locked()
+
+    def _drop_locked(self) -> bool:
+        self.dropped += 1
+        if self.dropped == 1 or self.dropped % 100 == 0:
+            print(f"[event_bus] 事件被丢弃，累计 {self.dropped} 条")
+        return False
+
+
+class TaskProjectIndex:
+    """任务（ProcessedFile）到项目 ID 列表的缓存，避免每次状态广播都查询 projects 表。
+
+    只缓存非空结果：项目通常在任务创建之后才写入，查不到时下次仍会重新查询。
+    项目可能由其他 worker 进程新建或删除（本进程只能通过 add / discard_project 得知自己的改动），
+    因此缓存项在 ttl 秒后过期并重新查询。
+    """
+
+    def __init__(self, ttl: float = TASK_PROJECT_CACHE_SECONDS):
+        self.ttl = ttl
+        # task_id -> (过期时间, 项目 ID 列表)
+        self._cache: Dict[int, Tuple[float, List[int]]] = {}
+        self._lock = Lock()
+
+    def get(self, task_id: int) -> List[int]:
+        return self.get_many([task_id]).get(task_id, [])
+
+    def get_many(self, task_ids: Iterable[int]) -> Dict[int, List[int]]:
+        task_ids = list(task_ids)
+        now = time.monotonic()
+        with self._lock:
+            result = {
+                task_id: list(self._cache[task_id][1]) for task_id in task_ids
+                if task_id in self._cache and self._cache[task_id][0] > now
+            }
+        missing = [task_id for task_id in task_ids if task_id not in result]
+        if missing:
+            db = SessionLocal()
+            try:
+                rows = db.query(ProjectModel.id, ProjectModel.processed_file_id).filter(
+                    ProjectModel.processed_file_id.in_(missing)
+                ).all()
+            finally:
+                db.close()
+            found: Dict[int, List[int]] = {}
+            for project_id, task_id in rows:
+                found.setdefault(task_id, []).append(project_id)
+            expires_at = time.monotonic() + self.ttl
+            with self._lock:
+                for task_id in missing:
+                    if task_id in found:
+                        self._cache[task_id] = (expires_at, found[task_id])
+                    else:
+                        self._cache.pop(task_id, None)
+            for task_id in missing:
+                result[task_id] = list(found.get(task_id, []))
+        return result
+
+    def add(self, task_id: int, project_id: int) -> None:
+        with self._lock:
+            entry = self._cache.get(task_id)
+            if entry is not None and project_id not in entry[1]:
+                entry[1].append(project_id)
+
+    def discard_project(self, task_id: Optional[int], project_id: int) -> None:
+        with self._lock:
+            entry = self._cache.get(task_id)
+            if entry and project_id in entry[1]:
+                entry[1].remove(project_id)
+                if not entry[1]:
+                    self._cache.pop(task_id, None)
+
+    def invalidate(self, task_id: int) -> None:
+        with self._lock:
+            self._cache.pop(task_id, None)
+
+
+# 创建全局实例
+event_bus = EventBus(manager)
+task_projects = TaskProjectIndex()
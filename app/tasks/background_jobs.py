@@ -0,0 +1,190 @@
+# app/tasks/background_jobs.py
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Event, Lock
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.tasks.job_queue import _make_worker_id, _owner_is_dead
+from app.tasks.pipeline import Pipeline, PipelineContext, Stage, TaskCancelled
+from app.tasks.processes import terminate_task_processes
+from app.tasks.scheduler import TrainingScheduler
+
+# 排队 / 运行中的作业状态
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class BackgroundJobService:
+    """状态记录在数据库中的后台作业（网格导出、分割等）的公共执行逻辑。
+
+    子类提供 model（含 id / processed_file_id / status / stage / progress / error / owner 列）、
+    event_prefix（SSE 消息类型前缀与进程登记键）、id_field（消息中的作业编号字段）、
+    stage_progress（阶段完成后的进度）与 prepare()。
+    作业按阶段执行，复用训练流水线的阶段限流、任务日志与进程终止逻辑；
+    同一作业同时只会有一个执行，取消时终止其进程组。
+    """
+
+    model = None
+    event_prefix = "job"
+    id_field = "job_id"
+    stage_progress: Dict[str, int] = {}
+
+    def __init__(
+        self,
+        session_factory,
+        publish: Callable[[dict], bool],
+        stage_scheduler: TrainingScheduler,
+        max_workers: int = 1,
+    ):
+        self.session_factory = session_factory
+        self.publish = publish
+        self.scheduler = stage_scheduler
+        self.worker_id = _make_worker_id()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix=self.event_prefix)
+        self._pending: Dict[int, Future] = {}
+        self._cancel_events: Dict[int, Event] = {}
+        self._lock = Lock()
+
+    # ---------- 子类实现 ----------
+
+    def prepare(self, db: Session, job) -> Tuple[str, List[Stage]]:
+        """返回 (作业目录, 流水线阶段)；输入不完整时抛出 StageFailed"""
+        raise NotImplementedError
+
+    def apply_fields(self, db: Session, job, fields: dict) -> None:
+        """把阶段返回的字段写入作业记录"""
+
+    def finish(self, db: Session, job) -> None:
+        """全部阶段成功后、标记完成前调用（在同一事务中）"""
+
+    def message(self, job) -> dict:
+        return {
+            self.id_field: job.id,
+            "processed_file_id": job.processed_file_id,
+            "status": job.status,
+            "stage": job.stage,
+            "progress": job.progress,
+        }
+
+    # ---------- 提交与取消 ----------
+
+    def submit(self, job_id: int) -> Future:
+        with self._lock:
+            future = self._pending.get(job_id)
+            if future is not None:
+                return future
+            self._cancel_events[job_id] = Event()
+            future = self._executor.submit(self._run, job_id)
+            self._pending[job_id] = future
+        future.add_done_callback(lambda _: self._forget(job_id))
+        return future
+
+    def _forget(self, job_id: int) -> None:
+        with self._lock:
+            self._pending.pop(job_id, None)
+            self._cancel_events.pop(job_id, None)
+
+    def is_active(self, job_id: int) -> bool:
+        with self._lock:
+            return job_id in self._pending
+
+    def is_orphaned(self, job) -> bool:
+        """作业处于排队/运行状态，但执行它的进程（本机）已经不在了，例如服务重启"""
+        if job.status not in ACTIVE_STATUSES or self.is_active(job.id):
+            return False
+        return job.owner == self.worker_id or _owner_is_dead(job.owner)
+
+    def cancel(self, job_id: int) -> bool:
+        """取消本进程中的作业：设置取消标志并终止其进程组（会阻塞最长 2 秒）"""
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+            future = self._pending.get(job_id)
+        if event is None:
+            return False
+        event.set()
+        if future is not None:
+            future.cancel()
+        terminate_task_processes((self.event_prefix, job_id))
+        return True
+
+    def shutdown(self) -> None:
+        with self._lock:
+            events = list(self._cancel_events.values())
+        for event in events:
+            event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- 执行 ----------
+
+    def _notify(self, job, suffix: str) -> None:
+        message = {"type": f"{self.event_prefix}_{suffix}", **self.message(job)}
+        if job.error:
+            message["msg"] = job.error
+        self.publish(message)
+
+    def _mark_running(self, db: Session, job) -> bool:
+        """仅当作业仍在排队 / 运行时将其标记为由本进程运行（条件 UPDATE，不会覆盖其他进程写入的取消状态）"""
+        claimed = db.query(self.model).filter(
+            self.model.id == job.id,
+            self.model.status.in_(ACTIVE_STATUSES)
+        ).update({
+            self.model.status: "running",
+            self.model.owner: self.worker_id,
+            self.model.progress: 5,
+        }, synchronize_session=False)
+        db.commit()
+        db.refresh(job)
+        if claimed:
+            self._notify(job, "progress")
+        return bool(claimed)
+
+    def _run(self, job_id: int) -> None:
+        db = self.session_factory()
+        job = None
+        cancel_event = self._cancel_events.get(job_id) or Event()
+        try:
+            job = db.query(self.model).filter(self.model.id == job_id).first()
+            if job is None or job.status not in ACTIVE_STATUSES:
+                return
+            job_dir, stages = self.prepare(db, job)
+            if not self._mark_running(db, job):
+                # 准备期间已被取消
+                return
+
+            def on_status(status: str, fields: dict) -> None:
+                db.refresh(job)
+                if job.status == "cancelled":
+                    # 其他进程通过接口取消了作业，下一阶段开始前停止
+                    cancel_event.set()
+                    return
+                job.stage = status
+                job.progress = self.stage_progress.get(status, job.progress)
+                self.apply_fields(db, job, fields)
+                db.commit()
+                self._notify(job, "progress")
+
+            ctx = PipelineContext(job.processed_file_id, job_dir, cancel_event, process_key=(self.event_prefix, job_id))
+            Pipeline(self.scheduler, stages).run(ctx, on_status)
+            ctx.check_cancelled()
+            self.finish(db, job)
+            job.status = "done"
+            job.progress = 100
+            db.commit()
+            self._notify(job, "done")
+        except TaskCancelled:
+            db.rollback()
+            if job is not None:
+                job.status = "cancelled"
+                db.commit()
+                self._notify(job, "cancelled")
+        except Exception as e:
+            db.rollback()
+            print(f"[{self.event_prefix}] 后台作业失败(id={job_id}): {str(e)}")
+            if job is not None:
+                tail = getattr(e, "tail", None)
+                job.status = "failed"
+                job.error = str(e) + ("\n" + "\n".join(tail) if tail else "")
+                db.commit()
+                self._notify(job, "failed")
+        finally:
+            db.close()
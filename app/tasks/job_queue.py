@@ -0,0 +1,304 @@
+# app/tasks/job_queue.py
+import datetime
+import os
+import socket
+import threading
+import uuid
+from typing import Callable, Optional, Set
+
+from sqlalchemy import case, or_
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models.processed_file import ProcessedFile as ProcessedFileModel
+from app.tasks.scheduler import TrainingScheduler
+
+# 已开始执行（占用租约）的任务状态
+RUNNING_STATUSES = ["pending", "imaged", "converted"]
+
+# 租约有效期、心跳与轮询间隔（秒）
+LEASE_SECONDS = int(os.environ.get("THREEDGS_LEASE_SECONDS", 60))
+HEARTBEAT_SECONDS = max(1, LEASE_SECONDS // 4)
+POLL_SECONDS = float(os.environ.get("THREEDGS_QUEUE_POLL_SECONDS", 5))
+# 同一任务最多被认领执行的次数，超过后标记为失败，避免坏任务反复拖垮工作进程
+MAX_ATTEMPTS = int(os.environ.get("THREEDGS_MAX_ATTEMPTS", 3))
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+def _make_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _owner_is_dead(owner: Optional[str]) -> bool:
+    """判断同一台机器上的租约持有进程是否已经退出（如 uvicorn 重载后的旧进程）"""
+    if not owner:
+        return True
+    try:
+        host, pid, _ = owner.split(":", 2)
+        if host != socket.gethostname():
+            return False
+        os.kill(int(pid), 0)
+        return False
+    except ProcessLookupError:
+        return True
+    except Exception:
+        return False
+
+
+class DurableJobQueue:
+    """基于 processed_files 表的持久化任务队列。
+
+    - 任务以 status="queued" 入队，各 API 进程用 SELECT ... FOR UPDATE SKIP LOCKED 认领，
+      认领后写入 lease_owner / lease_expires_at，多个进程可以共享同一个队列；
+    - 执行期间后台线程定期续约（心跳），进程崩溃或重载后租约自然过期；
+    - 恢复流程把租约过期（或持有进程已退出）的运行中任务重新放回队列，
+      启动时执行一次，之后随轮询周期执行。
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        scheduler: TrainingScheduler,
+        runner: Callable[[int], None],
+        on_lease_lost: Optional[Callable[[int], None]] = None,
+    ):
+        self.session_factory = session_factory
+        self.scheduler = scheduler
+        self.runner = runner
+        self.on_lease_lost = on_lease_lost
+        self.worker_id = _make_worker_id()
+        self._held: Set[int] = set()
+        self._held_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    # ---------- 生命周期 ----------
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stop.clear()
+        try:
+            self.recover_orphans()
+        except Exception as e:
+            print(f"[job_queue] 启动恢复失败: {str(e)}")
+        for target, name in ((self._dispatch_loop, "3dgs-dispatch"), (self._heartbeat_loop, "3dgs-heartbeat")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self.wake()
+        print(f"[job_queue] 工作进程 {self.worker_id} 已启动")
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        # 停止本进程中仍在执行的任务，并主动归还租约，让其他进程无需等待过期即可接管
+        with self._held_lock:
+            held = list(self._held)
+        if held:
+            if self.on_lease_lost:
+                for task_id in held:
+                    self.on_lease_lost(task_id)
+            self._requeue(held)
+
+    def wake(self) -> None:
+        """有新任务入队时调用，立即触发一次认领"""
+        self._wakeup.set()
+
+    # ---------- 认领与执行 ----------
+
+    def claim(self, limit: int) -> list:
+        """认领最多 limit 个排队任务，返回认领到的任务 ID 列表"""
+        if limit <= 0:
+            return []
+        db: Session = self.session_factory()
+        try:
+            now = _utcnow()
+            rows = db.query(ProcessedFileModel).filter(
+                ProcessedFileModel.status == "queued",
+                or_(
+                    ProcessedFileModel.lease_owner == None,
+                    ProcessedFileModel.lease_expires_at == None,
+                    ProcessedFileModel.lease_expires_at < now,
+                ),
+            ).order_by(ProcessedFileModel.id.asc()).limit(limit).with_for_update(skip_locked=True).all()
+            claimed = []
+            for row in rows:
+                row.attempts = (row.attempts or 0) + 1
+                if row.attempts > MAX_ATTEMPTS:
+                    print(f"[job_queue] 任务 {row.id} 已重试 {row.attempts - 1} 次，标记为失败")
+                    row.status = "failed"
+                    row.lease_owner = None
+                    row.lease_expires_at = None
+                    continue
+                row.lease_owner = self.worker_id
+                row.lease_expires_at = now + datetime.timedelta(seconds=LEASE_SECONDS)
+                row.heartbeat_at = now
+                claimed.append(row.id)
+            db.commit()
+            return claimed
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _run(self, task_id: int) -> None:
+        try:
+            self.runner(task_id)
+        finally:
+            self._release(task_id)
+            self.wake()
+
+    def _release(self, task_id: int) -> None:
+        with self._held_lock:
+            self._held.discard(task_id)
+        db: Session = self.session_factory()
+        try:
+            db.query(ProcessedFileModel).filter(
+                ProcessedFileModel.id == task_id,
+                ProcessedFileModel.lease_owner == self.worker_id,
+            ).update({
+                ProcessedFileModel.lease_owner: None,
+                ProcessedFileModel.lease_expires_at: None,
+            }, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"[job_queue] 释放任务 {task_id} 租约失败: {str(e)}")
+        finally:
+            db.close()
+
+    def _requeue(self, task_ids: list) -> None:
+        db: Session = self.session_factory()
+        try:
+            db.query(ProcessedFileModel).filter(
+                ProcessedFileModel.id.in_(task_ids),
+                ProcessedFileModel.lease_owner == self.worker_id,
+                ProcessedFileModel.status.in_(["queued"] + RUNNING_STATUSES),
+            ).update({
+                ProcessedFileModel.status: "queued",
+                ProcessedFileModel.lease_owner: None,
+                ProcessedFileModel.lease_expires_at: None,
+                # 正常停止（如重载、重启）主动归还的任务不计入重试次数，只有崩溃或租约过期才计入
+                ProcessedFileModel.attempts: case(
+                    (ProcessedFileModel.attempts > 0, ProcessedFileModel.attempts - 1),
+                    else_=0,
+                ),
+            }, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"[job_queue] 归还任务租约失败: {str(e)}")
+        finally:
+            db.close()
+
+    def _dispatch_once(self) -> None:
+        free = self.scheduler.max_jobs - self.scheduler.active_count()
+        for task_id in self.claim(free):
+            with self._held_lock:
+                self._held.add(task_id)
+            self.scheduler.submit(task_id, self._run, task_id)
+            print(f"[job_queue] 已认领任务 {task_id}")
+
+    def _dispatch_loop(self) -> None:
+        last_recover = 0.0
+        while not self._stop.is_set():
+            self._wakeup.wait(timeout=POLL_SECONDS)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            try:
+                now = _utcnow().timestamp()
+                if now - last_recover >= LEASE_SECONDS / 2:
+                    self.recover_orphans()
+                    last_recover = now
+                self._dispatch_once()
+            except Exception as e:
+                print(f"[job_queue] 认领任务出错: {str(e)}")
+
+    # ---------- 心跳与恢复 ----------
+
+    def heartbeat(self) -> None:
+        """为本进程持有的任务续约；发现租约已被其他进程接管或任务已被取消时通知调用方停止执行"""
+        with self._held_lock:
+            held = list(self._held)
+        if not held:
+            return
+        db: Session = self.session_factory()
+        try:
+            now = _utcnow()
+            db.query(ProcessedFileModel).filter(
+                ProcessedFileModel.id.in_(held),
+                ProcessedFileModel.lease_owner == self.worker_id,
+                ProcessedFileModel.status != "failed",
+            ).update({
+                ProcessedFileModel.lease_expires_at: now + datetime.timedelta(seconds=LEASE_SECONDS),
+                ProcessedFileModel.heartbeat_at: now,
+            }, synchronize_session=False)
+            db.commit()
+            still_owned = {
+                row.id for row in db.query(ProcessedFileModel.id).filter(
+                    ProcessedFileModel.id.in_(held),
+                    ProcessedFileModel.lease_owner == self.worker_id,
+                    # 其他进程的取消接口会把任务标记为 failed
+                    ProcessedFileModel.status != "failed",
+                )
+            }
+        except Exception as e:
+            db.rollback()
+            print(f"[job_queue] 心跳失败: {str(e)}")
+            return
+        finally:
+            db.close()
+        for task_id in set(held) - still_owned:
+            with self._held_lock:
+                if task_id not in self._held:
+                    continue  # 心跳期间任务已正常结束
+            print(f"[job_queue] 任务 {task_id} 的租约已丢失或任务已被取消")
+            if self.on_lease_lost:
+                self.on_lease_lost(task_id)
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stop.wait(HEARTBEAT_SECONDS):
+            self.heartbeat()
+
+    def recover_orphans(self) -> int:
+        """把租约过期、无租约或持有进程已退出的运行中任务重新放回队列"""
+        db: Session = self.session_factory()
+        try:
+            now = _utcnow()
+            candidates = db.query(ProcessedFileModel).filter(
+                ProcessedFileModel.status.in_(["queued"] + RUNNING_STATUSES),
+                or_(
+                    ProcessedFileModel.status.in_(RUNNING_STATUSES),
+                    ProcessedFileModel.lease_owner != None,
+                ),
+            ).with_for_update(skip_locked=True).all()
+            recovered = 0
+            for row in candidates:
+                if row.lease_owner == self.worker_id:
+                    continue
+                expired = row.lease_expires_at is None or row.lease_expires_at < now
+                if not (expired or _owner_is_dead(row.lease_owner)):
+                    continue
+                print(f"[job_queue] 恢复孤儿任务 {row.id} (status={row.status}, owner={row.lease_owner})")
+                row.status = "queued"
+                row.lease_owner = None
+                row.lease_expires_at = None
+                recovered += 1
+            db.commit()
+            if recovered:
+                self.wake()
+            return recovered
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
@@ -0,0 +1,195 @@
+# app/tasks/mesh_export.py
+import hashlib
+import json
+import os
+import shutil
+import zipfile
+from typing import Optional, Tuple
+
+from app.core.uploads import upload_url
+from app.models.database import SessionLocal
+from app.models.mesh_export import MeshExport as MeshExportModel
+from app.sse.event_bus import event_bus
+from app.tasks.background_jobs import ACTIVE_STATUSES, BackgroundJobService
+from app.tasks.pipeline import Stage, StageFailed, run_command
+from app.tasks.scheduler import scheduler
+from app.tasks.task_log import LOG_DIRNAME
+
+GAUSTUDIO_DIRECTORY = os.environ.get("GAUSTUDIO_DIRECTORY", "/workspace/gaustudio/")
+# 同时执行的导出作业数（GPU 与纹理阶段另受调度器名额限制）
+MESH_EXPORT_WORKERS = int(os.environ.get("MESH_EXPORT_WORKERS", 2))
+
+MESH_DIRNAME = "mesh"
+MESH_ZIP_FILENAME = "mesh.zip"
+TEXRECON_DATA_TERMS = ("area", "gmi")
+TEXRECON_OUTLIER_REMOVALS = ("none", "gauss_clamping", "gauss_damping")
+# 各阶段完成后的进度
+STAGE_PROGRESS = {"meshed": 60, "textured": 90, "packaged": 100}
+# 已经压缩过的格式直接存储，不再 deflate
+STORED_SUFFIXES = (".png", ".jpg", ".jpeg", ".webp")
+
+
+def resolve_mesh_inputs(folder_path: str) -> Tuple[str, Optional[str]]:
+    """返回 (模型目录, cameras.json 路径)：优先 results 目录，导入的项目没有 results 时使用任务目录"""
+    folder_abs = os.path.abspath(folder_path)
+    result_dir = os.path.join(folder_abs, "results")
+    if not os.path.isdir(result_dir):
+        result_dir = folder_abs
+    for candidate in (os.path.join(result_dir, "cameras.json"), os.path.join(folder_abs, "cameras.json")):
+        if os.path.isfile(candidate):
+            return result_dir, candidate
+    return result_dir, None
+
+
+def mesh_export_key(processed_file_id: int, point_cloud_path: str, params: dict) -> str:
+    """缓存键：点云重新训练（修改时间或大小变化）或导出参数不同时生成新的导出结果"""
+    stat_result = os.stat(point_cloud_path)
+    payload = json.dumps({
+        "processed_file_id": processed_file_id,
+        "mtime_ns": stat_result.st_mtime_ns,
+        "size": stat_result.st_size,
+        "params": params,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def export_dir_for(folder_path: str, cache_key: str) -> str:
+    return os.path.join(os.path.abspath(folder_path), MESH_DIRNAME, cache_key[:16])
+
+
+def build_mesh_zip(source_dir: str, zip_path: str, prefixes: Tuple[str, ...]) -> int:
+    """逐个文件流式写入 ZIP（不在内存中拼接），图片直接存储；写入临时文件后原子替换，返回文件数"""
+    tmp_path = zip_path + ".tmp"
+    count = 0
+    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as zipf:
+        for root, dirs, files in os.walk(source_dir):
+            dirs[:] = sorted(d for d in dirs if d != LOG_DIRNAME)
+            for file in sorted(files):
+                if not file.startswith(prefixes):
+                    continue
+                file_path = os.path.join(root, file)
+                compress_type = zipfile.ZIP_STORED if file.lower().endswith(STORED_SUFFIXES) else zipfile.ZIP_DEFLATED
+                zipf.write(file_path, os.path.relpath(file_path, source_dir), compress_type=compress_type)
+                count += 1
+    if count == 0:
+        os.remove(tmp_path)
+        return 0
+    os.replace(tmp_path, zip_path)
+    return count
+
+
+class MeshExtractStage(Stage):
+    """gs-extract-mesh：渲染深度并融合出 fused_mesh.ply，需要占用 GPU 槽位"""
+
+    name = "mesh"
+    scheduler_stage = "mesh"
+    done_status = "meshed"
+
+    def __init__(self, result_dir: str, cameras_path: str, cwd: str = GAUSTUDIO_DIRECTORY):
+        self.result_dir = result_dir
+        self.cameras_path = cameras_path
+        self.cwd = cwd
+
+    def run(self, ctx, lease):
+        # 确保 cameras.json 在模型目录下
+        cameras_path = os.path.join(self.result_dir, "cameras.json")
+        if not os.path.exists(cameras_path):
+            shutil.copy2(self.cameras_path, cameras_path)
+        run_command(ctx, self.name, [
+            "gs-extract-mesh",
+            "-m", self.result_dir,
+            "-s", cameras_path,
+            "-o", ctx.absolute_output_folder,
+        ], cwd=self.cwd, env=lease.env if lease else None)
+        if not os.path.isfile(os.path.join(ctx.absolute_output_folder, "fused_mesh.ply")):
+            raise StageFailed(self.name, "gs-extract-mesh 未生成 fused_mesh.ply")
+
+
+class TextureStage(Stage):
+    """texrecon：为网格生成纹理（CPU 密集）"""
+
+    name = "texture"
+    scheduler_stage = "texture"
+    done_status = "textured"
+
+    def __init__(self, params: dict):
+        self.params = params
+
+    def should_run(self, ctx):
+        return self.params.get("texture", True)
+
+    def run(self, ctx, lease):
+        run_command(ctx, self.name, [
+            "texrecon",
+            "./images",
+            "./fused_mesh.ply",
+            "./textured_mesh",
+            f"--outlier_removal={self.params['outlier_removal']}",
+            f"--data_term={self.params['data_term']}",
+            "--no_intermediate_results",
+        ], cwd=ctx.absolute_output_folder)
+
+
+class PackageStage(Stage):
+    """把导出结果打包为 ZIP"""
+
+    name = "package"
+    done_status = "packaged"
+
+    def __init__(self, params: dict):
+        self.params = params
+
+    def run(self, ctx, lease):
+        prefixes = ("textured_mesh",) if self.params.get("texture", True) else ("fused_mesh",)
+        zip_path = os.path.join(ctx.absolute_output_folder, MESH_ZIP_FILENAME)
+        if build_mesh_zip(ctx.absolute_output_folder, zip_path, prefixes) == 0:
+            raise StageFailed(self.name, f"没有可打包的网格文件: {', '.join(prefixes)}*")
+        return {"result_path": zip_path}
+
+
+class MeshExportService(BackgroundJobService):
+    """在后台线程中执行网格导出作业（mesh → texture → package），状态写入 mesh_exports 表并通过 SSE 通知前端"""
+
+    model = MeshExportModel
+    event_prefix = "mesh_export"
+    id_field = "export_id"
+    stage_progress = STAGE_PROGRESS
+
+    def prepare(self, db, export):
+        processed_file = export.processed_file
+        params = json.loads(export.params)
+        result_dir, cameras_path = resolve_mesh_inputs(processed_file.folder_path)
+        if cameras_path is None:
+            raise StageFailed("mesh", "cameras.json not found in project")
+        export_dir = export_dir_for(processed_file.folder_path, export.cache_key)
+        os.makedirs(export_dir, exist_ok=True)
+        return export_dir, [
+            MeshExtractStage(result_dir, cameras_path),
+            TextureStage(params),
+            PackageStage(params),
+        ]
+
+    def apply_fields(self, db, export, fields):
+        if fields.get("result_path"):
+            export.result_path = upload_url(fields["result_path"])
+
+    def finish(self, db, export):
+        self._prune_stale(db, export)
+
+    def _prune_stale(self, db, export: MeshExportModel) -> None:
+        """删除同一任务、同一参数下基于旧点云的导出结果（重新训练后已失效）"""
+        stale = db.query(MeshExportModel).filter(
+            MeshExportModel.processed_file_id == export.processed_file_id,
+            MeshExportModel.params == export.params,
+            MeshExportModel.id != export.id,
+            MeshExportModel.status.notin_(ACTIVE_STATUSES)
+        ).all()
+        for old in stale:
+            shutil.rmtree(export_dir_for(export.processed_file.folder_path, old.cache_key), ignore_errors=True)
+            db.delete(old)
+        if stale:
+            db.commit()
+
+
+# 创建全局实例
+mesh_export_service = MeshExportService(SessionLocal, event_bus.publish, scheduler, MESH_EXPORT_WORKERS)
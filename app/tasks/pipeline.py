@@ -0,0 +1,313 @@
+# app/tasks/pipeline.py
+import json
+import os
+import subprocess
+import time
+from threading import Event
+from typing import Callable, Dict, Hashable, List, Optional, Union
+
+from app.tasks.processes import register_process, unregister_process
+from app.tasks.progress import ProgressReporter
+from app.tasks.scheduler import StageLease, TrainingScheduler
+from app.tasks.task_log import open_sink
+
+# 失败时输出的末尾行数
+OUTPUT_TAIL_LINES = 10
+
+# 阶段耗时记录文件（位于任务目录下）
+TIMINGS_FILENAME = "pipeline_timings.json"
+
+
+class TaskCancelled(Exception):
+    """任务在执行过程中被取消"""
+
+
+class StageFailed(Exception):
+    """阶段执行失败，携带子进程最后几行输出便于排查"""
+
+    def __init__(self, stage: str, message: str, tail: Optional[List[str]] = None):
+        super().__init__(message)
+        self.stage = stage
+        self.tail = list(tail or [])
+
+
+class PipelineContext:
+    """一次重建任务在各阶段之间共享的状态"""
+
+    def __init__(
+        self,
+        task_id: int,
+        absolute_output_folder: str,
+        cancel_event: Event,
+        progress: Optional[ProgressReporter] = None,
+        process_key: Optional[Hashable] = None,
+    ):
+        self.task_id = task_id
+        self.absolute_output_folder = absolute_output_folder
+        self.cancel_event = cancel_event
+        self.progress = progress
+        # 子进程登记用的键，训练任务即 task_id；其他后台作业（如网格导出）使用独立的键，避免取消时互相影响
+        self.process_key = task_id if process_key is None else process_key
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self) -> None:
+        if self.cancelled:
+            raise TaskCancelled()
+
+
+def run_command(
+    ctx: PipelineContext,
+    stage: str,
+    command: Union[str, List[str]],
+    cwd: Optional[str] = None,
+    env: Optional[Dict[str, str]] = None,
+) -> List[str]:
+    """运行一个可中断的子进程，并把输出写入该阶段的任务日志。
+
+    - 子进程以新会话启动，并登记到任务进程表，取消时可按进程组终止；
+    - 输出批量写入 uploads/<folder>/logs/<stage>.log，失败时抛出携带末尾行的 StageFailed；
+    - 每行输出同时交给进度解析器（如有），由其限频发布进度事件；
+    - 运行中或结束后发现任务已取消则抛出 TaskCancelled。
+    """
+    ctx.check_cancelled()
+    sink = open_sink(ctx.task_id, ctx.absolute_output_folder, stage)
+    try:
+        process = subprocess.Popen(
+            command,
+            shell=isinstance(command, str),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,  # 合并 stderr 到 stdout
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            cwd=cwd,
+            env=env,
+            start_new_session=True,
+            bufsize=1,  # 行缓冲
+            universal_newlines=True,
+        )
+        register_process(ctx.process_key, process)
+        try:
+            for line in iter(process.stdout.readline, ""):
+                if ctx.cancelled:
+                    print(f"任务{ctx.task_id}已被取消，终止 {stage} 进程。")
+                    process.terminate()
+                    break
+                line = line.rstrip()
+                if line:
+                    sink.write(line)
+                    if ctx.progress is not None:
+                        ctx.progress.feed(stage, line)
+            process.wait()
+        finally:
+            unregister_process(ctx.process_key, process)
+            if ctx.progress is not None:
+                ctx.progress.flush()
+        ctx.check_cancelled()
+        if process.returncode != 0:
+            raise StageFailed(stage, f"{stage} failed rc={process.returncode}", sink.tail(OUTPUT_TAIL_LINES))
+        return sink.tail(OUTPUT_TAIL_LINES)
+    finally:
+        sink.close()
+
+
+class Stage:
+    """流水线阶段基类。
+
+    - scheduler_stage: 对应调度器中的限流名（ffmpeg / convert / train），None 表示不限流；
+    - done_status: 阶段成功后写入 ProcessedFile.status 的状态，None 表示不更新。
+    """
+
+    name = "stage"
+    scheduler_stage: Optional[str] = None
+    done_status: Optional[str] = None
+
+    def should_run(self, ctx: PipelineContext) -> bool:
+        return True
+
+    def run(self, ctx: PipelineContext, lease: Optional[StageLease]) -> Optional[dict]:
+        """执行阶段，可返回需要一并写入任务记录的字段"""
+        raise NotImplementedError
+
+
+class ExtractFramesStage(Stage):
+    """使用 ffmpeg 从视频中按固定帧率抽帧到 input/ 目录"""
+
+    name = "extract"
+    scheduler_stage = "ffmpeg"
+    done_status = "imaged"
+
+    def __init__(self, input_video_path: str, output_pattern: str, fps: int = 2):
+        self.input_video_path = input_video_path
+        self.output_pattern = output_pattern
+        self.fps = fps
+
+    def run(self, ctx, lease):
+        run_command(ctx, self.name, [
+            "ffmpeg",
+            "-y",
+            "-i",
+            self.input_video_path,
+            "-qscale",
+            "1",
+            "-qmin",
+            "1",
+            "-vf",
+            f"fps={self.fps}",
+            self.output_pattern,
+        ])
+
+
+class ConvertStage(Stage):
+    """运行 COLMAP 转换脚本（convert.py），算法未提供时跳过"""
+
+    name = "convert"
+    scheduler_stage = "convert"
+    done_status = "converted"
+
+    def __init__(self, command: Optional[str], cwd: Optional[str] = None):
+        self.command = command
+        self.cwd = cwd
+
+    def should_run(self, ctx):
+        return bool(self.command)
+
+    def run(self, ctx, lease):
+        print(f"[threeDGS] 开始执行转换命令 (task_id={ctx.task_id})")
+        print(f"[threeDGS] 工作目录: {self.cwd}")
+        print(f"[threeDGS] 转换命令: {self.command}")
+        # 检查输入目录状态
+        input_dir = os.path.join(ctx.absolute_output_folder, "input")
+        if os.path.exists(input_dir):
+            print(f"[threeDGS] 输入目录包含 {len(os.listdir(input_dir))} 个文件")
+        else:
+            print(f"[threeDGS] 警告：输入目录不存在: {input_dir}")
+        run_command(ctx, self.name, self.command, cwd=self.cwd, env=lease.env if lease else None)
+        print(f"[threeDGS] 转换命令成功完成 (task_id={ctx.task_id})")
+
+
+class TrainStage(Stage):
+    """在调度器分配的 GPU 槽位上运行训练脚本"""
+
+    name = "train"
+    scheduler_stage = "train"
+
+    def __init__(self, command: str, cwd: Optional[str] = None):
+        self.command = command
+        self.cwd = cwd
+
+    def run(self, ctx, lease):
+        print(f"[threeDGS] 开始训练 (task_id={ctx.task_id})")
+        run_command(ctx, self.name, self.command, cwd=self.cwd, env=lease.env if lease else None)
+
+
+class ExportStage(Stage):
+    """训练后把点云转换为浏览器友好的格式（压缩格式、LOD 分块等）。
+
+    导出失败不影响任务结果，前端仍可使用原始 PLY。
+    """
+
+    name = "export"
+    scheduler_stage = "export"
+
+    def __init__(self, export: Callable[[PipelineContext], dict], name: Optional[str] = None):
+        self.export = export
+        if name:
+            self.name = name
+
+    def run(self, ctx, lease):
+        try:
+            return self.export(ctx)
+        except Exception as e:
+            print(f"[threeDGS] 阶段 {self.name} 导出失败 (task_id={ctx.task_id}): {str(e)}")
+            return {}
+
+
+class PostProcessStage(Stage):
+    """训练后处理：定位结果文件等纯 CPU 工作，不占用 GPU 槽位"""
+
+    name = "post"
+    done_status = "trained"
+
+    def __init__(self, resolve_result_url: Callable[[PipelineContext], str]):
+        self.resolve_result_url = resolve_result_url
+
+    def run(self, ctx, lease):
+        return {"result_url": self.resolve_result_url(ctx)}
+
+
+class Pipeline:
+    """按顺序执行各阶段。
+
+    每个阶段只在执行期间占用调度器中对应的名额（GPU 阶段占用槽位），阶段结束即释放，
+    因此当前任务训练时，其他任务的抽帧 / 转换可以并行进行，训练结束后的后处理
+    也不会继续占用 GPU。每个阶段的排队等待时间与运行时间都会被记录。
+    """
+
+    def __init__(self, scheduler: TrainingScheduler, stages: List[Stage]):
+        self.scheduler = scheduler
+        self.stages = stages
+
+    def _run_stage(self, ctx: PipelineContext, stage: Stage) -> Optional[dict]:
+        waited_at = time.monotonic()
+        if stage.scheduler_stage is None:
+            ctx.check_cancelled()
+            started_at = time.monotonic()
+            result = stage.run(ctx, None)
+        else:
+            with self.scheduler.stage(stage.scheduler_stage, ctx.cancel_event) as lease:
+                if lease is None:
+                    raise TaskCancelled()
+                started_at = time.monotonic()
+                result = stage.run(ctx, lease)
+        finished_at = time.monotonic()
+        ctx.timings[stage.name] = {
+            "wait_seconds": round(started_at - waited_at, 3),
+            "run_seconds": round(finished_at - started_at, 3),
+        }
+        print(
+            f"[threeDGS] 阶段 {stage.name} 完成 (task_id={ctx.task_id}, "
+            f"等待 {ctx.timings[stage.name]['wait_seconds']}s, 运行 {ctx.timings[stage.name]['run_seconds']}s)"
+        )
+        return result
+
+    def run(self, ctx: PipelineContext, on_status: Callable[[str, dict], None]) -> None:
+        """依次执行各阶段；取消时抛出 TaskCancelled，失败时抛出 StageFailed"""
+        try:
+            # 没有对应状态的阶段返回的字段随下一次状态更新一起写入
+            pending_fields: dict = {}
+            for stage in self.stages:
+                if not stage.should_run(ctx):
+                    continue
+                pending_fields.update(self._run_stage(ctx, stage) or {})
+                if stage.done_status:
+                    on_status(stage.done_status, pending_fields)
+                    pending_fields = {}
+        finally:
+            write_timings(ctx)
+
+
+def write_timings(ctx: PipelineContext) -> None:
+    """将阶段耗时写入任务目录，便于事后分析"""
+    if not os.path.isdir(ctx.absolute_output_folder):
+        return  # 取消任务时目录可能已被删除
+    try:
+        with open(os.path.join(ctx.absolute_output_folder, TIMINGS_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(ctx.timings, f)
+    except Exception as e:
+        print(f"写入阶段耗时失败(task_id={ctx.task_id}): {str(e)}")
+
+
+def read_timings(absolute_output_folder: str) -> Optional[Dict[str, Dict[str, float]]]:
+    path = os.path.join(absolute_output_folder, TIMINGS_FILENAME)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
@@ -0,0 +1,65 @@
+# app/tasks/processes.py
+import os
+import signal
+import subprocess
+import time
+from threading import Lock
+from typing import Dict, Hashable, List
+
+# 任务运行中的子进程记录（用于快速终止），键为训练任务 id，其他后台作业使用 (类型, id)
+# 注意：子进程以新的会话启动（start_new_session=True），便于通过进程组一次性杀死孙子进程
+task_processes: Dict[Hashable, List[subprocess.Popen]] = {}
+task_proc_lock = Lock()
+
+# 等待进程退出时的轮询间隔（秒）
+TERMINATE_POLL_SECONDS = 0.05
+
+
+def register_process(task_id: Hashable, process: subprocess.Popen) -> None:
+    with task_proc_lock:
+        task_processes.setdefault(task_id, []).append(process)
+
+
+def unregister_process(task_id: Hashable, process: subprocess.Popen) -> None:
+    with task_proc_lock:
+        processes = task_processes.get(task_id)
+        if processes and process in processes:
+            processes.remove(process)
+            if not processes:
+                task_processes.pop(task_id, None)
+
+
+def forget_task_processes(task_id: Hashable) -> None:
+    """清理任务的进程登记"""
+    with task_proc_lock:
+        task_processes.pop(task_id, None)
+
+
+def terminate_task_processes(task_id: Hashable, grace_seconds: float = 2.0) -> None:
+    """向任务的进程组发送终止信号，尽快结束正在进行的阶段。
+
+    先发 SIGTERM 给予优雅退出时间，随后用 SIGKILL 强制终止。
+    该函数会阻塞（最长 grace_seconds），async 路由中应通过 io_pool 调用。
+    """
+    with task_proc_lock:
+        procs = list(task_processes.get(task_id, []))
+    if not procs:
+        return
+    # 先尝试 SIGTERM 到整个进程组
+    for p in procs:
+        try:
+            if p.poll() is None:
+                os.killpg(p.pid, signal.SIGTERM)
+        except Exception:
+            pass
+    # 在宽限期内轮询，进程全部退出后立即返回，不再固定睡满整个宽限期
+    deadline = time.monotonic() + max(0.0, min(grace_seconds, 5.0))
+    while time.monotonic() < deadline and any(p.poll() is None for p in procs):
+        time.sleep(TERMINATE_POLL_SECONDS)
+    # 仍未退出则 SIGKILL
+    for p in procs:
+        try:
+            if p.poll() is None:
+                os.killpg(p.pid, signal.SIGKILL)
+        except Exception:
+            pass
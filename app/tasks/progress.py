@@ -0,0 +1,118 @@
+# app/tasks/progress.py
+import re
+import time
+from threading import Lock
+from typing import Callable, Dict, Optional
+
+# 同一任务两次进度事件之间的最小间隔（秒），即每个任务最多每秒 2 条
+MIN_PUBLISH_INTERVAL = 0.5
+
+# 3DGS 系列训练脚本的 tqdm 进度条，例如：
+# Training progress:  10%|█         | 3000/30000 [01:02<09:18, 48.3it/s, Loss=0.0523412]
+_TQDM_RE = re.compile(
+    r"(\d+)/(\d+)\s*\[([\d:]+)<([\d:?]+)(?:,\s*([\d.]+)\s*(?:it/s|s/it))?(?:,\s*Loss=([-+\d.eE]+))?"
+)
+# [ITER 7000] Evaluating test: L1 0.0321 PSNR 27.15
+_EVAL_RE = re.compile(r"\[ITER (\d+)\] Evaluating (\w+): L1 ([-+\d.eE]+) PSNR ([-+\d.eE]+)")
+# COLMAP mapper: Registering image #12 (13)
+_COLMAP_REGISTER_RE = re.compile(r"Registering image #\d+ \((\d+)\)")
+# ffmpeg: frame=  123 fps= 45 ...
+_FFMPEG_FRAME_RE = re.compile(r"frame=\s*(\d+)")
+
+
+def _parse_clock(value: str) -> Optional[int]:
+    """把 tqdm 的 [h:]mm:ss 转换为秒"""
+    if not value or "?" in value:
+        return None
+    seconds = 0
+    for part in value.split(":"):
+        if not part.isdigit():
+            return None
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def parse_progress_line(stage: str, line: str) -> Optional[Dict[str, object]]:
+    """从子进程的一行输出中提取进度字段，无法识别时返回 None"""
+    if stage == "train":
+        match = _EVAL_RE.search(line)
+        if match:
+            return {
+                "iteration": int(match.group(1)),
+                "eval_set": match.group(2),
+                "l1": float(match.group(3)),
+                "psnr": float(match.group(4)),
+            }
+        match = _TQDM_RE.search(line)
+        if match:
+            iteration, total = int(match.group(1)), int(match.group(2))
+            fields: Dict[str, object] = {
+                "iteration": iteration,
+                "total_iterations": total,
+                "percent": round(iteration * 100.0 / total, 1) if total else None,
+                "eta_seconds": _parse_clock(match.group(4)),
+            }
+            if match.group(5):
+                fields["rate"] = float(match.group(5))
+            if match.group(6):
+                fields["loss"] = float(match.group(6))
+            return fields
+    elif stage == "convert":
+        match = _COLMAP_REGISTER_RE.search(line)
+        if match:
+            return {"registered_images": int(match.group(1))}
+    elif stage == "extract":
+        match = _FFMPEG_FRAME_RE.search(line)
+        if match:
+            return {"frames": int(match.group(1))}
+    return None
+
+
+class ProgressReporter:
+    """解析单个任务的阶段输出并按频率限制发布进度。
+
+    两次发布之间到达的进度会被合并，只保留最新值；阶段结束时调用 flush 发布最后一次进度。
+    """
+
+    def __init__(self, task_id: int, publish: Callable[[dict], None], min_interval: float = MIN_PUBLISH_INTERVAL):
+        self.task_id = task_id
+        self.publish = publish
+        self.min_interval = min_interval
+        self.state: Dict[str, object] = {}
+        self._dirty = False
+        self._last_publish = 0.0
+        self._lock = Lock()
+
+    def feed(self, stage: str, line: str) -> None:
+        fields = parse_progress_line(stage, line)
+        if not fields:
+            return
+        with self._lock:
+            if self.state.get("stage") != stage:
+                # 切换阶段时清空上一阶段的字段，但保留训练评估得到的 PSNR
+                self.state = {key: value for key, value in self.state.items() if key in ("psnr", "registered_images")}
+                self.state["stage"] = stage
+            self.state.update(fields)
+            self._dirty = True
+            if time.monotonic() - self._last_publish < self.min_interval:
+                return
+            payload = self._take_payload_locked()
+        self._publish(payload)
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = self._take_payload_locked()
+        self._publish(payload)
+
+    def _take_payload_locked(self) -> dict:
+        self._dirty = False
+        self._last_publish = time.monotonic()
+        return dict(self.state)
+
+    def _publish(self, payload: dict) -> None:
+        try:
+            self.publish({"type": "project_progress", "task_id": self.task_id, **payload})
+        except Exception as e:
+            print(f"发布任务进度失败(task_id={self.task_id}): {str(e)}")
@@ -0,0 +1,218 @@
+# app/tasks/project_import.py
+import os
+import re
+import shutil
+import stat
+import time
+import zipfile
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from threading import Event, Lock
+from typing import Callable, List, Optional, Tuple
+
+# 解压后的总大小上限（字节）、成员数上限、单个成员的最大压缩比（防 zip 炸弹）
+PROJECT_IMPORT_MAX_BYTES = int(os.environ.get("PROJECT_IMPORT_MAX_BYTES", 20 * 1024 ** 3))
+PROJECT_IMPORT_MAX_MEMBERS = int(os.environ.get("PROJECT_IMPORT_MAX_MEMBERS", 10000))
+PROJECT_IMPORT_MAX_RATIO = int(os.environ.get("PROJECT_IMPORT_MAX_RATIO", 200))
+# 并行解压线程数（zlib 解压时释放 GIL，多线程可以并行）
+PROJECT_IMPORT_WORKERS = int(os.environ.get("PROJECT_IMPORT_WORKERS", 4))
+# 小于该大小的成员不检查压缩比（很小的文本文件压缩比可能很高）
+RATIO_CHECK_MIN_BYTES = 1024 * 1024
+COPY_BUFFER_SIZE = 1024 * 1024
+
+_ITERATION_PLY = re.compile(r"^point_cloud/iteration_(\d+)/point_cloud\.ply$")
+
+
+class ProjectImportError(ValueError):
+    """压缩包不符合项目结构或超出安全限制"""
+
+
+class ImportPlan:
+    """校验通过的导入计划：要解压的成员及其相对目标路径、选用的迭代次数"""
+
+    def __init__(self, root_dir: str, iteration: int, members: List[Tuple[zipfile.ZipInfo, str]]):
+        self.root_dir = root_dir
+        self.iteration = iteration
+        self.members = members
+        self.total_bytes = sum(info.file_size for info, _ in members)
+
+    @property
+    def point_cloud_path(self) -> str:
+        """点云文件相对于解压目录的路径"""
+        return os.path.join(self.root_dir, "point_cloud", f"iteration_{self.iteration}", "point_cloud.ply")
+
+
+def _normalize_member_name(name: str) -> Optional[str]:
+    """把成员名规范为 a/b/c 形式；绝对路径或包含 .. 时返回 None"""
+    name = name.replace("\\", "/")
+    if name.startswith("/") or re.match(r"^[A-Za-z]:", name):
+        return None
+    parts = [part for part in name.split("/") if part not in ("", ".")]
+    if any(part == ".." for part in parts):
+        return None
+    return "/".join(parts)
+
+
+def _is_symlink(info: zipfile.ZipInfo) -> bool:
+    return stat.S_ISLNK(info.external_attr >> 16)
+
+
+def plan_import(
+    zip_path: str,
+    root_dir: str,
+    max_bytes: int = PROJECT_IMPORT_MAX_BYTES,
+    max_members: int = PROJECT_IMPORT_MAX_MEMBERS,
+    max_ratio: int = PROJECT_IMPORT_MAX_RATIO,
+) -> ImportPlan:
+    """只读取 ZIP 中央目录，在解压前校验项目结构与安全限制。
+
+    项目目录下必须有 cameras.json 与 point_cloud/iteration_N/point_cloud.ply（N 任意，取最大值）；
+    其余迭代的点云是训练中间结果，不解压。
+    """
+    normalized_root = _normalize_member_name(root_dir or "")
+    if normalized_root is None:
+        raise ProjectImportError(f"项目目录名无效: {root_dir}")
+    prefix = f"{normalized_root}/" if normalized_root else ""
+
+    try:
+        with zipfile.ZipFile(zip_path, "r") as zip_ref:
+            infos = zip_ref.infolist()
+    except (zipfile.BadZipFile, zipfile.LargeZipFile) as e:
+        raise ProjectImportError(f"无法读取压缩包: {str(e)}")
+    if len(infos) > max_members:
+        raise ProjectImportError(f"压缩包成员过多: {len(infos)} > {max_members}")
+
+    candidates = []
+    iterations = set()
+    has_cameras = False
+    for info in infos:
+        if info.is_dir():
+            continue
+        name = _normalize_member_name(info.filename)
+        if name is None:
+            raise ProjectImportError(f"压缩包包含非法路径: {info.filename}")
+        if not name.startswith(prefix):
+            continue
+        relative = name[len(prefix):]
+        match = _ITERATION_PLY.match(relative)
+        if match:
+            iterations.add(int(match.group(1)))
+        elif relative == "cameras.json":
+            has_cameras = True
+        candidates.append((info, relative))
+
+    if not has_cameras:
+        raise ProjectImportError("项目结构无效：缺少 cameras.json 文件")
+    if not iterations:
+        raise ProjectImportError("项目结构无效：缺少 point_cloud/iteration_N/point_cloud.ply 文件")
+    iteration = max(iterations)
+    selected_dir = f"point_cloud/iteration_{iteration}/"
+
+    members = []
+    for info, relative in candidates:
+        # 跳过其他迭代的中间结果
+        if relative.startswith("point_cloud/iteration_") and not relative.startswith(selected_dir):
+            continue
+        if _is_symlink(info):
+            raise ProjectImportError(f"压缩包包含符号链接: {info.filename}")
+        if info.flag_bits & 0x1:
+            raise ProjectImportError(f"不支持加密的压缩包成员: {info.filename}")
+        if info.file_size > RATIO_CHECK_MIN_BYTES and info.file_size > max(info.compress_size, 1) * max_ratio:
+            raise ProjectImportError(f"压缩比异常（疑似 zip 炸弹）: {info.filename}")
+        members.append((info, os.path.join(normalized_root, *relative.split("/"))))
+
+    plan = ImportPlan(normalized_root, iteration, members)
+    if plan.total_bytes > max_bytes:
+        raise ProjectImportError(f"解压后大小超出限制: {plan.total_bytes} > {max_bytes} 字节")
+    return plan
+
+
+def _split_by_size(members: List[Tuple[zipfile.ZipInfo, str]], buckets: int) -> List[List[Tuple[zipfile.ZipInfo, str]]]:
+    """按大小贪心地把成员分给各个线程（先分最大的），使各线程的解压量接近"""
+    groups = [[] for _ in range(buckets)]
+    loads = [0] * buckets
+    for member in sorted(members, key=lambda item: item[0].file_size, reverse=True):
+        index = loads.index(min(loads))
+        groups[index].append(member)
+        loads[index] += member[0].file_size
+    return [group for group in groups if group]
+
+
+def extract_plan(
+    zip_path: str,
+    plan: ImportPlan,
+    dest_dir: str,
+    progress: Optional[Callable[[int, int], None]] = None,
+    workers: int = PROJECT_IMPORT_WORKERS,
+) -> None:
+    """多线程解压计划中的成员；每个线程使用独立的 ZipFile 句柄。
+
+    实际写出的字节数超过中央目录声明的大小时立即中止，任一成员失败时其余线程尽快停止。
+    """
+    started_at = time.monotonic()
+    dest_root = os.path.realpath(dest_dir)
+    os.makedirs(dest_root, exist_ok=True)
+    stop = Event()
+    lock = Lock()
+    state = {"done": 0, "reported": -1}
+
+    def advance(size: int) -> None:
+        with lock:
+            state["done"] += size
+            percent = state["done"] * 100 // plan.total_bytes if plan.total_bytes else 100
+            if percent == state["reported"]:
+                return
+            state["reported"] = percent
+            done = state["done"]
+        if progress:
+            progress(done, plan.total_bytes)
+
+    def extract_group(group: List[Tuple[zipfile.ZipInfo, str]]) -> None:
+        with zipfile.ZipFile(zip_path, "r") as zip_ref:
+            for info, relative_path in group:
+                if stop.is_set():
+                    return
+                target = os.path.realpath(os.path.join(dest_root, relative_path))
+                if os.path.commonpath([dest_root, target]) != dest_root:
+                    raise ProjectImportError(f"压缩包包含非法路径: {info.filename}")
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                written = 0
+                with zip_ref.open(info) as source, open(target, "wb") as f:
+                    while not stop.is_set():
+                        chunk = source.read(COPY_BUFFER_SIZE)
+                        if not chunk:
+                            break
+                        written += len(chunk)
+                        if written > info.file_size:
+                            raise ProjectImportError(f"成员实际大小超出声明: {info.filename}")
+                        f.write(chunk)
+                        advance(len(chunk))
+
+    groups = _split_by_size(plan.members, max(1, workers))
+    with ThreadPoolExecutor(max_workers=max(1, len(groups)), thread_name_prefix="project-import") as executor:
+        futures = [executor.submit(extract_group, group) for group in groups]
+        done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        if any(future.exception() for future in done):
+            stop.set()
+    errors = [future.exception() for future in futures if future.exception()]
+    if errors:
+        raise errors[0]
+    print(
+        f"[import] 解压完成: {len(plan.members)} 个文件, {plan.total_bytes} 字节, "
+        f"{len(groups)} 个线程, 耗时 {time.monotonic() - started_at:.2f}s"
+    )
+
+
+def import_archive(
+    zip_path: str,
+    root_dir: str,
+    dest_dir: str,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> ImportPlan:
+    """校验并解压项目压缩包，失败时删除已解压的内容"""
+    plan = plan_import(zip_path, root_dir)
+    try:
+        extract_plan(zip_path, plan, dest_dir, progress)
+    except Exception:
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        raise
+    return plan
@@ -0,0 +1,188 @@
+# app/tasks/scheduler.py
+import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+# 调度器配置（可通过环境变量覆盖）
+# THREEDGS_GPU_DEVICES: 以逗号分隔的 GPU 编号，每个编号对应一个训练槽位，例如 "0,1,2,3"
+#                       未设置时只有一个槽位，且不修改 CUDA_VISIBLE_DEVICES
+# THREEDGS_FFMPEG_CONCURRENCY / THREEDGS_CONVERT_CONCURRENCY: CPU 阶段的并发上限
+GPU_DEVICES_ENV = "THREEDGS_GPU_DEVICES"
+FFMPEG_CONCURRENCY_ENV = "THREEDGS_FFMPEG_CONCURRENCY"
+CONVERT_CONCURRENCY_ENV = "THREEDGS_CONVERT_CONCURRENCY"
+EXPORT_CONCURRENCY_ENV = "THREEDGS_EXPORT_CONCURRENCY"
+TEXTURE_CONCURRENCY_ENV = "THREEDGS_TEXTURE_CONCURRENCY"
+
+# 需要独占 GPU 槽位的阶段（网格提取需要渲染深度、分割需要 SAM 推理与微调，与训练共享 GPU 槽位）
+GPU_STAGES = {"train", "mesh", "segment"}
+# 网格导出、分割作业使用的阶段，由独立的后台服务提交，不计入重建任务数上限
+AUXILIARY_STAGES = {"mesh", "texture", "segment"}
+
+# 等待资源时检查取消标志的间隔（秒）
+_ACQUIRE_POLL_SECONDS = 0.5
+
+
+def _parse_devices(value: Optional[str]) -> List[Optional[str]]:
+    """解析 GPU 编号列表，未配置时返回单个不绑定设备的槽位"""
+    if not value:
+        return [None]
+    devices = [item.strip() for item in value.split(",") if item.strip()]
+    return devices or [None]
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.environ.get(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+class WorkerSlot:
+    """一个训练槽位，对应一张 GPU（通过 CUDA_VISIBLE_DEVICES 绑定）"""
+
+    def __init__(self, index: int, device: Optional[str] = None):
+        self.index = index
+        self.device = device
+
+    def env(self, base: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """返回子进程使用的环境变量，绑定到当前槽位的 GPU"""
+        env = dict(os.environ if base is None else base)
+        if self.device is not None:
+            env["CUDA_VISIBLE_DEVICES"] = self.device
+        return env
+
+    def __repr__(self) -> str:
+        return f"WorkerSlot(index={self.index}, device={self.device!r})"
+
+
+class StageLease:
+    """阶段执行许可，GPU 阶段会携带一个训练槽位"""
+
+    def __init__(self, stage: str, slot: Optional[WorkerSlot] = None):
+        self.stage = stage
+        self.slot = slot
+
+    @property
+    def env(self) -> Optional[Dict[str, str]]:
+        # CPU 阶段返回 None，即沿用当前进程的环境变量
+        return self.slot.env() if self.slot else None
+
+
+class TrainingScheduler:
+    """多槽位的重建任务调度器。
+
+    - 同时运行多个任务，任务数上限默认等于各阶段并发之和，保证 CPU 阶段可与训练重叠；
+    - ffmpeg / convert / train 各阶段独立限流；
+    - train 阶段从空闲槽位中取出一张 GPU，任务结束后归还。
+    """
+
+    def __init__(
+        self,
+        devices: Optional[List[Optional[str]]] = None,
+        stage_limits: Optional[Dict[str, int]] = None,
+        max_jobs: Optional[int] = None,
+    ):
+        if devices is None:
+            devices = _parse_devices(os.environ.get(GPU_DEVICES_ENV))
+        self.slots = [WorkerSlot(i, device) for i, device in enumerate(devices)]
+        self._free_slots: "queue.Queue[WorkerSlot]" = queue.Queue()
+        for slot in self.slots:
+            self._free_slots.put(slot)
+
+        limits = {
+            "ffmpeg": _env_int(FFMPEG_CONCURRENCY_ENV, 2),
+            "convert": _env_int(CONVERT_CONCURRENCY_ENV, 1),
+            "export": _env_int(EXPORT_CONCURRENCY_ENV, 1),
+            "train": len(self.slots),
+            "mesh": len(self.slots),
+            "segment": len(self.slots),
+            "texture": _env_int(TEXTURE_CONCURRENCY_ENV, 1),
+        }
+        if stage_limits:
+            limits.update(stage_limits)
+        self.stage_limits = limits
+        self._stage_semaphores = {
+            name: threading.BoundedSemaphore(limit) for name, limit in limits.items()
+        }
+
+        if max_jobs is None:
+            max_jobs = sum(limit for name, limit in limits.items() if name not in AUXILIARY_STAGES)
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="3dgs-job")
+        self._jobs: Dict[int, Future] = {}
+        self._jobs_lock = threading.Lock()
+
+    def submit(self, task_id: int, fn: Callable, *args, **kwargs) -> Future:
+        """提交任务；同一任务已在队列或运行中时直接返回已有 Future"""
+        with self._jobs_lock:
+            existing = self._jobs.get(task_id)
+            if existing is not None and not existing.done():
+                return existing
+            future = self._executor.submit(fn, *args, **kwargs)
+            self._jobs[task_id] = future
+        future.add_done_callback(lambda f, tid=task_id: self._forget(tid, f))
+        return future
+
+    def _forget(self, task_id: int, future: Future) -> None:
+        with self._jobs_lock:
+            if self._jobs.get(task_id) is future:
+                self._jobs.pop(task_id, None)
+
+    def is_scheduled(self, task_id: int) -> bool:
+        with self._jobs_lock:
+            future = self._jobs.get(task_id)
+            return future is not None and not future.done()
+
+    def active_count(self) -> int:
+        with self._jobs_lock:
+            return sum(1 for future in self._jobs.values() if not future.done())
+
+    def _acquire(self, semaphore: threading.BoundedSemaphore, cancel_event: Optional[threading.Event]) -> bool:
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+            if semaphore.acquire(timeout=_ACQUIRE_POLL_SECONDS):
+                return True
+
+    def _take_slot(self, cancel_event: Optional[threading.Event]) -> Optional[WorkerSlot]:
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            try:
+                return self._free_slots.get(timeout=_ACQUIRE_POLL_SECONDS)
+            except queue.Empty:
+                continue
+
+    @contextmanager
+    def stage(self, name: str, cancel_event: Optional[threading.Event] = None) -> Iterator[Optional[StageLease]]:
+        """占用某个阶段的并发名额（GPU 阶段同时占用一个槽位）。
+
+        等待期间任务被取消时产出 None，调用方应直接结束任务。
+        """
+        semaphore = self._stage_semaphores.get(name)
+        if semaphore is not None and not self._acquire(semaphore, cancel_event):
+            yield None
+            return
+        slot = None
+        try:
+            if name in GPU_STAGES:
+                slot = self._take_slot(cancel_event)
+                if slot is None:
+                    yield None
+                    return
+            yield StageLease(name, slot)
+        finally:
+            if slot is not None:
+                self._free_slots.put(slot)
+            if semaphore is not None:
+                semaphore.release()
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# 创建全局实例
+scheduler = TrainingScheduler()
@@ -0,0 +1,145 @@
+# app/tasks/segment_batch_runner.py
+"""批量分割执行器：由一个 Python 进程依次为每个提示运行 COB-GS 的脚本（批量提交，不是共用一次模型加载）。
+
+由 app.tasks.segmentation 以 COB-GS 环境的解释器启动（不依赖本项目的任何模块）：
+
+    python segment_batch_runner.py <manifest.json>
+
+manifest: {"script": 脚本路径, "skip_dir": 跳过标记目录, "preload": [预先导入的模块], "items": [{"key": ..., "argv": [...]}, ...]}
+
+执行器先导入 preload 中的第三方库（torch 等，不初始化 CUDA），之后每个提示 fork 一个子进程，
+在子进程中以 __main__ 身份运行脚本：同一批次共用解释器启动与这些库的导入，而每个提示都从同一份干净的
+进程状态开始，脚本及其目录下模块的全局变量、torch 的全局设置不会带到下一个提示，单个提示崩溃也不影响批次。
+COB-GS 的脚本是命令行程序，在模块顶层按参数构建模型，因此 Grounded-SAM-2 模型与微调检查点仍由每个提示各自加载，
+批量只省去解释器启动、库的导入与每个提示的 GPU 槽位申请。
+
+等待子进程期间轮询 skip_dir：正在执行的提示被取消时终止其子进程（SIGTERM，宽限期后 SIGKILL），立即释放 GPU。
+
+每个提示的开始、完成、失败、取消与跳过以 "[segment-batch] <事件> <key>" 行输出，供服务端解析进度。
+单个提示失败不影响后续提示；skip_dir 中存在 <key> 文件的提示（已被取消）直接跳过。
+"""
+import importlib
+import json
+import os
+import runpy
+import signal
+import sys
+import time
+import traceback
+
+MARKER = "[segment-batch]"
+# 等待子进程时检查取消标记的间隔，以及 SIGTERM 之后等待退出的宽限期（秒）
+CANCEL_POLL_SECONDS = 0.5
+CANCEL_GRACE_SECONDS = 2.0
+
+
+class PromptCancelled(Exception):
+    pass
+
+
+def _report(event: str, key: str, message: str = "") -> None:
+    print(f"{MARKER} {event} {key}" + (f" {message}" if message else ""), flush=True)
+
+
+def _preload(modules: list) -> None:
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"{MARKER} 预先导入 {name} 失败: {e}", flush=True)
+
+
+def _exec_script(script: str, argv: list) -> int:
+    """在当前（子）进程中与 python <script> <argv> 等价地运行脚本，返回退出码"""
+    sys.argv = [script] + list(argv)
+    # 与直接运行脚本一致：脚本所在目录位于模块搜索路径首位
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    try:
+        runpy.run_path(script, run_name="__main__")
+        return 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException:
+        traceback.print_exc()
+        return 1
+
+
+def _wait_child(pid: int, timeout: float = None):
+    """等待子进程退出，返回 waitpid 的状态；超时仍未退出时返回 None"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            return status
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+        time.sleep(0.05)
+
+
+def _terminate_child(pid: int) -> None:
+    os.kill(pid, signal.SIGTERM)
+    if _wait_child(pid, CANCEL_GRACE_SECONDS) is None:
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+
+
+def run_item(script: str, argv: list, cancelled=None) -> None:
+    """在 fork 出的子进程中运行一次脚本，非零退出码或被信号终止时抛出 RuntimeError。
+
+    cancelled() 返回 True 时终止子进程并抛出 PromptCancelled。
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            code = _exec_script(script, argv)
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+    while True:
+        status = _wait_child(pid, CANCEL_POLL_SECONDS)
+        if status is not None:
+            break
+        if cancelled is not None and cancelled():
+            _terminate_child(pid)
+            raise PromptCancelled()
+    code = os.waitstatus_to_exitcode(status)
+    if code > 0:
+        raise RuntimeError(f"exit code {code}")
+    if code < 0:
+        raise RuntimeError(f"killed by signal {-code}")
+
+
+def main(manifest_path: str) -> int:
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    script = manifest["script"]
+    skip_dir = manifest.get("skip_dir")
+    _preload(manifest.get("preload", []))
+    for item in manifest["items"]:
+        key = str(item["key"])
+        skip_path = os.path.join(skip_dir, key) if skip_dir else None
+        if skip_path and os.path.exists(skip_path):
+            _report("skipped", key)
+            continue
+        _report("start", key)
+        try:
+            run_item(script, item["argv"], (lambda: os.path.exists(skip_path)) if skip_path else None)
+        except PromptCancelled:
+            _report("cancelled", key)
+        except Exception as e:
+            # 脚本自身的异常已由子进程打印
+            _report("failed", key, str(e).replace("\n", " "))
+        else:
+            _report("done", key)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1]))
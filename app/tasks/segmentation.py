@@ -0,0 +1,508 @@
+# app/tasks/segmentation.py
+import hashlib
+import json
+import os
+import shutil
+from functools import lru_cache
+from threading import Event, Lock
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.uploads import upload_url
+from app.models.database import SessionLocal
+from app.models.segment_file import SegmentFile as SegmentFileModel
+from app.models.segment_job import SegmentJob as SegmentJobModel
+from app.sse.event_bus import event_bus
+from app.tasks.background_jobs import ACTIVE_STATUSES, BackgroundJobService
+from app.tasks.pipeline import Pipeline, PipelineContext, Stage, StageFailed, TaskCancelled, run_command
+from app.tasks.processes import terminate_task_processes
+from app.tasks.segment_batch_runner import MARKER as BATCH_MARKER
+from app.tasks.scheduler import scheduler
+
+COB_GS_DIRECTORY = os.environ.get("COB_GS_DIRECTORY", "/workspace/COB-GS/")
+# 同时执行的分割作业数（GPU 阶段另受调度器槽位限制；同一场景的作业始终串行）
+SEGMENT_JOB_WORKERS = int(os.environ.get("SEGMENT_JOB_WORKERS", 2))
+# 一次批量分割最多包含的提示数
+SEGMENT_BATCH_MAX_PROMPTS = int(os.environ.get("SEGMENT_BATCH_MAX_PROMPTS", 16))
+# 批量执行器在 fork 各提示的子进程之前预先导入的模块（以逗号分隔，不能在导入时初始化 CUDA）
+SEGMENT_BATCH_PRELOAD = [name.strip() for name in os.environ.get("SEGMENT_BATCH_PRELOAD", "numpy,torch,torchvision").split(",") if name.strip()]
+
+SEGMENT_DIRNAME = "segment"
+MASK_CACHE_FILENAME = "masks.json"
+CHECKPOINT_FILENAME = "chkpnt30000.pth"
+MASK_SCRIPT = "submodules/Grounded-SAM-2/grounded_sam2_stable_tracking.py"
+FINETUNE_SCRIPT = "train.py"
+BATCH_RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "segment_batch_runner.py")
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+MAX_PROMPT_LENGTH = 200
+# 各阶段完成后的进度
+STAGE_PROGRESS = {"masked": 40, "segmented": 95}
+# 批量执行时，各提示开始某一阶段时的进度
+BATCH_START_PROGRESS = {"masks": 10, "finetune": 50}
+# 等待同一场景的其他作业结束时检查取消标志的间隔（秒）
+SCENE_LOCK_POLL_SECONDS = 0.5
+
+
+def normalize_prompt(prompt_text: str) -> str:
+    """去除首尾与重复空白并转为小写，作为去重键与 mask 目录名；提示不合法时抛出 ValueError"""
+    prompt = " ".join(prompt_text.split()).lower()
+    if not prompt:
+        raise ValueError("prompt_text is empty")
+    if len(prompt) > MAX_PROMPT_LENGTH:
+        raise ValueError(f"prompt_text is longer than {MAX_PROMPT_LENGTH} characters")
+    if any(ch in prompt for ch in ("/", "\\", "\x00")) or prompt in (".", ".."):
+        raise ValueError("prompt_text must not contain path separators")
+    return prompt
+
+
+def resolve_segment_inputs(folder_path: str) -> Tuple[str, str, str]:
+    """返回 (模型目录, 图片目录, 训练检查点路径)"""
+    folder_abs = os.path.abspath(folder_path)
+    model_path = os.path.join(folder_abs, "results")
+    return model_path, os.path.join(folder_abs, "images"), os.path.join(model_path, CHECKPOINT_FILENAME)
+
+
+def segment_dir_for(folder_path: str, prompt: str) -> str:
+    """作业目录（日志、阶段耗时与 mask 缓存记录），按提示区分"""
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return os.path.join(os.path.abspath(folder_path), SEGMENT_DIRNAME, digest[:16])
+
+
+@lru_cache(maxsize=64)
+def _image_set_fingerprint(image_dir: str, mtime_ns: int) -> Tuple[int, str]:
+    digest = hashlib.sha256()
+    count = 0
+    with os.scandir(image_dir) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            if not entry.is_file() or not entry.name.lower().endswith(IMAGE_SUFFIXES):
+                continue
+            stat_result = entry.stat()
+            digest.update(f"{entry.name}\0{stat_result.st_size}\0{stat_result.st_mtime_ns}\n".encode("utf-8"))
+            count += 1
+    return count, digest.hexdigest()
+
+
+def scene_image_set(image_dir: str) -> Tuple[int, str]:
+    """场景图片集的 (图片数, 指纹)。
+
+    按目录修改时间缓存，同一场景的不同提示共用一次扫描结果；
+    图片增删后指纹变化，已提取的 mask 随之失效。
+    """
+    return _image_set_fingerprint(image_dir, os.stat(image_dir).st_mtime_ns)
+
+
+def mask_args(image_dir: str, model_path: str, prompt: str) -> List[str]:
+    return ["--video_dir", image_dir, "--output", model_path, "--text", prompt]
+
+
+def finetune_args(source_path: str, model_path: str, checkpoint_path: str, prompt: str) -> List[str]:
+    return [
+        "-s", source_path,
+        "-m", model_path,
+        "--start_checkpoint", checkpoint_path,
+        "--include_mask",
+        "--finetune_mask",
+        "--text", prompt,
+        "--N4views", "14",
+        "--mask_signals_threshold", "0.8",
+        "-r", "1",
+    ]
+
+
+def segment_result_path(model_path: str, prompt: str) -> str:
+    return os.path.join(model_path, "masks", prompt, "segment.ply")
+
+
+def _mask_cache_entry(image_dir: str, prompt: str) -> dict:
+    image_count, fingerprint = scene_image_set(image_dir)
+    return {"prompt": prompt, "image_count": image_count, "image_set": fingerprint}
+
+
+def mask_cache_valid(job_dir: str, image_dir: str, model_path: str, prompt: str) -> bool:
+    """该提示的 mask 已按当前图片集提取过"""
+    if not os.path.isdir(os.path.join(model_path, "masks", prompt)):
+        return False
+    try:
+        with open(os.path.join(job_dir, MASK_CACHE_FILENAME), "r", encoding="utf-8") as f:
+            return json.load(f) == _mask_cache_entry(image_dir, prompt)
+    except (OSError, ValueError):
+        return False
+
+
+def write_mask_cache(job_dir: str, image_dir: str, prompt: str) -> None:
+    os.makedirs(job_dir, exist_ok=True)
+    cache_path = os.path.join(job_dir, MASK_CACHE_FILENAME)
+    with open(cache_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(_mask_cache_entry(image_dir, prompt), f)
+    os.replace(cache_path + ".tmp", cache_path)
+
+
+class MaskExtractStage(Stage):
+    """Grounded-SAM-2：按提示文本在图片集上跟踪并提取 mask，需要占用 GPU 槽位。
+
+    提取结果按 (提示, 图片集指纹) 记录在作业目录中，微调失败后重试或图片集未变时跳过该阶段。
+    """
+
+    name = "masks"
+    scheduler_stage = "segment"
+    done_status = "masked"
+
+    def __init__(self, image_dir: str, model_path: str, prompt: str, cwd: str = COB_GS_DIRECTORY):
+        self.image_dir = image_dir
+        self.model_path = model_path
+        self.prompt = prompt
+        self.cwd = cwd
+
+    def should_run(self, ctx):
+        return not mask_cache_valid(ctx.absolute_output_folder, self.image_dir, self.model_path, self.prompt)
+
+    def run(self, ctx, lease):
+        run_command(ctx, self.name, ["python", MASK_SCRIPT] + mask_args(self.image_dir, self.model_path, self.prompt),
+                    cwd=self.cwd, env=lease.env if lease else None)
+        write_mask_cache(ctx.absolute_output_folder, self.image_dir, self.prompt)
+
+
+class FinetuneStage(Stage):
+    """COB-GS：从训练检查点出发，用 mask 微调得到分割后的 segment.ply，需要占用 GPU 槽位"""
+
+    name = "finetune"
+    scheduler_stage = "segment"
+    done_status = "segmented"
+
+    def __init__(self, source_path: str, model_path: str, checkpoint_path: str, prompt: str, cwd: str = COB_GS_DIRECTORY):
+        self.source_path = source_path
+        self.model_path = model_path
+        self.checkpoint_path = checkpoint_path
+        self.prompt = prompt
+        self.cwd = cwd
+
+    def run(self, ctx, lease):
+        run_command(ctx, self.name, ["python", FINETUNE_SCRIPT] + finetune_args(
+            self.source_path, self.model_path, self.checkpoint_path, self.prompt
+        ), cwd=self.cwd, env=lease.env if lease else None)
+        result_path = segment_result_path(self.model_path, self.prompt)
+        if not os.path.isfile(result_path):
+            raise StageFailed(self.name, "COB-GS 未生成 segment.ply")
+        return {"result_path": result_path}
+
+
+class BatchRunStage(Stage):
+    """用批量执行器为多个提示依次运行同一个 COB-GS 脚本，整个批次只占用一次 GPU 槽位。
+
+    每个提示在执行器 fork 出的子进程中运行，模型仍由每个提示各自加载。
+    各提示的进度由执行器输出的标记行解析（见 BatchProgress），单个提示失败不会中断批次。
+    """
+
+    scheduler_stage = "segment"
+
+    def __init__(self, name: str, script: str, pending_items: Callable[[], List[dict]], skip_dir: str, cwd: str = COB_GS_DIRECTORY):
+        self.name = name
+        self.script = script
+        self.pending_items = pending_items
+        self.skip_dir = skip_dir
+        self.cwd = cwd
+        self.items: List[dict] = []
+
+    def should_run(self, ctx):
+        # 上一阶段结束后才能确定本阶段还有哪些提示需要执行
+        self.items = self.pending_items()
+        return bool(self.items)
+
+    def run(self, ctx, lease):
+        manifest_path = os.path.join(ctx.absolute_output_folder, f"{self.name}_manifest.json")
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump({"script": self.script, "skip_dir": self.skip_dir, "preload": SEGMENT_BATCH_PRELOAD, "items": self.items}, f)
+        run_command(ctx, self.name, ["python", BATCH_RUNNER, manifest_path], cwd=self.cwd, env=lease.env if lease else None)
+
+
+class BatchProgress:
+    """解析批量执行器输出的 "[segment-batch] <事件> <key> [信息]" 行，替代训练任务的进度解析器"""
+
+    def __init__(self, on_event: Callable[[str, str, str, str], None]):
+        self.on_event = on_event
+
+    def feed(self, stage: str, line: str) -> None:
+        if not line.startswith(BATCH_MARKER):
+            return
+        parts = line[len(BATCH_MARKER):].strip().split(" ", 2)
+        if len(parts) >= 2:
+            self.on_event(stage, parts[0], parts[1], parts[2] if len(parts) > 2 else "")
+
+    def flush(self) -> None:
+        pass
+
+
+class SegmentBatch:
+    """一次批量分割：多个作业共用一个执行线程、取消标志与执行器进程"""
+
+    def __init__(self, job_ids: Iterable[int]):
+        self.job_ids = list(job_ids)
+        self.key = f"batch-{min(self.job_ids)}"
+        self.cancel_event = Event()
+        self.skip_dir: Optional[str] = None
+        self._skipped: Set[int] = set()
+        self._finished: Set[int] = set()
+        self._lock = Lock()
+
+    def attach(self, skip_dir: str) -> None:
+        """批次开始执行时创建跳过标记目录（补写开始前已取消的作业）"""
+        shutil.rmtree(skip_dir, ignore_errors=True)
+        os.makedirs(skip_dir, exist_ok=True)
+        with self._lock:
+            self.skip_dir = skip_dir
+            skipped = list(self._skipped)
+        for job_id in skipped:
+            open(os.path.join(skip_dir, str(job_id)), "w").close()
+
+    def finish(self, job_id: int) -> None:
+        with self._lock:
+            self._finished.add(job_id)
+
+    def skip(self, job_id: int) -> bool:
+        """跳过批次中的一个作业（正在执行的提示由执行器终止其子进程），返回批次中是否已没有需要执行的作业"""
+        with self._lock:
+            self._skipped.add(job_id)
+            skip_dir = self.skip_dir
+            remaining = set(self.job_ids) - self._skipped - self._finished
+        if skip_dir is not None:
+            open(os.path.join(skip_dir, str(job_id)), "w").close()
+        return not remaining
+
+
+class SegmentationService(BackgroundJobService):
+    """在后台线程中执行分割作业（masks → finetune），状态写入 segment_jobs 表并通过 SSE 通知前端。
+
+    微调会写入场景的模型目录，因此同一场景的作业（含批量）按提交顺序串行执行，不同场景可并行。
+    批量分割（submit_batch）把同一场景的多个提示作为一个批次提交：每个阶段只启动一次执行器进程、
+    只占用一次 GPU 槽位，但每个提示仍各自加载模型，并各自记录状态、结果与 SSE 进度。
+    """
+
+    model = SegmentJobModel
+    event_prefix = "segment_job"
+    stage_progress = STAGE_PROGRESS
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._scene_locks: Dict[int, Lock] = {}
+        self._batches: Dict[int, SegmentBatch] = {}
+
+    def message(self, job):
+        message = super().message(job)
+        message["prompt_text"] = job.prompt_text
+        message["result_url"] = job.result_url
+        return message
+
+    def prepare(self, db, job):
+        processed_file = job.processed_file
+        model_path, image_dir, checkpoint_path = resolve_segment_inputs(processed_file.folder_path)
+        if not os.path.isdir(image_dir):
+            raise StageFailed("masks", "images not found in project")
+        if not os.path.isfile(checkpoint_path):
+            raise StageFailed("finetune", f"{CHECKPOINT_FILENAME} not found in project")
+        job_dir = segment_dir_for(processed_file.folder_path, job.prompt_text)
+        os.makedirs(job_dir, exist_ok=True)
+        return job_dir, [
+            MaskExtractStage(image_dir, model_path, job.prompt_text),
+            FinetuneStage(os.path.dirname(model_path), model_path, checkpoint_path, job.prompt_text),
+        ]
+
+    def apply_fields(self, db, job, fields):
+        if fields.get("result_path"):
+            job.result_url = upload_url(fields["result_path"])
+
+    def finish(self, db, job):
+        """登记（或更新）该提示的分割结果，之后相同提示直接返回"""
+        segment_file = db.query(SegmentFileModel).filter(
+            SegmentFileModel.processed_file_id == job.processed_file_id,
+            SegmentFileModel.segment_prompt_text == job.prompt_text
+        ).first()
+        if segment_file is None:
+            db.add(SegmentFileModel(
+                processed_file_id=job.processed_file_id,
+                segment_prompt_text=job.prompt_text,
+                result_url=job.result_url
+            ))
+        else:
+            segment_file.result_url = job.result_url
+
+    # ---------- 批量提交与取消 ----------
+
+    def submit_batch(self, job_ids: List[int]) -> Optional[SegmentBatch]:
+        """把同一场景的多个作业作为一个批次提交；已在执行的作业不重复提交"""
+        with self._lock:
+            job_ids = [job_id for job_id in job_ids if job_id not in self._pending]
+            if not job_ids:
+                return None
+            batch = SegmentBatch(job_ids)
+            for job_id in job_ids:
+                self._cancel_events[job_id] = batch.cancel_event
+                self._batches[job_id] = batch
+            future = self._executor.submit(self._run_batch, batch)
+            for job_id in job_ids:
+                self._pending[job_id] = future
+        future.add_done_callback(lambda _: [self._forget(job_id) for job_id in batch.job_ids])
+        return batch
+
+    def _forget(self, job_id: int) -> None:
+        super()._forget(job_id)
+        with self._lock:
+            self._batches.pop(job_id, None)
+
+    def cancel(self, job_id: int) -> bool:
+        """批次中的作业被取消时跳过该提示（正在执行时由执行器终止其子进程）；批次中已没有需要执行的作业时终止整个批次"""
+        with self._lock:
+            batch = self._batches.get(job_id)
+            future = self._pending.get(job_id)
+        if batch is None:
+            return super().cancel(job_id)
+        if batch.skip(job_id):
+            batch.cancel_event.set()
+            if future is not None:
+                future.cancel()
+            terminate_task_processes((self.event_prefix, batch.key))
+        return True
+
+    # ---------- 执行 ----------
+
+    def _scene_lock(self, processed_file_id: int) -> Lock:
+        with self._lock:
+            return self._scene_locks.setdefault(processed_file_id, Lock())
+
+    def _acquire_scene_lock(self, processed_file_id: int, cancel_event: Event) -> Optional[Lock]:
+        """等待同一场景的其他作业结束；等待期间被取消时返回 None"""
+        lock = self._scene_lock(processed_file_id)
+        while not cancel_event.is_set():
+            if lock.acquire(timeout=SCENE_LOCK_POLL_SECONDS):
+                return lock
+        return None
+
+    def _run(self, job_id: int) -> None:
+        db = self.session_factory()
+        try:
+            job = db.query(SegmentJobModel).filter(SegmentJobModel.id == job_id).first()
+            processed_file_id = job.processed_file_id if job is not None else None
+        finally:
+            db.close()
+        if processed_file_id is None:
+            return
+        # 等待期间被取消时仍交给父类处理，由流水线抛出 TaskCancelled 并记录状态
+        lock = self._acquire_scene_lock(processed_file_id, self._cancel_events.get(job_id) or Event())
+        try:
+            super()._run(job_id)
+        finally:
+            if lock is not None:
+                lock.release()
+
+    def _run_batch(self, batch: SegmentBatch) -> None:
+        db = self.session_factory()
+        lock = None
+        try:
+            jobs = db.query(SegmentJobModel).filter(
+                SegmentJobModel.id.in_(batch.job_ids),
+                SegmentJobModel.status.in_(ACTIVE_STATUSES)
+            ).order_by(SegmentJobModel.id).all()
+            if not jobs:
+                return
+            lock = self._acquire_scene_lock(jobs[0].processed_file_id, batch.cancel_event)
+            self._execute_batch(db, batch, jobs)
+        finally:
+            if lock is not None:
+                lock.release()
+            db.close()
+
+    def _execute_batch(self, db, batch: SegmentBatch, jobs: List[SegmentJobModel]) -> None:
+        processed_file = jobs[0].processed_file
+        model_path, image_dir, checkpoint_path = resolve_segment_inputs(processed_file.folder_path)
+        source_path = os.path.dirname(model_path)
+        batch_dir = os.path.join(os.path.abspath(processed_file.folder_path), SEGMENT_DIRNAME, batch.key)
+        jobs_by_key = {str(job.id): job for job in jobs}
+
+        def is_running(job) -> bool:
+            # 其他进程可能已通过接口取消了作业
+            db.refresh(job)
+            return job.status == "running"
+
+        def end_job(job, status: str, error: Optional[str] = None) -> None:
+            job.status = status
+            job.error = error
+            db.commit()
+            batch.finish(job.id)
+            self._notify(job, status)
+
+        def pending_items(stage: str) -> List[dict]:
+            items = []
+            for job in jobs:
+                if not is_running(job):
+                    continue
+                if stage == "masks":
+                    if mask_cache_valid(segment_dir_for(processed_file.folder_path, job.prompt_text), image_dir, model_path, job.prompt_text):
+                        continue
+                    argv = mask_args(image_dir, model_path, job.prompt_text)
+                else:
+                    argv = finetune_args(source_path, model_path, checkpoint_path, job.prompt_text)
+                items.append({"key": str(job.id), "argv": argv})
+            return items
+
+        def on_event(stage: str, event: str, key: str, message: str) -> None:
+            job = jobs_by_key.get(key)
+            if job is None or event == "skipped" or not is_running(job):
+                return
+            if event == "start":
+                job.progress = BATCH_START_PROGRESS.get(stage, job.progress)
+            elif event == "failed":
+                end_job(job, "failed", f"{stage} failed: {message}（详见批次日志 {SEGMENT_DIRNAME}/{batch.key}/logs/{stage}.log）")
+                return
+            elif stage == "masks":
+                write_mask_cache(segment_dir_for(processed_file.folder_path, job.prompt_text), image_dir, job.prompt_text)
+                job.stage = "masked"
+                job.progress = STAGE_PROGRESS["masked"]
+            else:
+                result_path = segment_result_path(model_path, job.prompt_text)
+                if not os.path.isfile(result_path):
+                    end_job(job, "failed", "COB-GS 未生成 segment.ply")
+                    return
+                job.stage = "segmented"
+                self.apply_fields(db, job, {"result_path": result_path})
+                self.finish(db, job)
+                job.progress = 100
+                end_job(job, "done")
+                return
+            db.commit()
+            self._notify(job, "progress")
+
+        try:
+            os.makedirs(batch_dir, exist_ok=True)
+            batch.attach(os.path.join(batch_dir, "skip"))
+            if not os.path.isdir(image_dir):
+                raise StageFailed("masks", "images not found in project")
+            if not os.path.isfile(checkpoint_path):
+                raise StageFailed("finetune", f"{CHECKPOINT_FILENAME} not found in project")
+            for job in jobs:
+                self._mark_running(db, job)
+
+            ctx = PipelineContext(
+                processed_file.id, batch_dir, batch.cancel_event,
+                progress=BatchProgress(on_event), process_key=(self.event_prefix, batch.key)
+            )
+            Pipeline(self.scheduler, [
+                BatchRunStage("masks", MASK_SCRIPT, lambda: pending_items("masks"), batch.skip_dir),
+                BatchRunStage("finetune", FINETUNE_SCRIPT, lambda: pending_items("finetune"), batch.skip_dir),
+            ]).run(ctx, lambda status, fields: None)
+            ctx.check_cancelled()
+            leftover_status, leftover_error = "failed", "批量执行器未报告该提示的结果"
+        except TaskCancelled:
+            db.rollback()
+            leftover_status, leftover_error = "cancelled", None
+        except Exception as e:
+            db.rollback()
+            print(f"[{self.event_prefix}] 批量分割失败({batch.key}): {str(e)}")
+            tail = getattr(e, "tail", None)
+            leftover_status, leftover_error = "failed", str(e) + ("\n" + "\n".join(tail) if tail else "")
+        # 执行器异常退出或批次被取消时，尚未结束的提示随之结束
+        for job in jobs:
+            db.refresh(job)
+            if job.status in ACTIVE_STATUSES:
+                end_job(job, leftover_status, leftover_error)
+
+
+# 创建全局实例
+segmentation_service = SegmentationService(SessionLocal, event_bus.publish, scheduler, SEGMENT_JOB_WORKERS)
@@ -0,0 +1,164 @@
+# app/tasks/task_log.py
+import os
+import re
+import time
+from collections import deque
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+# 日志目录（位于任务目录下）：uploads/<folder>/logs/<stage>.log
+LOG_DIRNAME = "logs"
+# 内存中保留的末尾行数
+TAIL_LINES = 200
+# 批量写盘阈值：累计行数或距上次写盘的秒数，任一达到即写盘
+FLUSH_LINES = 200
+FLUSH_SECONDS = 1.0
+
+_STAGE_NAME_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def log_dir_for(absolute_output_folder: str) -> str:
+    return os.path.join(absolute_output_folder, LOG_DIRNAME)
+
+
+def is_valid_stage_name(stage: str) -> bool:
+    return bool(stage) and bool(_STAGE_NAME_RE.match(stage))
+
+
+class TaskLogSink:
+    """单个任务单个阶段的日志输出。
+
+    子进程每行输出先进入写缓冲与有界的末尾行队列，按批写入日志文件，
+    避免逐行打印到服务日志、逐行刷新以及无上限地在内存中累积。
+    """
+
+    def __init__(self, task_id: int, absolute_output_folder: str, stage: str):
+        self.task_id = task_id
+        self.stage = stage
+        self.path = os.path.join(log_dir_for(absolute_output_folder), f"{stage}.log")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8", errors="replace")
+        self._buffer: List[str] = []
+        self._tail = deque(maxlen=TAIL_LINES)
+        self._last_flush = time.monotonic()
+        self._lock = Lock()
+
+    def write(self, line: str) -> None:
+        with self._lock:
+            self._buffer.append(line)
+            self._tail.append(line)
+            if len(self._buffer) >= FLUSH_LINES or time.monotonic() - self._last_flush >= FLUSH_SECONDS:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self._buffer and not self._file.closed:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._file.flush()
+        self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def tail(self, lines: Optional[int] = None) -> List[str]:
+        with self._lock:
+            items = list(self._tail)
+        return items[-lines:] if lines else items
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_locked()
+            self._file.close()
+        _unregister_sink(self)
+
+
+# 当前进程中正在写入的日志（用于直接返回内存中的末尾行）
+_active_sinks: Dict[Tuple[int, str], TaskLogSink] = {}
+_active_sinks_lock = Lock()
+
+
+def open_sink(task_id: int, absolute_output_folder: str, stage: str) -> TaskLogSink:
+    sink = TaskLogSink(task_id, absolute_output_folder, stage)
+    with _active_sinks_lock:
+        _active_sinks[(task_id, stage)] = sink
+    return sink
+
+
+def _unregister_sink(sink: TaskLogSink) -> None:
+    with _active_sinks_lock:
+        if _active_sinks.get((sink.task_id, sink.stage)) is sink:
+            _active_sinks.pop((sink.task_id, sink.stage), None)
+
+
+def get_active_sink(task_id: int, stage: str) -> Optional[TaskLogSink]:
+    with _active_sinks_lock:
+        return _active_sinks.get((task_id, stage))
+
+
+def list_stage_logs(absolute_output_folder: str) -> List[str]:
+    """返回已有日志的阶段名，按最后修改时间排序（最新的在最后）"""
+    log_dir = log_dir_for(absolute_output_folder)
+    if not os.path.isdir(log_dir):
+        return []
+    entries = []
+    for name in os.listdir(log_dir):
+        if name.endswith(".log"):
+            path = os.path.join(log_dir, name)
+            entries.append((os.path.getmtime(path), name[:-len(".log")]))
+    entries.sort()
+    return [stage for _, stage in entries]
+
+
+def read_log(task_id: int, absolute_output_folder: str, stage: str, offset: Optional[int], limit: int, tail_lines: int = 50) -> dict:
+    """按字节偏移增量读取阶段日志。
+
+    - offset 为 None 时返回末尾若干行，并给出当前文件大小作为下一次读取的 offset；
+    - 否则从 offset 开始最多读取 limit 字节，只返回完整的行。
+    """
+    path = os.path.join(log_dir_for(absolute_output_folder), f"{stage}.log")
+    sink = get_active_sink(task_id, stage)
+    if sink is not None:
+        # 先把缓冲写盘，保证文件偏移与内存末尾行一致
+        sink.flush()
+    size = os.path.getsize(path) if os.path.isfile(path) else 0
+
+    if offset is None:
+        if sink is not None:
+            lines = sink.tail(tail_lines)
+        else:
+            lines = _read_tail_lines(path, size, limit, tail_lines)
+        return {"stage": stage, "offset": size, "next_offset": size, "size": size, "lines": lines}
+
+    offset = min(offset, size)
+    data = b""
+    if size > offset:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read(limit)
+        if offset + len(data) < size:
+            # 只返回完整的行，剩余部分留给下一次读取
+            cut = data.rfind(b"\n")
+            if cut >= 0:
+                data = data[:cut + 1]
+    text = data.decode("utf-8", errors="replace")
+    return {
+        "stage": stage,
+        "offset": offset,
+        "next_offset": offset + len(data),
+        "size": size,
+        "lines": text.splitlines(),
+    }
+
+
+def _read_tail_lines(path: str, size: int, limit: int, tail_lines: int) -> List[str]:
+    if size == 0:
+        return []
+    start = max(0, size - limit)
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(size - start)
+    lines = data.decode("utf-8", errors="replace").splitlines()
+    if start > 0 and lines:
+        lines = lines[1:]  # 第一行可能不完整
+    return lines[-tail_lines:]
@@ -0,0 +1,254 @@
+# app/tasks/thumbnails.py
+import os
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Callable, List, Optional
+
+from sqlalchemy import exists
+from sqlalchemy.exc import IntegrityError
+
+from app.models.database import SessionLocal
+from app.models.data_resource import DataResource as DataResourceModel, DataResourcePreviewFrame
+from app.models.static_file import StaticFile as StaticFileModel
+from app.sse.event_bus import event_bus
+from app.tasks.scheduler import TrainingScheduler, scheduler
+
+# 预览帧数量、缩略图宽度（高度按比例缩放，不放大）、格式（jpg / webp）与质量（0-100）
+THUMBNAIL_COUNT = int(os.environ.get("THUMBNAIL_COUNT", 5))
+THUMBNAIL_WIDTH = int(os.environ.get("THUMBNAIL_WIDTH", 480))
+THUMBNAIL_FORMAT = os.environ.get("THUMBNAIL_FORMAT", "jpg").lower()
+THUMBNAIL_QUALITY = int(os.environ.get("THUMBNAIL_QUALITY", 80))
+# 同时生成缩略图的数据资源数（ffmpeg 进程数另受调度器 ffmpeg 阶段名额限制）
+THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", 2))
+# 单次 ffprobe / ffmpeg 的超时时间（秒）
+THUMBNAIL_TIMEOUT_SECONDS = 120
+
+PREVIEW_ROOT = "uploads"
+SUPPORTED_FORMATS = ("jpg", "webp")
+
+
+def probe_duration(video_path: str) -> float:
+    """获取视频时长（秒），失败时返回 0"""
+    command = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        video_path
+    ]
+    try:
+        output = subprocess.check_output(command, timeout=THUMBNAIL_TIMEOUT_SECONDS)
+        return max(float(output.decode("utf-8").strip()), 0.0)
+    except (subprocess.SubprocessError, ValueError, OSError) as e:
+        print(f"[thumbnails] 获取视频时长失败: {video_path}, 错误: {str(e)}")
+        return 0.0
+
+
+def thumbnail_times(duration: float, count: int) -> List[float]:
+    """在视频时长内均匀取 count 个时间点（包含起点）"""
+    if duration <= 0 or count <= 1:
+        return [0.0]
+    return [round(duration * i / count, 3) for i in range(count)]
+
+
+def _codec_args(fmt: str, quality: int) -> List[str]:
+    quality = min(max(quality, 0), 100)
+    if fmt == "webp":
+        return ["-c:v", "libwebp", "-quality", str(quality)]
+    # mjpeg 的 qscale 取值 2（最好）~31（最差）
+    return ["-q:v", str(round(2 + (100 - quality) * 29 / 100))]
+
+
+def build_thumbnail_command(
+    video_path: str,
+    times: List[float],
+    output_paths: List[str],
+    width: int = THUMBNAIL_WIDTH,
+    fmt: str = THUMBNAIL_FORMAT,
+    quality: int = THUMBNAIL_QUALITY,
+) -> List[str]:
+    """一次 ffmpeg 调用抽取所有预览帧。
+
+    每个时间点作为一个带 -ss 的输入（输入端快速定位，不解码整段视频），
+    每个输入映射到一个单帧输出。
+    """
+    command = ["ffmpeg", "-y", "-v", "error"]
+    for time_point in times:
+        command += ["-ss", str(time_point), "-i", video_path]
+    scale = f"scale='min({width},iw)':-2"
+    for index, output_path in enumerate(output_paths):
+        command += ["-map", f"{index}:v:0", "-frames:v", "1", "-vf", scale]
+        command += _codec_args(fmt, quality)
+        command.append(output_path)
+    return command
+
+
+def extract_thumbnails(
+    video_path: str,
+    output_folder: str,
+    count: int = THUMBNAIL_COUNT,
+    width: int = THUMBNAIL_WIDTH,
+    fmt: str = THUMBNAIL_FORMAT,
+    quality: int = THUMBNAIL_QUALITY,
+) -> List[str]:
+    """抽取预览帧，返回成功生成的文件路径（按时间顺序）"""
+    if fmt not in SUPPORTED_FORMATS:
+        print(f"[thumbnails] 不支持的缩略图格式 {fmt}，使用 jpg")
+        fmt = "jpg"
+    os.makedirs(output_folder, exist_ok=True)
+    times = thumbnail_times(probe_duration(video_path), count)
+    output_paths = [os.path.join(output_folder, f"frame_{i+1}.{fmt}") for i in range(len(times))]
+    command = build_thumbnail_command(video_path, times, output_paths, width, fmt, quality)
+    subprocess.run(command, check=True, timeout=THUMBNAIL_TIMEOUT_SECONDS, capture_output=True)
+    return [path for path in output_paths if os.path.exists(path) and os.path.getsize(path) > 0]
+
+
+def preview_folder_for(video_path: str) -> str:
+    video_basename = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(PREVIEW_ROOT, f"{video_basename}-video-preview")
+
+
+class ThumbnailService:
+    """在后台线程中为数据资源生成预览帧，完成后通过 SSE 通知前端。
+
+    同一数据资源同时只会有一个生成任务；ffmpeg 进程与 3DGS 抽帧共享调度器的 ffmpeg 阶段名额。
+    生成任务只在进程内排队，启动时通过 resubmit_missing 重新提交重启前未完成的数据资源。
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        publish: Callable[[dict], bool],
+        stage_scheduler: TrainingScheduler,
+        max_workers: int = THUMBNAIL_WORKERS,
+    ):
+        self.session_factory = session_factory
+        self.publish = publish
+        self.scheduler = stage_scheduler
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="thumbnail")
+        self._pending = {}
+        self._lock = Lock()
+
+    def submit(self, data_resource_id: int) -> Future:
+        with self._lock:
+            future = self._pending.get(data_resource_id)
+            if future is not None:
+                return future
+            future = self._executor.submit(self._generate, data_resource_id)
+            self._pending[data_resource_id] = future
+        future.add_done_callback(lambda _: self._forget(data_resource_id))
+        return future
+
+    def resubmit_missing(self) -> int:
+        """重新提交还没有预览帧、视频文件仍存在的数据资源（进程重启时丢失的生成任务），返回提交数"""
+        db = self.session_factory()
+        try:
+            rows = db.query(DataResourceModel.id, StaticFileModel.path).join(
+                StaticFileModel, StaticFileModel.id == DataResourceModel.static_file_id
+            ).filter(
+                ~exists().where(DataResourcePreviewFrame.data_resource_id == DataResourceModel.id)
+            ).order_by(DataResourceModel.id).all()
+        finally:
+            db.close()
+        data_resource_ids = [data_resource_id for data_resource_id, path in rows if os.path.exists(path)]
+        for data_resource_id in data_resource_ids:
+            self.submit(data_resource_id)
+        if data_resource_ids:
+            print(f"[thumbnails] 重新提交 {len(data_resource_ids)} 个缺少预览帧的数据资源")
+        return len(data_resource_ids)
+
+    def _forget(self, data_resource_id: int) -> None:
+        with self._lock:
+            self._pending.pop(data_resource_id, None)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _generate(self, data_resource_id: int) -> Optional[List[dict]]:
+        db = self.session_factory()
+        try:
+            data_resource = db.query(DataResourceModel).filter(DataResourceModel.id == data_resource_id).first()
+            if data_resource is None or data_resource.static_file is None:
+                return None
+            if data_resource.preview_frames:
+                # 已经生成过
+                return None
+            video_path = data_resource.static_file.path
+            if not os.path.exists(video_path):
+                print(f"视频文件不存在: {video_path}")
+                return None
+
+            preview_folder = preview_folder_for(video_path)
+            # 上传去重后同一视频可能对应多个数据资源，已有预览帧时直接复用
+            existing_paths = db.query(StaticFileModel.path).join(
+                DataResourcePreviewFrame, DataResourcePreviewFrame.static_file_id == StaticFileModel.id
+            ).join(
+                DataResourceModel, DataResourceModel.id == DataResourcePreviewFrame.data_resource_id
+            ).filter(
+                DataResourceModel.static_file_id == data_resource.static_file_id,
+                DataResourceModel.id != data_resource_id
+            ).order_by(DataResourcePreviewFrame.data_resource_id, DataResourcePreviewFrame.position).all()
+            frame_paths = []
+            for (path,) in existing_paths:
+                if path in frame_paths:
+                    break
+                frame_paths.append(path)
+            if not frame_paths:
+                with self.scheduler.stage("ffmpeg") as lease:
+                    if lease is None:
+                        return None
+                    frame_paths = extract_thumbnails(video_path, preview_folder)
+
+            preview_images = []
+            folder_name = os.path.basename(preview_folder)
+            for position, frame_path in enumerate(frame_paths):
+                frame_filename = f"{folder_name}/{os.path.basename(frame_path)}"
+                # 重新生成时复用已有的静态文件记录（filename 唯一）
+                static_file = db.query(StaticFileModel).filter(StaticFileModel.filename == frame_filename).first()
+                if static_file is None:
+                    static_file = StaticFileModel(
+                        path=frame_path,
+                        filename=frame_filename,
+                        original_filename=os.path.basename(frame_path)
+                    )
+                    db.add(static_file)
+                    db.flush()  # 刷新会话以获取ID
+                data_resource.preview_frames.append(DataResourcePreviewFrame(
+                    static_file_id=static_file.id,
+                    position=position
+                ))
+                preview_images.append({
+                    "id": static_file.id,
+                    "path": static_file.path,
+                    "filename": static_file.filename,
+                    "original_filename": static_file.original_filename
+                })
+            db.commit()
+            print(f"成功抽取视频预览帧到: {preview_folder}")
+            self.publish({
+                "type": "data_resource_preview_ready",
+                "data_resource_id": data_resource_id,
+                "preview_images": preview_images
+            })
+            return preview_images
+        except IntegrityError:
+            # 多个 worker 启动时可能同时补建同一数据资源，另一进程已写入预览帧
+            db.rollback()
+            print(f"[thumbnails] 预览帧已由其他进程生成(data_resource_id={data_resource_id})")
+            return None
+        except Exception as e:
+            db.rollback()
+            print(f"抽取视频预览帧时出错(data_resource_id={data_resource_id}): {str(e)}")
+            self.publish({
+                "type": "data_resource_preview_failed",
+                "data_resource_id": data_resource_id,
+                "msg": str(e)
+            })
+            return None
+        finally:
+            db.close()
+
+
+# 创建全局实例
+thumbnail_service = ThumbnailService(SessionLocal, event_bus.publish, scheduler)
@@ -0,0 +1,135 @@
+# benchmarks/project_list.py
+"""项目列表接口（/projects/list）在大数据量下的查询次数与耗时基准。
+
+向数据库写入 N 个项目（每个项目带视频、封面、处理任务和若干标签），然后分别请求首页、深页（页码分页）
+和游标分页的若干页，统计每次请求执行的 SQL 语句数与耗时。
+
+    python benchmarks/project_list.py --projects 10000 --page-size 20
+    python benchmarks/project_list.py --database-url mysql+mysqlconnector://...
+
+默认使用临时目录中的 SQLite；每次请求的语句数应与页大小无关（页码分页 3 条，游标分页 2 条）。
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def _bind_database(database_url: str):
+    from sqlalchemy import create_engine
+
+    import app.models.database as database
+
+    connect_args = {"check_same_thread": False} if database_url.startswith("sqlite") else {}
+    engine = create_engine(database_url, connect_args=connect_args)
+    database.engine = engine
+    database.SessionLocal.configure(bind=engine)
+    return engine
+
+
+def seed(engine, projects: int, tags_per_project: int) -> None:
+    """批量写入测试数据（Core 批量 INSERT，ID 显式指定）"""
+    from app.models.processed_file import ProcessedFile
+    from app.models.project import Project
+    from app.models.static_file import StaticFile
+    from app.models.tag import Tag, project_tags
+
+    with engine.begin() as conn:
+        conn.execute(Tag.__table__.insert(), [
+            {"id": index + 1, "name": f"tag-{index}", "color": "#FF5733"} for index in range(max(tags_per_project, 1))
+        ])
+        conn.execute(StaticFile.__table__.insert(), [
+            {"id": index + 1, "path": f"uploads/{index}", "filename": f"{index}", "original_filename": f"{index}"}
+            for index in range(projects * 2)
+        ])
+        conn.execute(ProcessedFile.__table__.insert(), [
+            {"id": index + 1, "file_id": index * 2 + 1, "folder_path": f"uploads/{index}",
+             "status": "trained", "algorithm": "3dgs"}
+            for index in range(projects)
+        ])
+        conn.execute(Project.__table__.insert(), [
+            {"id": index + 1, "name": f"project-{index}", "processed_file_id": index + 1,
+             "static_file_id": index * 2 + 1, "project_cover_image_static_id": index * 2 + 2}
+            for index in range(projects)
+        ])
+        if tags_per_project:
+            conn.execute(project_tags.insert(), [
+                {"project_id": index + 1, "tag_id": tag + 1}
+                for index in range(projects) for tag in range(tags_per_project)
+            ])
+
+
+def measure(client, engine, params: dict, repeat: int) -> dict:
+    from sqlalchemy import event
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    durations = []
+    body = None
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        for _ in range(repeat):
+            statements.clear()
+            started = time.perf_counter()
+            response = client.get("/projects/list", params=params)
+            durations.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+            body = response.json()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return {"queries": len(statements), "rows": len(body["data"]), "body": body,
+            "p50_ms": round(statistics.median(durations) * 1000, 1), "max_ms": round(max(durations) * 1000, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--projects", type=int, default=10000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--tags", type=int, default=2, help="每个项目的标签数")
+    parser.add_argument("--cursor-pages", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="project-list-bench-")
+    os.chdir(workdir)
+    engine = _bind_database(args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    started = time.perf_counter()
+    seed(engine, args.projects, args.tags)
+    print(f"写入 {args.projects} 个项目耗时 {time.perf_counter() - started:.1f}s")
+
+    last_page = (args.projects + args.page_size - 1) // args.page_size
+    print(f"{'case':>12} {'queries':>7} {'rows':>5} {'p50_ms':>8} {'max_ms':>8}")
+    with TestClient(app) as client:
+        for name, page in (("page 1", 1), ("page mid", last_page // 2), ("page last", last_page)):
+            row = measure(client, engine, {"page": page, "page_size": args.page_size}, args.repeat)
+            print(f"{name:>12} {row['queries']:>7} {row['rows']:>5} {row['p50_ms']:>8} {row['max_ms']:>8}")
+
+        cursor = ""
+        for index in range(args.cursor_pages):
+            if cursor is None:
+                break
+            row = measure(client, engine, {"cursor": cursor, "page_size": args.page_size}, args.repeat)
+            print(f"{f'cursor {index + 1}':>12} {row['queries']:>7} {row['rows']:>5} {row['p50_ms']:>8} {row['max_ms']:>8}")
+            cursor = row["body"]["pagination"]["next_cursor"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/splat_export.py
+"""压缩点云导出（app/splat/export.py）的体积与耗时基准。
+
+生成与 3DGS 训练结果布局相同的合成 point_cloud.ply（3 阶球谐，每个高斯 62 个 float32），
+对不同高斯数与球谐阶数分别导出 .splat 与 .compressed.ply，输出文件大小、压缩比与耗时。
+
+    python benchmarks/splat_export.py --counts 100000 1000000 --sh-degrees 0 1 3
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.splat.export import (  # noqa: E402
+    COMPRESSED_SUFFIX, SPLAT_SUFFIX, export_compressed_ply, export_splat, load_gaussians,
+)
+from app.splat.ply import write_ply  # noqa: E402
+
+PLY_FIELDS = (
+    ["x", "y", "z", "nx", "ny", "nz", "f_dc_0", "f_dc_1", "f_dc_2"]
+    + [f"f_rest_{i}" for i in range(45)]
+    + ["opacity", "scale_0", "scale_1", "scale_2", "rot_0", "rot_1", "rot_2", "rot_3"]
+)
+
+
+def make_point_cloud(path: str, count: int, seed: int = 0) -> None:
+    """写出合成的 3DGS 点云：位置呈各向异性正态分布，对数尺度集中在 e^-4 附近"""
+    rng = np.random.default_rng(seed)
+    vertices = np.zeros(count, dtype=[(name, "<f4") for name in PLY_FIELDS])
+    for name in PLY_FIELDS:
+        vertices[name] = rng.standard_normal(count, dtype=np.float32)
+    vertices["x"] *= 10
+    vertices["y"] *= 5
+    vertices["z"] *= 3
+    for name in ("nx", "ny", "nz"):
+        vertices[name] = 0
+    for name in ("scale_0", "scale_1", "scale_2"):
+        vertices[name] = rng.normal(-4, 1, size=count)
+    for i in range(45):
+        vertices[f"f_rest_{i}"] *= 0.1
+    write_ply(path, [("vertex", vertices)])
+
+
+def _megabytes(size: int) -> str:
+    return f"{size / (1 << 20):.1f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--sh-degrees", type=int, nargs="+", default=[0, 1, 3])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="splat-bench-")
+    try:
+        print(f"{'gaussians':>10} {'sh':>3} {'ply_mb':>7} {'splat_mb':>8} {'cmp_mb':>7} "
+              f"{'ratio':>6} {'load_s':>7} {'splat_s':>7} {'cmp_s':>6}")
+        for count in args.counts:
+            ply_path = os.path.join(workdir, f"point_cloud_{count}.ply")
+            make_point_cloud(ply_path, count)
+            original_size = os.path.getsize(ply_path)
+            base = ply_path[:-len(".ply")]
+            for sh_degree in args.sh_degrees:
+                started = time.perf_counter()
+                gaussians = load_gaussians(ply_path)
+                loaded = time.perf_counter()
+                splat_size = export_splat(gaussians, base + SPLAT_SUFFIX)
+                splatted = time.perf_counter()
+                compressed_size = export_compressed_ply(gaussians, base + COMPRESSED_SUFFIX, sh_degree)
+                finished = time.perf_counter()
+                print(f"{count:>10} {sh_degree:>3} {_megabytes(original_size):>7} {_megabytes(splat_size):>8} "
+                      f"{_megabytes(compressed_size):>7} {original_size / compressed_size:>5.1f}x "
+                      f"{loaded - started:>7.2f} {splatted - loaded:>7.2f} {finished - splatted:>6.2f}")
+            os.remove(ply_path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/sse_fanout.py
+"""SSE 跨进程广播（SSE_BACKEND=database）的扇出延迟基准。
+
+启动 W 个 worker 进程，每个进程用 DatabaseBackend 轮询 sse_events 表，并挂 C 个模拟客户端
+（SSEConnectionManager.connect 得到的连接，由协程等待并取出消息帧）；主进程按固定间隔发布 N 条消息，
+统计从写入数据库到各客户端取出消息的延迟。
+
+    python benchmarks/sse_fanout.py --workers 1 2 4 --clients 10 100 --messages 200
+    python benchmarks/sse_fanout.py --database-url mysql+mysqlconnector://...
+
+默认使用临时目录中的 SQLite（WAL），结果主要反映轮询间隔（SSE_DB_POLL_SECONDS）与进程内扇出开销。
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def _bind_database(database_url: str) -> None:
+    from sqlalchemy import create_engine, event
+
+    import app.models.database as database
+
+    if database_url.startswith("sqlite"):
+        engine = create_engine(database_url, connect_args={"check_same_thread": False, "timeout": 30})
+
+        @event.listens_for(engine, "connect")
+        def _wal(dbapi_connection, _):
+            dbapi_connection.execute("PRAGMA journal_mode=WAL")
+    else:
+        engine = create_engine(database_url, pool_pre_ping=True)
+    database.engine = engine
+    database.SessionLocal.configure(bind=engine)
+
+
+def _worker(database_url: str, clients: int, messages: int, poll_seconds: float, ready, results) -> None:
+    _bind_database(database_url)
+    from app.sse.backends import DatabaseBackend
+    from app.sse.connection_manager import SSEConnectionManager
+
+    async def consume(client, latencies):
+        received = 0
+        while received < messages:
+            await client.wait(1.0)
+            for frame in client.drain():
+                data = frame.split("data: ", 1)[1]
+                latencies.append(time.time() - json.loads(data)["sent_at"])
+                received += 1
+
+    async def main():
+        manager = SSEConnectionManager(backend=DatabaseBackend(poll_seconds=poll_seconds))
+        await manager.start()
+        latencies = []
+        consumers = [
+            asyncio.create_task(consume(await manager.connect(None), latencies)) for _ in range(clients)
+        ]
+        ready.put(os.getpid())
+        await asyncio.wait_for(asyncio.gather(*consumers), timeout=60 + messages)
+        await manager.stop()
+        results.put(latencies)
+
+    asyncio.run(main())
+
+
+def run_case(database_url: str, workers: int, clients: int, messages: int, interval: float, poll_seconds: float) -> dict:
+    from app.sse.backends import DatabaseBackend
+
+    ctx = multiprocessing.get_context("spawn")
+    ready, results = ctx.Queue(), ctx.Queue()
+    processes = [
+        ctx.Process(target=_worker, args=(database_url, clients, messages, poll_seconds, ready, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.get(timeout=60)
+
+    for index in range(messages):
+        DatabaseBackend._insert(json.dumps({"type": "bench", "n": index, "sent_at": time.time()}))
+        time.sleep(interval)
+
+    latencies = []
+    for _ in processes:
+        latencies.extend(results.get(timeout=120))
+    for process in processes:
+        process.join()
+    latencies.sort()
+    return {
+        "workers": workers,
+        "clients": clients,
+        "deliveries": len(latencies),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.01, help="发布间隔（秒）")
+    parser.add_argument("--poll-seconds", type=float, default=0.2)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'sse_bench.db')}"
+    _bind_database(database_url)
+    import app.models.database as database
+    from app.models.sse_event import SSEEvent
+
+    SSEEvent.__table__.create(bind=database.engine, checkfirst=True)
+
+    print(f"{'workers':>7} {'clients':>7} {'deliveries':>10} {'p50_ms':>8} {'p95_ms':>8} {'max_ms':>8}")
+    for workers in args.workers:
+        for clients in args.clients:
+            row = run_case(database_url, workers, clients, args.messages, args.interval, args.poll_seconds)
+            print(f"{row['workers']:>7} {row['clients']:>7} {row['deliveries']:>10} "
+                  f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['max_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main()
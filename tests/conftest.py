@@ -0,0 +1,70 @@
+# tests/conftest.py
+"""测试公共配置：在导入 app 之前把数据库切换为临时目录中的 SQLite，并在临时目录中运行（uploads/ 等相对路径）"""
+import os
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+WORKDIR = tempfile.mkdtemp(prefix="rsde-tests-")
+os.chdir(WORKDIR)
+
+import app.models.database as database  # noqa: E402
+
+engine = create_engine(
+    f"sqlite:///{os.path.join(WORKDIR, 'test.db')}",
+    connect_args={"check_same_thread": False, "timeout": 30},
+)
+database.engine = engine
+database.SessionLocal.configure(bind=engine)
+
+from app.main import app as fastapi_app  # noqa: E402  创建全部表
+from app.models.database import Base, SessionLocal  # noqa: E402
+
+
+def _clear_tables() -> None:
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+
+
+@pytest.fixture
+def db():
+    _clear_tables()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        _clear_tables()
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+
+    with TestClient(fastapi_app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def make_task(db):
+    """创建一个静态文件及其对应的处理任务（默认已训练完成）"""
+    from app.models.processed_file import ProcessedFile
+    from app.models.static_file import StaticFile
+
+    def _make(folder: str = "uploads/task", status: str = "trained", **fields):
+        static_file = StaticFile(path="uploads/video.mp4", filename="video.mp4", original_filename="video.mp4")
+        db.add(static_file)
+        db.flush()
+        task = ProcessedFile(file_id=static_file.id, folder_path=folder, status=status, algorithm="3dgs", **fields)
+        db.add(task)
+        db.commit()
+        return task
+
+    return _make
@@ -0,0 +1,68 @@
+# tests/test_background_jobs.py
+from app.models.mesh_export import MeshExport
+from app.tasks.background_jobs import BackgroundJobService
+from app.tasks.pipeline import Stage
+from app.tasks.scheduler import TrainingScheduler
+
+
+class RecordingStage(Stage):
+    name = "record"
+    done_status = "recorded"
+
+    def __init__(self, runs: list):
+        self.runs = runs
+
+    def run(self, ctx, lease):
+        self.runs.append(ctx.process_key)
+
+
+class ExampleService(BackgroundJobService):
+    model = MeshExport
+    event_prefix = "example"
+
+    def __init__(self, on_prepare=None):
+        from app.models.database import SessionLocal
+
+        self.messages = []
+        self.runs = []
+        self.on_prepare = on_prepare
+        super().__init__(SessionLocal, self.messages.append, TrainingScheduler(devices=[None]))
+
+    def prepare(self, db, job):
+        if self.on_prepare:
+            self.on_prepare(job.id)
+        return "job-dir", [RecordingStage(self.runs)]
+
+
+def _job(db, make_task) -> MeshExport:
+    job = MeshExport(processed_file_id=make_task().id, cache_key="key", params="{}", status="queued")
+    db.add(job)
+    db.commit()
+    return job
+
+
+def test_job_runs_to_done(db, make_task):
+    job = _job(db, make_task)
+    service = ExampleService()
+    service._run(job.id)
+    db.refresh(job)
+    assert job.status == "done"
+    assert job.owner == service.worker_id
+    assert service.runs == [("example", job.id)]
+    assert [m["type"] for m in service.messages] == ["example_progress", "example_progress", "example_done"]
+
+
+def test_cancel_during_prepare_is_not_overwritten(db, make_task):
+    job = _job(db, make_task)
+
+    def cancel_from_other_process(job_id):
+        db.query(MeshExport).filter(MeshExport.id == job_id).update({MeshExport.status: "cancelled"})
+        db.commit()
+
+    service = ExampleService(on_prepare=cancel_from_other_process)
+    service._run(job.id)
+    db.refresh(job)
+    assert job.status == "cancelled"
+    assert job.owner is None
+    assert service.runs == []
+    assert service.messages == []
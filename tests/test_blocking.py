@@ -0,0 +1,93 @@
+# tests/test_blocking.py
+"""有界线程池与事件循环阻塞监测；async 路由中的阻塞调用会让这里的用例失败"""
+import asyncio
+import contextvars
+import subprocess
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.executors import BlockingPool
+from app.core.loop_monitor import LoopLagMonitor, loop_monitor
+from app.tasks.processes import register_process
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def test_pool_rejects_when_full():
+    pool = BlockingPool("test", max_workers=1, max_pending=2)
+    release = threading.Event()
+
+    async def main():
+        running = [asyncio.ensure_future(pool.run(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as error:
+            await pool.run(time.sleep, 0)
+        assert error.value.status_code == 503
+        assert pool.stats()["pending"] == 2
+        release.set()
+        await asyncio.gather(*running)
+        assert pool.stats()["pending"] == 0
+        # 名额释放后可以继续提交，contextvars 在工作线程中可见
+        request_id.set("abc")
+        assert await pool.run(request_id.get) == "abc"
+
+    asyncio.run(main())
+
+
+def _blocking_handler():
+    time.sleep(0.3)
+
+
+def test_monitor_reports_blocking_call_with_stack():
+    monitor = LoopLagMonitor(threshold_ms=100, interval_ms=20)
+
+    async def main():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        _blocking_handler()
+        await asyncio.sleep(0.1)
+        await monitor.stop()
+
+    asyncio.run(main())
+    stats = monitor.stats()
+    assert stats["blocked_count"] == 1
+    assert stats["max_lag_ms"] >= 200
+    assert "_blocking_handler" in stats["last_blocked"]["stack"]
+
+
+def test_monitor_ignores_awaited_work():
+    monitor = LoopLagMonitor(threshold_ms=100, interval_ms=20)
+    pool = BlockingPool("test", max_workers=1, max_pending=1)
+
+    async def main():
+        monitor.start()
+        await pool.run(time.sleep, 0.3)
+        await asyncio.sleep(0.3)
+        await monitor.stop()
+
+    asyncio.run(main())
+    assert monitor.stats()["blocked_count"] == 0
+
+
+def test_cancel_task_does_not_block_event_loop(client, make_task):
+    task = make_task(status="training")
+    # 忽略 SIGTERM 的进程：终止时需要等满宽限期再 SIGKILL
+    process = subprocess.Popen(["sh", "-c", "trap '' TERM; sleep 30"], start_new_session=True)
+    register_process(task.id, process)
+    time.sleep(0.1)
+    loop_monitor.reset()
+
+    cancel = threading.Thread(target=client.post, args=(f"/threeDGS/cancel/{task.id}",))
+    cancel.start()
+    time.sleep(0.3)
+    started = time.monotonic()
+    assert client.get("/").status_code == 200
+    latency = time.monotonic() - started
+    cancel.join(timeout=10)
+
+    assert process.poll() is not None
+    assert latency < 0.5
+    assert loop_monitor.stats()["blocked_count"] == 0
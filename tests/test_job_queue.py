@@ -0,0 +1,65 @@
+# tests/test_job_queue.py
+import datetime
+
+from app.models.processed_file import ProcessedFile
+from app.routers.three_d_gs import _mark_task_cancelled
+from app.tasks.job_queue import MAX_ATTEMPTS, DurableJobQueue
+from app.tasks.scheduler import TrainingScheduler
+
+
+def _queue(lost=None):
+    from app.models.database import SessionLocal
+
+    return DurableJobQueue(
+        SessionLocal,
+        TrainingScheduler(devices=[None]),
+        runner=lambda task_id: None,
+        on_lease_lost=(lost.append if lost is not None else None),
+    )
+
+
+def test_cancel_from_other_process_stops_owner(db, make_task):
+    lost = []
+    owner = _queue(lost)
+    task = make_task(status="queued")
+    assert owner.claim(1) == [task.id]
+    owner._held.add(task.id)
+
+    # 另一个 API 进程处理取消请求
+    needs_cleanup, _ = _mark_task_cancelled(task.id, db)
+    assert needs_cleanup
+
+    owner.heartbeat()
+    assert lost == [task.id]
+    db.refresh(task)
+    assert task.status == "failed"
+    assert task.lease_owner is None
+
+
+def test_graceful_requeue_does_not_consume_attempts(db, make_task):
+    task = make_task(status="queued")
+    for _ in range(MAX_ATTEMPTS + 2):
+        queue = _queue()
+        assert queue.claim(1) == [task.id]
+        # 重载 / 重启时主动归还
+        queue._requeue([task.id])
+    db.refresh(task)
+    assert task.status == "queued"
+    assert task.attempts == 0
+
+
+def test_expired_leases_count_attempts(db, make_task):
+    task = make_task(status="queued")
+    for _ in range(MAX_ATTEMPTS):
+        assert _queue().claim(1) == [task.id]
+        # 持有进程崩溃，租约过期后被恢复
+        db.query(ProcessedFile).filter(ProcessedFile.id == task.id).update({
+            ProcessedFile.status: "converted",
+            ProcessedFile.lease_owner: "other-host:1:dead",
+            ProcessedFile.lease_expires_at: datetime.datetime.utcnow() - datetime.timedelta(seconds=1),
+        })
+        db.commit()
+        assert _queue().recover_orphans() == 1
+    assert _queue().claim(1) == []
+    db.refresh(task)
+    assert task.status == "failed"
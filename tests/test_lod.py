@@ -0,0 +1,112 @@
+# tests/test_lod.py
+import os
+import time
+
+import numpy as np
+
+from app.core.uploads import UPLOAD_DIRECTORY
+from app.splat.ply import write_ply
+
+PLY_FIELDS = (["x", "y", "z", "f_dc_0", "f_dc_1", "f_dc_2", "opacity"]
+              + ["scale_0", "scale_1", "scale_2", "rot_0", "rot_1", "rot_2", "rot_3"])
+
+
+def _write_point_cloud(path: str, count: int = 500) -> None:
+    rng = np.random.default_rng(0)
+    vertices = np.zeros(count, dtype=[(name, "<f4") for name in PLY_FIELDS])
+    for name in PLY_FIELDS:
+        vertices[name] = rng.standard_normal(count)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_ply(path, [("vertex", vertices)])
+
+
+def _imported_task(make_task):
+    """导入项目的目录结构：uploads/<前缀>_extracted/<根目录>/point_cloud/iteration_N/point_cloud.ply"""
+    folder = os.path.join(UPLOAD_DIRECTORY, "lodtest_extracted", "scene")
+    result_url = "lodtest_extracted/scene/point_cloud/iteration_7/point_cloud.ply"
+    _write_point_cloud(os.path.join(UPLOAD_DIRECTORY, result_url))
+    return make_task(folder=folder, result_url=result_url), result_url
+
+
+def test_lod_manifest_built_in_background_for_imported_project(client, db, make_task):
+    task, result_url = _imported_task(make_task)
+
+    response = client.get(f"/threeDGS/lod/{task.id}")
+    assert response.status_code == 202
+    assert response.headers["retry-after"]
+    deadline = time.monotonic() + 10
+    while response.status_code == 202 and time.monotonic() < deadline:
+        time.sleep(0.05)
+        response = client.get(f"/threeDGS/lod/{task.id}")
+    assert response.status_code == 200
+    manifest = response.json()
+    assert manifest["count"] == 500
+
+    db.refresh(task)
+    assert task.lod_manifest_url == "lodtest_extracted/scene/point_cloud/iteration_7/lod/manifest.json"
+    # 清单 URL 相对上传目录，可通过 /files 直接访问
+    assert client.get(f"/files/{task.lod_manifest_url}").status_code == 200
+    tile = manifest["levels"][0]["tiles"][0]
+    assert len(client.get(manifest["base_url"] + tile["url"]).content) == tile["bytes"]
+
+
+def _poll_lod(client, task_id: int):
+    response = client.get(f"/threeDGS/lod/{task_id}")
+    deadline = time.monotonic() + 10
+    while response.status_code == 202 and time.monotonic() < deadline:
+        time.sleep(0.05)
+        response = client.get(f"/threeDGS/lod/{task_id}")
+    return response
+
+
+def test_lod_build_failure_is_reported_until_point_cloud_changes(client, make_task, monkeypatch):
+    from app.routers import three_d_gs
+
+    builds = []
+    original = three_d_gs.build_lod_tiles
+    monkeypatch.setattr(three_d_gs, "build_lod_tiles", lambda path: builds.append(path) or original(path))
+    folder = os.path.join(UPLOAD_DIRECTORY, "broken_extracted", "scene")
+    ply_path = os.path.join(folder, "point_cloud", "iteration_7", "point_cloud.ply")
+    os.makedirs(os.path.dirname(ply_path))
+    with open(ply_path, "wb") as f:
+        f.write(b"not a ply")
+    task = make_task(folder=folder)
+
+    response = _poll_lod(client, task.id)
+    assert response.status_code == 422
+    assert "PLY" in response.json()["detail"]
+    # 点云未变化时不再重复构建
+    assert client.get(f"/threeDGS/lod/{task.id}").status_code == 422
+    assert len(builds) == 1
+
+    _write_point_cloud(ply_path, count=50)
+    stat = os.stat(ply_path)
+    os.utime(ply_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    response = _poll_lod(client, task.id)
+    assert response.status_code == 200
+    assert response.json()["count"] == 50
+    assert len(builds) == 2
+
+
+def test_lod_manifest_requires_trained_task(client, make_task):
+    task = make_task(status="training")
+    assert client.get(f"/threeDGS/lod/{task.id}").status_code == 409
+    assert client.get("/threeDGS/lod/999999").status_code == 404
+
+
+def test_stats_for_imported_project(client, make_task):
+    task, result_url = _imported_task(make_task)
+    response = client.get(f"/threeDGS/stats/{task.id}")
+    assert response.status_code == 200
+    assert response.json()["result_url"] == result_url
+    assert response.json()["gaussian_count"] == 500
+
+
+def test_stats_falls_back_to_recorded_result_url(client, make_task):
+    # 目录中没有 point_cloud/iteration_N 时使用任务记录的 result_url（相对上传目录）
+    result_url = "fallback_extracted/scene/exported/point_cloud.ply"
+    _write_point_cloud(os.path.join(UPLOAD_DIRECTORY, result_url), count=50)
+    task = make_task(folder=os.path.join(UPLOAD_DIRECTORY, "fallback_extracted", "scene"), result_url=result_url)
+    response = client.get(f"/threeDGS/stats/{task.id}")
+    assert response.status_code == 200
+    assert response.json()["gaussian_count"] == 50
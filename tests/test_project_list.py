@@ -0,0 +1,76 @@
+# tests/test_project_list.py
+import contextlib
+
+import pytest
+from sqlalchemy import event
+
+from app.models.processed_file import ProcessedFile
+from app.models.project import Project
+from app.models.static_file import StaticFile
+from app.models.tag import Tag
+
+
+@contextlib.contextmanager
+def count_queries():
+    """统计代码块内执行的 SQL 语句数"""
+    from app.models.database import engine
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _seed(db, count: int, tags_per_project: int = 2) -> None:
+    tags = [Tag(name=f"tag-{index}", color="#FF5733") for index in range(3)]
+    db.add_all(tags)
+    for index in range(count):
+        video = StaticFile(path=f"uploads/{index}.mp4", filename=f"{index}.mp4", original_filename=f"{index}.mp4")
+        cover = StaticFile(path=f"uploads/{index}.jpg", filename=f"{index}.jpg", original_filename=f"{index}.jpg")
+        db.add_all([video, cover])
+        db.flush()
+        task = ProcessedFile(file_id=video.id, folder_path=f"uploads/{index}", status="trained", algorithm="3dgs")
+        db.add(task)
+        db.flush()
+        project = Project(
+            name=f"project-{index}", processed_file_id=task.id,
+            static_file_id=video.id, project_cover_image_static_id=cover.id,
+        )
+        project.tags = tags[:tags_per_project]
+        db.add(project)
+    db.commit()
+
+
+@pytest.mark.parametrize("page", [1, 2, 3])
+def test_page_query_count_is_constant(client, db, page):
+    _seed(db, 25)
+    with count_queries() as statements:
+        response = client.get("/projects/list", params={"page": page, "page_size": 10})
+    body = response.json()
+    assert response.status_code == 200
+    assert len(body["data"]) == (10 if page < 3 else 5)
+    assert all(len(item["tags"]) == 2 and item["cover_image"] for item in body["data"])
+    # COUNT + 项目及关联对象（JOIN）+ 标签（IN 批量加载）
+    assert len(statements) == 3, statements
+
+
+def test_cursor_page_query_count(client, db):
+    _seed(db, 25)
+    cursor = ""
+    seen = []
+    while cursor is not None:
+        with count_queries() as statements:
+            response = client.get("/projects/list", params={"cursor": cursor, "page_size": 10})
+        body = response.json()
+        seen.extend(item["id"] for item in body["data"])
+        cursor = body["pagination"]["next_cursor"]
+        # 无 COUNT：项目及关联对象 + 标签
+        assert len(statements) == 2, statements
+    assert len(seen) == 25
+    assert seen == sorted(seen, reverse=True)
@@ -0,0 +1,112 @@
+# tests/test_scheduler.py
+"""用桩脚本代替 convert.py / train.py，验证多槽位调度与阶段限流"""
+import json
+import sys
+import threading
+import time
+
+import pytest
+
+from app.tasks.pipeline import ConvertStage, Pipeline, PipelineContext, TaskCancelled, TrainStage
+from app.tasks.scheduler import TrainingScheduler
+
+STUB = """
+import json, os, sys, time
+stage, task_id, seconds, log = sys.argv[1], sys.argv[2], float(sys.argv[3]), sys.argv[4]
+started = time.time()
+time.sleep(seconds)
+with open(log, "a") as f:
+    f.write(json.dumps({"stage": stage, "task": int(task_id), "device": os.environ.get("CUDA_VISIBLE_DEVICES"),
+                        "start": started, "end": time.time()}) + "\\n")
+"""
+
+
+@pytest.fixture
+def stub(tmp_path):
+    script = tmp_path / "stub.py"
+    script.write_text(STUB)
+    log = tmp_path / "events.log"
+
+    def command(stage: str, task_id: int, seconds: float) -> str:
+        return f'"{sys.executable}" "{script}" {stage} {task_id} {seconds} "{log}"'
+
+    def events():
+        return [json.loads(line) for line in log.read_text().splitlines()]
+
+    command.events = events
+    return command
+
+
+def _run_jobs(scheduler, stub, tmp_path, task_ids, convert_seconds=0.3, train_seconds=0.8):
+    futures = []
+    for task_id in task_ids:
+        ctx = PipelineContext(task_id, str(tmp_path / f"task{task_id}"), threading.Event())
+        pipeline = Pipeline(scheduler, [
+            ConvertStage(stub("convert", task_id, convert_seconds)),
+            TrainStage(stub("train", task_id, train_seconds)),
+        ])
+        futures.append(scheduler.submit(task_id, pipeline.run, ctx, lambda status, fields: None))
+    for future in futures:
+        future.result(timeout=30)
+    return stub.events()
+
+
+def _max_overlap(events) -> int:
+    points = sorted([(e["start"], 1) for e in events] + [(e["end"], -1) for e in events], key=lambda p: (p[0], p[1]))
+    current = peak = 0
+    for _, delta in points:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+def test_jobs_run_on_separate_gpu_slots(stub, tmp_path):
+    scheduler = TrainingScheduler(devices=["0", "1"], stage_limits={"convert": 2})
+    try:
+        events = _run_jobs(scheduler, stub, tmp_path, [1, 2, 3, 4])
+    finally:
+        scheduler.shutdown()
+    trains = [e for e in events if e["stage"] == "train"]
+    assert len(trains) == 4
+    assert {e["device"] for e in trains} == {"0", "1"}
+    assert _max_overlap(trains) == 2
+    # CPU 阶段不绑定 GPU
+    assert all(e["device"] is None for e in events if e["stage"] == "convert")
+
+
+def test_cpu_stage_overlaps_training_and_respects_limit(stub, tmp_path):
+    scheduler = TrainingScheduler(devices=["0"], stage_limits={"convert": 1})
+    try:
+        events = _run_jobs(scheduler, stub, tmp_path, [1, 2, 3])
+    finally:
+        scheduler.shutdown()
+    converts = [e for e in events if e["stage"] == "convert"]
+    trains = [e for e in events if e["stage"] == "train"]
+    assert _max_overlap(converts) == 1
+    assert _max_overlap(trains) == 1
+    # 任务 A 训练期间，任务 B 的转换在运行
+    assert any(
+        c["task"] != t["task"] and c["start"] < t["end"] and t["start"] < c["end"]
+        for c in converts for t in trains
+    )
+
+
+def test_cancel_while_waiting_for_slot(stub, tmp_path):
+    scheduler = TrainingScheduler(devices=["0"])
+    try:
+        with scheduler.stage("train") as held:
+            assert held is not None and held.slot.device == "0"
+            cancel_event = threading.Event()
+            ctx = PipelineContext(9, str(tmp_path / "task9"), cancel_event)
+            future = scheduler.submit(9, Pipeline(scheduler, [TrainStage(stub("train", 9, 0))]).run, ctx, lambda *_: None)
+            time.sleep(0.2)
+            assert not future.done()
+            cancel_event.set()
+            with pytest.raises(TaskCancelled):
+                future.result(timeout=5)
+    finally:
+        scheduler.shutdown()
+    # 被取消的任务没有启动训练，槽位已归还
+    assert not (tmp_path / "events.log").exists()
+    with scheduler.stage("train") as lease:
+        assert lease.slot.device == "0"
@@ -0,0 +1,74 @@
+# tests/test_segment_batch_runner.py
+import json
+import time
+import subprocess
+import sys
+
+from app.tasks.segment_batch_runner import MARKER
+from app.tasks.segmentation import BATCH_RUNNER
+
+SCRIPT = """
+import os, signal, sys, time
+import state
+
+state.prompts.append(sys.argv[1])
+print("seen", ",".join(state.prompts))
+if sys.argv[1] == "raise":
+    raise ValueError("bad prompt")
+if sys.argv[1] == "exit":
+    sys.exit(3)
+if sys.argv[1] == "crash":
+    os.kill(os.getpid(), signal.SIGKILL)
+if sys.argv[1] == "hang":
+    # 模拟正在执行时被取消：写入跳过标记后一直占用
+    open(os.path.join(os.path.dirname(__file__), "skip", "hang"), "w").close()
+    time.sleep(60)
+"""
+
+
+def _run_batch(tmp_path, prompts, skipped=()):
+    (tmp_path / "state.py").write_text("prompts = []\n")
+    (tmp_path / "segment.py").write_text(SCRIPT)
+    skip_dir = tmp_path / "skip"
+    skip_dir.mkdir()
+    for key in skipped:
+        (skip_dir / key).touch()
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps({
+        "script": str(tmp_path / "segment.py"),
+        "skip_dir": str(skip_dir),
+        "preload": ["json", "missing_module_for_test"],
+        "items": [{"key": prompt, "argv": [prompt]} for prompt in prompts],
+    }))
+    result = subprocess.run([sys.executable, BATCH_RUNNER, str(manifest)], capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.splitlines()
+
+
+def test_each_prompt_starts_from_clean_module_state(tmp_path):
+    lines = _run_batch(tmp_path, ["chair", "table", "lamp"])
+    assert [line for line in lines if line.startswith("seen")] == ["seen chair", "seen table", "seen lamp"]
+    assert [line for line in lines if line.startswith(f"{MARKER} done")] == [
+        f"{MARKER} done chair", f"{MARKER} done table", f"{MARKER} done lamp",
+    ]
+
+
+def test_failures_are_isolated(tmp_path):
+    lines = _run_batch(tmp_path, ["raise", "exit", "crash", "cancelled", "after"], skipped=["cancelled"])
+    events = [line[len(MARKER) + 1:] for line in lines if line.startswith(MARKER) and "start" not in line]
+    assert events == [
+        "预先导入 missing_module_for_test 失败: No module named 'missing_module_for_test'",
+        "failed raise exit code 1",
+        "failed exit exit code 3",
+        "failed crash killed by signal 9",
+        "skipped cancelled",
+        "done after",
+    ]
+
+
+def test_cancelling_running_prompt_kills_its_child(tmp_path):
+    started = time.monotonic()
+    lines = _run_batch(tmp_path, ["hang", "after"])
+    assert time.monotonic() - started < 30
+    assert f"{MARKER} cancelled hang" in lines
+    assert lines[-1] == f"{MARKER} done after"
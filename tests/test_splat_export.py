@@ -0,0 +1,81 @@
+# tests/test_splat_export.py
+import os
+
+import numpy as np
+import pytest
+
+from app.splat.export import (
+    CHUNK_SIZE, SPLAT_DTYPE, export_assets, export_compressed_ply, importance_order, load_gaussians, morton_order,
+)
+from app.splat.ply import read_element, read_header, write_ply
+
+COUNT = 1000
+
+
+@pytest.fixture
+def point_cloud(tmp_path):
+    rng = np.random.default_rng(0)
+    names = (["x", "y", "z", "f_dc_0", "f_dc_1", "f_dc_2"] + [f"f_rest_{i}" for i in range(45)]
+             + ["opacity", "scale_0", "scale_1", "scale_2", "rot_0", "rot_1", "rot_2", "rot_3"])
+    vertices = np.zeros(COUNT, dtype=[(name, "<f4") for name in names])
+    for name in names:
+        vertices[name] = rng.standard_normal(COUNT)
+    for name in ("scale_0", "scale_1", "scale_2"):
+        vertices[name] = rng.normal(-4, 1, size=COUNT)
+    path = tmp_path / "point_cloud.ply"
+    write_ply(str(path), [("vertex", vertices)])
+    return str(path)
+
+
+def test_export_sizes(point_cloud):
+    outputs = export_assets(point_cloud, sh_degree=0)
+    splat = np.fromfile(outputs["splat"], dtype=SPLAT_DTYPE)
+    assert len(splat) == COUNT
+    # 按 不透明度 × 体积 从大到小排列
+    gaussians = load_gaussians(point_cloud)
+    expected = gaussians.positions[importance_order(gaussians)]
+    np.testing.assert_array_equal(splat["position"], expected)
+
+    header = read_header(outputs["compressed"])
+    assert header.element("vertex").count == COUNT
+    assert header.element("chunk").count == (COUNT + CHUNK_SIZE - 1) // CHUNK_SIZE
+    assert header.element("sh") is None
+    # 原始 PLY 每个高斯 59 个 float32，压缩后每个高斯 16 字节（另有每块 72 字节的范围）
+    assert os.path.getsize(outputs["compressed"]) < os.path.getsize(point_cloud) / 12
+
+
+@pytest.mark.parametrize("sh_degree, coefficients", [(1, 9), (2, 24), (3, 45)])
+def test_sh_truncation(point_cloud, tmp_path, sh_degree, coefficients):
+    out = str(tmp_path / "out.compressed.ply")
+    export_compressed_ply(load_gaussians(point_cloud), out, sh_degree)
+    sh = read_element(out, "sh")
+    assert len(sh.dtype.names) == coefficients
+
+
+def test_compressed_round_trip(point_cloud, tmp_path):
+    gaussians = load_gaussians(point_cloud)
+    out = str(tmp_path / "out.compressed.ply")
+    export_compressed_ply(gaussians, out, 0)
+    gaussians = gaussians.take(morton_order(gaussians.positions))
+    chunks = read_element(out, "chunk")
+    vertices = read_element(out, "vertex")
+    chunk_index = np.arange(COUNT) // CHUNK_SIZE
+
+    packed = vertices["packed_position"].astype(np.int64)
+    for axis, (name, shift, bits) in enumerate((("x", 21, 11), ("y", 11, 10), ("z", 0, 11))):
+        low, high = chunks[f"min_{name}"][chunk_index], chunks[f"max_{name}"][chunk_index]
+        decoded = low + ((packed >> shift) & ((1 << bits) - 1)) / ((1 << bits) - 1) * (high - low)
+        assert np.all(np.abs(decoded - gaussians.positions[:, axis]) <= (high - low) / ((1 << bits) - 1))
+
+    packed = vertices["packed_rotation"].astype(np.int64)
+    largest = packed >> 30
+    rest = np.stack([((packed >> (20 - 10 * i)) & 0x3FF) / 1023 for i in range(3)], axis=1)
+    rest = (rest - 0.5) / (np.sqrt(2) * 0.5)
+    rotations = np.zeros((COUNT, 4))
+    rows = np.arange(COUNT)
+    rotations[rows, largest] = np.sqrt(np.clip(1 - (rest ** 2).sum(axis=1), 0, 1))
+    mask = np.ones((COUNT, 4), dtype=bool)
+    mask[rows, largest] = False
+    rotations[mask] = rest.reshape(-1)
+    # 四元数 q 与 -q 表示同一旋转
+    assert np.abs((rotations * gaussians.rotations).sum(axis=1)).min() > 0.999
@@ -0,0 +1,50 @@
+# tests/test_sse_backend.py
+import asyncio
+import json
+
+import app.sse.backends as backends
+from app.models.sse_event import SSEEvent
+
+
+def _insert(db, event_id: int) -> None:
+    db.add(SSEEvent(id=event_id, payload=json.dumps({"n": event_id})))
+    db.commit()
+
+
+def _backend(delivered: list) -> backends.DatabaseBackend:
+    backend = backends.DatabaseBackend()
+
+    async def deliver(message, event_id):
+        delivered.append(event_id)
+
+    backend.bind(deliver)
+    return backend
+
+
+def test_late_commit_with_lower_id_is_delivered_once(db):
+    delivered = []
+    backend = _backend(delivered)
+    _insert(db, 1)
+    _insert(db, 3)  # ID 2 已分配但尚未提交
+    asyncio.run(backend.poll_once())
+    assert delivered == [1, 3]
+
+    _insert(db, 2)
+    _insert(db, 4)
+    asyncio.run(backend.poll_once())
+    asyncio.run(backend.poll_once())
+    assert delivered == [1, 3, 2, 4]
+
+
+def test_rolled_back_gaps_expire(db, monkeypatch):
+    delivered = []
+    backend = _backend(delivered)
+    _insert(db, 1)
+    _insert(db, 5)
+    asyncio.run(backend.poll_once())
+    assert sorted(backend._missing) == [2, 3, 4]
+
+    monkeypatch.setattr(backends, "DB_GAP_TIMEOUT_SECONDS", 0)
+    asyncio.run(backend.poll_once())
+    assert backend._missing == {}
+    assert delivered == [1, 5]
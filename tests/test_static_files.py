@@ -0,0 +1,68 @@
+# tests/test_static_files.py
+import os
+
+import pytest
+
+from app.routers.upload import UPLOAD_DIRECTORY
+
+CONTENT = bytes(range(256)) * 1024
+
+
+@pytest.fixture
+def served(client):
+    path = os.path.join(UPLOAD_DIRECTORY, "range-test.bin")
+    with open(path, "wb") as f:
+        f.write(CONTENT)
+    response = client.get("/files/range-test.bin")
+    assert response.status_code == 200
+    yield response.headers
+    os.remove(path)
+
+
+def _get(client, **headers):
+    return client.get("/files/range-test.bin", headers=headers)
+
+
+def test_range(client, served):
+    response = _get(client, range="bytes=10-19")
+    assert response.status_code == 206
+    assert response.content == CONTENT[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(CONTENT)}"
+    assert response.headers["etag"] == served["etag"]
+
+    assert _get(client, range="bytes=-5").content == CONTENT[-5:]
+    assert _get(client, range=f"bytes={len(CONTENT) - 3}-").content == CONTENT[-3:]
+    assert _get(client, range=f"bytes=5-{len(CONTENT) * 2}").content == CONTENT[5:]
+
+
+def test_range_with_if_range(client, served):
+    # If-Range 与当前 ETag / Last-Modified 一致：返回区间
+    for validator in (served["etag"], served["last-modified"]):
+        response = _get(client, range="bytes=100-199", **{"if-range": validator})
+        assert response.status_code == 206
+        assert response.content == CONTENT[100:200]
+
+    # ETag 已变化或为弱 ETag：忽略 Range，返回完整文件
+    for validator in ('"stale"', "W/" + served["etag"]):
+        response = _get(client, range="bytes=100-199", **{"if-range": validator})
+        assert response.status_code == 200
+        assert response.content == CONTENT
+
+
+def test_unsatisfiable_range(client, served):
+    response = _get(client, range=f"bytes={len(CONTENT)}-")
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+
+def test_head_range(client, served):
+    response = client.head("/files/range-test.bin", headers={"range": "bytes=0-99"})
+    assert response.status_code == 206
+    assert response.headers["content-length"] == "100"
+    assert response.content == b""
+
+
+def test_not_modified(client, served):
+    response = _get(client, **{"if-none-match": served["etag"]})
+    assert response.status_code == 304
+    assert response.headers["etag"] == served["etag"]
@@ -0,0 +1,40 @@
+# tests/test_task_project_index.py
+import time
+
+from app.models.project import Project
+from app.sse.event_bus import TaskProjectIndex
+
+
+def _project(db, task, name: str) -> Project:
+    project = Project(
+        name=name, processed_file_id=task.id,
+        static_file_id=task.file_id, project_cover_image_static_id=task.file_id,
+    )
+    db.add(project)
+    db.commit()
+    return project
+
+
+def test_projects_created_by_other_processes_appear_after_ttl(db, make_task):
+    task = make_task()
+    first = _project(db, task, "first")
+    index = TaskProjectIndex(ttl=0.2)
+    assert index.get(task.id) == [first.id]
+
+    # 其他 worker 进程新建的项目：本进程的缓存没有收到 add
+    second = _project(db, task, "second")
+    assert index.get(task.id) == [first.id]
+    time.sleep(0.25)
+    assert sorted(index.get(task.id)) == sorted([first.id, second.id])
+
+
+def test_local_changes_update_cached_entry(db, make_task):
+    task = make_task()
+    first = _project(db, task, "first")
+    index = TaskProjectIndex(ttl=60)
+    assert index.get(task.id) == [first.id]
+    index.add(task.id, first.id + 100)
+    assert index.get(task.id) == [first.id, first.id + 100]
+    index.discard_project(task.id, first.id)
+    index.discard_project(task.id, first.id + 100)
+    assert index.get(task.id) == [first.id]
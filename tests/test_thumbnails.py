@@ -0,0 +1,51 @@
+# tests/test_thumbnails.py
+import os
+
+from app.models.data_resource import DataResource, DataResourcePreviewFrame
+from app.models.static_file import StaticFile
+from app.tasks.scheduler import TrainingScheduler
+from app.tasks.thumbnails import ThumbnailService
+
+
+class RecordingService(ThumbnailService):
+    def __init__(self):
+        from app.models.database import SessionLocal
+
+        super().__init__(SessionLocal, lambda message: True, TrainingScheduler(devices=[None]))
+        self.submitted = []
+
+    def submit(self, data_resource_id: int):
+        self.submitted.append(data_resource_id)
+
+
+def _resource(db, name: str, video_exists: bool = True, frames: int = 0) -> DataResource:
+    path = os.path.join("uploads", f"{name}.mp4")
+    if video_exists:
+        os.makedirs("uploads", exist_ok=True)
+        open(path, "wb").close()
+    video = StaticFile(path=path, filename=f"{name}.mp4", original_filename=f"{name}.mp4")
+    db.add(video)
+    db.flush()
+    resource = DataResource(name=name, static_file_id=video.id)
+    db.add(resource)
+    db.flush()
+    for position in range(frames):
+        frame = StaticFile(path=f"uploads/{name}-{position}.jpg", filename=f"{name}-{position}.jpg")
+        db.add(frame)
+        db.flush()
+        db.add(DataResourcePreviewFrame(data_resource_id=resource.id, static_file_id=frame.id, position=position))
+    db.commit()
+    return resource
+
+
+def test_resubmit_missing_previews_after_restart(db):
+    _resource(db, "done", frames=2)
+    interrupted = _resource(db, "interrupted")
+    _resource(db, "deleted", video_exists=False)
+
+    service = RecordingService()
+    try:
+        assert service.resubmit_missing() == 1
+        assert service.submitted == [interrupted.id]
+    finally:
+        service.shutdown()
@@ -0,0 +1,116 @@
+# tests/test_upload_session.py
+import hashlib
+import os
+
+from app.routers.upload import MIN_CHUNK_SIZE, UPLOAD_DIRECTORY
+
+
+def _start(client, content: bytes) -> dict:
+    response = client.post("/upload/sessions", json={
+        "filename": "scene.mp4", "size": len(content), "chunk_size": MIN_CHUNK_SIZE,
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+def _put(client, upload_id: str, content: bytes, index: int):
+    chunk = content[index * MIN_CHUNK_SIZE:(index + 1) * MIN_CHUNK_SIZE]
+    return client.put(
+        f"/upload/sessions/{upload_id}", params={"offset": index * MIN_CHUNK_SIZE}, content=chunk,
+        headers={"X-Chunk-SHA256": hashlib.sha256(chunk).hexdigest()},
+    )
+
+
+def test_partial_upload_is_not_served_or_cached(client):
+    content = os.urandom(MIN_CHUNK_SIZE + 100)
+    existing = set(os.listdir(UPLOAD_DIRECTORY))
+    session = _start(client, content)
+    assert session["total_chunks"] == 2
+    assert _put(client, session["upload_id"], content, 1).status_code == 200
+
+    # 上传目录中还没有最终文件，临时文件也不能通过 /files 访问
+    assert set(os.listdir(UPLOAD_DIRECTORY)) == existing
+    assert client.get(f"/files/.sessions/{session['upload_id']}.part").status_code == 404
+    assert client.post(f"/upload/sessions/{session['upload_id']}/complete").status_code == 409
+
+    assert _put(client, session["upload_id"], content, 0).status_code == 200
+    response = client.post(
+        f"/upload/sessions/{session['upload_id']}/complete", json={"sha256": hashlib.sha256(content).hexdigest()}
+    )
+    assert response.status_code == 200
+    static_file = response.json()
+
+    assert not os.path.exists(os.path.join(UPLOAD_DIRECTORY, ".sessions", f"{session['upload_id']}.part"))
+    served = client.get(f"/files/{static_file['filename']}")
+    assert served.status_code == 200
+    assert served.content == content
+    assert "immutable" in served.headers["cache-control"]
+
+
+def test_duplicate_upload_reuses_existing_file(client):
+    content = os.urandom(100)
+    first = _start(client, content)
+    assert _put(client, first["upload_id"], content, 0).status_code == 200
+    original = client.post(f"/upload/sessions/{first['upload_id']}/complete").json()
+
+    second = _start(client, content)
+    assert _put(client, second["upload_id"], content, 0).status_code == 200
+    duplicate = client.post(f"/upload/sessions/{second['upload_id']}/complete").json()
+    assert duplicate["id"] == original["id"]
+    assert os.listdir(os.path.join(UPLOAD_DIRECTORY, ".sessions")) == []
+
+
+def test_abort_removes_partial_file(client):
+    content = os.urandom(100)
+    session = _start(client, content)
+    assert client.delete(f"/upload/sessions/{session['upload_id']}").json() is True
+    assert os.listdir(os.path.join(UPLOAD_DIRECTORY, ".sessions")) == []
+
+
+def test_failed_chunk_retry_keeps_accepted_chunk(client):
+    content = os.urandom(MIN_CHUNK_SIZE + 100)
+    session = _start(client, content)
+    upload_id = session["upload_id"]
+    assert _put(client, upload_id, content, 0).status_code == 200
+    assert _put(client, upload_id, content, 1).status_code == 200
+
+    good_hash = hashlib.sha256(content[:MIN_CHUNK_SIZE]).hexdigest()
+    garbage = os.urandom(MIN_CHUNK_SIZE)
+    # 内容与校验和不符、被截断、缺少校验头的重传都被拒绝
+    assert client.put(f"/upload/sessions/{upload_id}", params={"offset": 0}, content=garbage,
+                      headers={"X-Chunk-SHA256": good_hash}).status_code == 400
+    assert client.put(f"/upload/sessions/{upload_id}", params={"offset": 0}, content=garbage[:100],
+                      headers={"X-Chunk-SHA256": good_hash}).status_code == 400
+    assert client.put(f"/upload/sessions/{upload_id}", params={"offset": 0}, content=garbage).status_code == 422
+
+    assert client.get(f"/upload/sessions/{upload_id}").json()["missing_chunks"] == []
+    static_file = client.post(f"/upload/sessions/{upload_id}/complete").json()
+    assert client.get(f"/files/{static_file['filename']}").content == content
+    assert os.listdir(os.path.join(UPLOAD_DIRECTORY, ".sessions")) == []
+
+
+def test_concurrent_complete_is_claimed_once(client, db):
+    from fastapi import HTTPException
+    from app.models.database import SessionLocal
+    from app.routers.upload import _finish_upload_session, _get_complete_upload_session
+
+    content = os.urandom(100)
+    session = _start(client, content)
+    assert _put(client, session["upload_id"], content, 0).status_code == 200
+
+    # 两个 complete 请求都已通过完整性检查
+    other = SessionLocal()
+    try:
+        first = _get_complete_upload_session(db, session["upload_id"])
+        second = _get_complete_upload_session(other, session["upload_id"])
+        sha256 = hashlib.sha256(content).hexdigest()
+        static_file = _finish_upload_session(db, first, sha256)
+        try:
+            _finish_upload_session(other, second, sha256)
+        except HTTPException as e:
+            assert e.status_code == 409
+        else:
+            raise AssertionError("second complete should be rejected")
+    finally:
+        other.close()
+    assert open(static_file.path, "rb").read() == content